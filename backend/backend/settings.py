@@ -37,11 +37,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.ProfilerMiddleware",
+    "core.middleware.QueryDebugMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -127,6 +130,13 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+# "text" or "json" (one JSON object per line)
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+# Levels of single modules, e.g. 'core.tasks=WARNING,django.db.backends=DEBUG'
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+
+# Records are written by a background thread, see core.log
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": True,
@@ -134,31 +144,54 @@ LOGGING = {
         "main": {
             "format": "%(asctime)s [%(levelname)s] %(module)s.%(funcName)s:  %(message)s"
         },
+        "json": {"()": "core.log.JSONFormatter"},
     },
     "handlers": {
         "console": {
             "level": "DEBUG",
-            "formatter": "main",
+            "formatter": "json" if LOG_FORMAT == "json" else "main",
             "class": "logging.StreamHandler",
             "stream": "ext://sys.stdout",  # Default is stderr
         },
         "file": {
             "level": "INFO",
-            "formatter": "main",
+            "formatter": "json" if LOG_FORMAT == "json" else "main",
             "class": "logging.handlers.RotatingFileHandler",
             "filename": "logs/dont-forgetter.log",
             "mode": "a",
-            "maxBytes": 1048576,
+            "maxBytes": 50 * 1024 * 1024,
             "backupCount": 5,
         },
+        "queue": {
+            "class": "core.log.QueueListenerHandler",
+            "handlers": ["cfg://handlers.console", "cfg://handlers.file"],
+        },
     },
     "loggers": {
         "": {  # root logger
-            "handlers": ["console", "file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
-        "core": {"handlers": ["console", "file"], "level": "DEBUG", "propagate": False},
+        "core": {"handlers": ["queue"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
+for item in LOG_LEVELS.split(","):
+    if item.strip():
+        name, _, level = item.partition("=")
+        LOGGING["loggers"].setdefault(name.strip(), {})["level"] = level.strip().upper()
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("CACHE_LOCATION", "redis://127.0.0.1:6379/1"),
+    },
+    # Separate from the default cache, so that sessions are not evicted by cached responses
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get(
+            "SESSION_CACHE_LOCATION", "redis://127.0.0.1:6379/2"
+        ),
     },
 }
 
@@ -171,9 +204,9 @@ CELERY_BEAT_SCHEDULE = {
         "task": "core.tasks.heartbeat",
         "schedule": 20.0,  # Every 20 seconds
     },
-    "reset_notifications_left": {
-        "task": "core.tasks.reset_notifications_left",
-        "schedule": crontab(0, 0, day_of_month="1"),  # First day of every month
+    "purge_expired_records": {
+        "task": "core.tasks.purge_expired_records",
+        "schedule": crontab(0, 3),  # Every day at 03:00
     },
 }
 
@@ -184,11 +217,38 @@ EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL")
 EMAIL_USE_TLS = True
 
+SESSION_ENGINE = "django.contrib.sessions.backends.cache"
+SESSION_CACHE_ALIAS = "sessions"
+
+AUTHENTICATION_BACKENDS = ["users.authentication.CachedModelBackend"]
+
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
+        "users.authentication.APIKeyAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "core.throttling.AnonSlidingWindowThrottle",
+        "core.throttling.UserSlidingWindowThrottle",
+        "core.throttling.ScopedSlidingWindowThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "60/min",
+        "user": "600/min",
+        # Views with a throttle_scope, limited in addition to the rates above
+        "auth": "10/min",  # Login and registration, which hash the password
+        "bulk": "30/hour",  # Bulk writes and iCalendar imports
+        "export": "30/hour",
+        # Calendar feeds, per user instead of the anon rate, see FeedSlidingWindowThrottle
+        "feed": "60/hour",
+    },
+    # Proxies in front of the app, used to find the client IP address in X-Forwarded-For
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
 }
 
 SIMPLE_JWT = {
@@ -237,4 +297,52 @@ NO_OF_FREE_EMAIL_NOTIFICATIONS = 20
 NO_OF_FREE_SMS_NOTIFICATIONS = 10
 MAX_NOTIFICATION_RETRIES = 3
 MESSAGE_SIGNATURE = "\n\n\ndont-forgetter.rest"
+LIST_CACHE_TIMEOUT = 300  # Seconds
+FEED_CACHE_TIMEOUT = 60 * 60 * 24  # Seconds
+STATS_CACHE_TIMEOUT = 60  # Seconds
+USER_SETTINGS_CACHE_TIMEOUT = 60  # Seconds, per process
+AUTH_USER_CACHE_TIMEOUT = 300  # Seconds, shared by all processes
+AUTH_USER_LOCAL_CACHE_TIMEOUT = 10  # Seconds, per process
+API_KEY_CACHE_TIMEOUT = 300  # Seconds
+QUOTA_RESET_BATCH_SIZE = 1000  # Users updated per statement by reset_notifications_left
+QUOTA_RESET_PAUSE = 0.1  # Seconds between the batches of reset_notifications_left
+# Bearer token of the Prometheus scraper for /metrics, the endpoint is disabled if unset
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_FLUSH_INTERVAL = (
+    10  # Seconds between writes of each process' metrics to the cache
+)
+# Share of requests that are profiled, staff users can profile a request with the X-Profile header
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", 0))
+# Value of the X-Profile header that profiles a request of any client, disabled if unset
+PROFILER_TOKEN = os.environ.get("PROFILER_TOKEN", "")
+PROFILER_DIR = BASE_DIR / "profiles"
+PROFILER_MAX_PROFILES = 50  # The oldest profiles are deleted
+# Log the queries of each request and Celery task, with warnings for N+1 queries
+QUERY_DEBUG = bool(int(os.environ.get("QUERY_DEBUG", 0)))
+QUERY_REPEAT_THRESHOLD = 3  # Executions of a statement reported as N+1 queries
+# Changes are only returned by the changes endpoints after this many seconds, so that those
+# of transactions that are still running (with lower change ids) cannot be skipped.
+# It has to be longer than any transaction that saves events or notes.
+CHANGES_SETTLE_SECONDS = 10
+# Change log rows are purged after this many days, clients with older change tokens
+# have to sync again from a snapshot
+CHANGE_LOG_RETENTION_DAYS = 30
+PURGE_BATCH_SIZE = 1000  # Rows deleted per transaction by the purge task
+# One-shot events are deleted when they fire, ones left behind (e.g. failed notifications) are purged
+EXPIRED_EVENT_RETENTION_DAYS = 7
+# Notes not updated for this many days are purged, notes are kept forever if unset
+NOTE_RETENTION_DAYS = (
+    int(os.environ["NOTE_RETENTION_DAYS"])
+    if os.environ.get("NOTE_RETENTION_DAYS")
+    else None
+)
+# Serve the event/note list and detail endpoints with async views (experimental, requires an
+# ASGI server, which is not in the requirements)
+ASYNC_API_VIEWS = bool(int(os.environ.get("ASYNC_API_VIEWS", 0)))
+SEARCH_CONFIG = "english"  # PostgreSQL text search configuration
+ICS_IMPORT_DIR = (
+    BASE_DIR / "imports"
+)  # Has to be shared by the web and Celery containers
+ICS_IMPORT_BATCH_SIZE = 1000
+ICS_IMPORT_MAX_ERRORS = 100
 CONTACT_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL")
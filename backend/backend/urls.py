@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view as swagger_get_schema_view
 
-from core import views
+from core import async_views, views
+from core.admin import profile_urls
 
 schema_view = swagger_get_schema_view(
     openapi.Info(
@@ -14,16 +16,44 @@ schema_view = swagger_get_schema_view(
     public=True,
 )
 
+if settings.ASYNC_API_VIEWS:
+    event_view = async_views.EventAsyncAPIView
+    event_detail_view = async_views.EventAsyncAPIDetailView
+    note_view = async_views.NoteAsyncAPIView
+    note_detail_view = async_views.NoteAsyncAPIDetailView
+else:
+    event_view = views.EventAPIView
+    event_detail_view = views.EventAPIDetailView
+    note_view = views.NoteAPIView
+    note_detail_view = views.NoteAPIDetailView
+
 urlpatterns = [
     path("docs/", schema_view.with_ui("swagger", cache_timeout=0), name="docs"),
+    path("admin/", include((profile_urls, "profiles"))),
     path("admin/", admin.site.urls),
-    path("event/", views.EventAPIView.as_view()),
-    path("event/<int:id>/", views.EventAPIDetailView.as_view()),
-    path("note/", views.NoteAPIView.as_view()),
-    path("note/<int:id>/", views.NoteAPIDetailView.as_view()),
+    path("event/", event_view.as_view()),
+    path("event/<int:id>/", event_detail_view.as_view()),
+    path("event/changes/", views.EventAPIChangesView.as_view()),
+    path("event/bulk/", views.EventAPIBulkView.as_view()),
+    path("event/export/", views.EventAPIExportView.as_view()),
+    path("event/occurrences/", views.EventAPIOccurrencesView.as_view()),
+    path("event/stats/", views.EventAPIStatsView.as_view()),
+    path("event/feed/", views.EventFeedURLView.as_view()),
+    path("event/feed.ics", views.EventFeedView.as_view()),
+    path("event/import/ics/", views.EventAPIIcsImportView.as_view()),
+    path(
+        "event/import/ics/<str:task_id>/",
+        views.EventAPIIcsImportStatusView.as_view(),
+    ),
+    path("note/", note_view.as_view()),
+    path("note/<int:id>/", note_detail_view.as_view()),
+    path("note/changes/", views.NoteAPIChangesView.as_view()),
+    path("note/export/", views.NoteAPIExportView.as_view()),
+    path("note/stats/", views.NoteAPIStatsView.as_view()),
     path(
         "accounts/", include("rest_framework.urls")
     ),  # Used for Django simple auth only
     path("user/", include("users.urls", namespace="users")),
+    path("metrics", views.MetricsView.as_view()),
     path("", views.APIWelcomeView.as_view()),
 ]
@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.urls import path
 
+from . import profiling
 from .models import Event, Note
 
 
@@ -12,3 +16,45 @@ class NoteAdmin(admin.ModelAdmin):
 
 admin.site.register(Event)
 admin.site.register(Note, NoteAdmin)
+
+
+def profile_list_view(request):
+    """Lists the request profiles saved by ProfilerMiddleware"""
+    profiles = []
+    for profile_id in profiling.list_profile_ids():
+        try:
+            info = profiling.load_profile_info(profile_id)
+        except (OSError, ValueError):
+            # Deleted while listing
+            continue
+        info["id"] = profile_id
+        info["sql_count"] = sum(statement["count"] for statement in info["sql"])
+        info["sql_seconds"] = sum(statement["seconds"] for statement in info["sql"])
+        profiles.append(info)
+    context = {
+        **admin.site.each_context(request),
+        "title": "Profiles",
+        "profiles": profiles,
+    }
+    return TemplateResponse(request, "admin/profiles.html", context)
+
+
+def profile_download_view(request, profile_id, extension):
+    """Downloads the cProfile stats (.prof) or the request and SQL timings (.json) of a profile"""
+    if extension not in ("prof", "json"):
+        raise Http404
+    try:
+        path = profiling.get_profile_path(profile_id, extension)
+        return FileResponse(open(path, "rb"), as_attachment=True)
+    except (OSError, ValueError):
+        raise Http404
+
+
+profile_urls = [
+    path("profiles/", admin.site.admin_view(profile_list_view), name="profiles"),
+    path(
+        "profiles/<str:profile_id>.<str:extension>",
+        admin.site.admin_view(profile_download_view),
+        name="profile_download",
+    ),
+]
@@ -0,0 +1,204 @@
+"""
+Experimental async versions of the event and note list and detail views, used when the
+app is served by an ASGI server (settings.ASYNC_API_VIEWS), which production does not do. Reads use Django's async ORM,
+so a worker can keep many connections open while queries are in progress.
+Writes go through the synchronous views, as model saves and signals are synchronous.
+"""
+from abc import ABCMeta, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from core.cache import aget_or_set_list, get_etag
+from core.renderers import FastJSONRenderer
+from core.views import (
+    QUERY_LIMIT,
+    APIQueryFuncs,
+    EventAPIDetailView,
+    EventAPIView,
+    NoteAPIDetailView,
+    NoteAPIView,
+    etag_matches,
+    ownership_error_message,
+)
+from users.permissions import APIKeyScopePermission
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    # Rendered the same way as the responses of the synchronous views
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status_code,
+        headers=headers,
+        content_type="application/json",
+    )
+
+
+def error_response(e):
+    return json_response(
+        {"result": "error", "message": str(e)},
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+    )
+
+
+def authenticate(request, view):
+    """
+    Authenticates the request with the REST framework authentication classes
+    and checks the API key scope and the throttles of the synchronous view
+    """
+    drf_request = Request(
+        request,
+        authenticators=[
+            authentication()
+            for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    )
+    user = drf_request.user
+    if not user or not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    permission = APIKeyScopePermission()
+    if not permission.has_permission(drf_request, view):
+        raise exceptions.PermissionDenied(permission.message)
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, view):
+            raise exceptions.Throttled(throttle.wait())
+    return user
+
+
+class AsyncAPIView(View, metaclass=ABCMeta):
+    """An abstract class for building async versions of the API views for different models"""
+
+    @property
+    @abstractmethod
+    def sync_view_class(self):
+        # The synchronous API view, used for writes and for its model specific settings
+        pass
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # CSRF is checked by the authentication classes of the synchronous views
+        view.csrf_exempt = True
+        return view
+
+    async def get_user(self, request):
+        # Token and session lookups use the database
+        return await sync_to_async(authenticate)(request, self.sync_view_class())
+
+    async def write(self, request, *args, **kwargs):
+        view = self.sync_view_class.as_view()
+        return await sync_to_async(view)(request, *args, **kwargs)
+
+    def unauthenticated_response(self, e):
+        wait = getattr(e, "wait", None)
+        headers = {"Retry-After": str(int(wait))} if wait else None
+        return json_response(
+            {"detail": e.detail}, status_code=e.status_code, headers=headers
+        )
+
+    def not_modified_response(self, etag):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        response["ETag"] = etag
+        return response
+
+
+class AsyncAPIListView(AsyncAPIView, metaclass=ABCMeta):
+    """An abstract class for building async versions of the list API views"""
+
+    post = delete = patch = AsyncAPIView.write
+
+    async def get(self, request):
+        try:
+            user = await self.get_user(request)
+        except exceptions.APIException as e:
+            return self.unauthenticated_response(e)
+        try:
+            view = self.sync_view_class()
+            model, serializer_class = view.model, view.serializer_class
+            etag = await sync_to_async(get_etag)(model, user.id, request.GET)
+            if etag_matches(request, etag):
+                return self.not_modified_response(etag)
+            query = request.GET.get("query", "")
+            fields = APIQueryFuncs.parse_fields(
+                request.GET.get("fields", ""), serializer_class
+            )
+            preview = APIQueryFuncs.parse_boolean(request.GET.get("preview", ""))
+
+            async def build_list():
+                queryset = APIQueryFuncs.get_user_queryset(model, user, query)
+                queryset = view.annotate_previews(queryset, preview).order_by(
+                    *view.get_ordering(queryset)
+                )[:QUERY_LIMIT]
+                plan = view.get_values_plan(fields, preview)
+                rows = [row async for row in queryset.values_list(*plan.columns)]
+                return serializer_class.values_list_data(rows, plan)
+
+            data = await aget_or_set_list(model, user.id, request.GET, build_list)
+            return json_response(data, headers={"ETag": etag} if etag else None)
+        except Exception as e:
+            return error_response(e)
+
+
+class AsyncAPIDetailView(AsyncAPIView, metaclass=ABCMeta):
+    """An abstract class for building async versions of the detail API views"""
+
+    delete = AsyncAPIView.write
+
+    async def get(self, request, id):
+        try:
+            user = await self.get_user(request)
+        except exceptions.APIException as e:
+            return self.unauthenticated_response(e)
+        try:
+            view = self.sync_view_class()
+            model, serializer_class = view.model, view.serializer_class
+            etag = await sync_to_async(get_etag)(model, user.id, request.GET, id=id)
+            if etag_matches(request, etag):
+                return self.not_modified_response(etag)
+            fields = APIQueryFuncs.parse_fields(
+                request.GET.get("fields", ""), serializer_class
+            )
+            queryset = model.objects.all()
+            if fields:
+                queryset = queryset.only("user", *fields)
+            entry = await queryset.aget(pk=id)
+            if entry.user_id == user.id:
+                serializer = serializer_class(entry, fields=fields)
+                return json_response(
+                    serializer.data, headers={"ETag": etag} if etag else None
+                )
+            return json_response(
+                {"result": "error", "message": ownership_error_message},
+                status_code=status.HTTP_403_FORBIDDEN,
+            )
+        except Exception as e:
+            return error_response(e)
+
+
+class EventAsyncAPIView(AsyncAPIListView):
+    """An async APIView for adding and getting events"""
+
+    sync_view_class = EventAPIView
+
+
+class EventAsyncAPIDetailView(AsyncAPIDetailView):
+    """An async APIView for getting and deleting a specific event"""
+
+    sync_view_class = EventAPIDetailView
+
+
+class NoteAsyncAPIView(AsyncAPIListView):
+    """An async APIView for adding and getting notes"""
+
+    sync_view_class = NoteAPIView
+
+
+class NoteAsyncAPIDetailView(AsyncAPIDetailView):
+    """An async APIView for getting and deleting a specific note"""
+
+    sync_view_class = NoteAPIDetailView
@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ListCacheStats:
+    """
+    Per-process hit/miss counters and lookup latency of the list response cache.
+    They are also recorded as metrics, for the totals of all processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.hit_seconds = 0.0
+            self.miss_seconds = 0.0
+
+    def record(self, hit, seconds):
+        result = "hit" if hit else "miss"
+        metrics.list_cache_requests_total.inc(result=result)
+        metrics.list_cache_duration.observe(seconds, result=result)
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_seconds += seconds
+            else:
+                self.misses += 1
+                self.miss_seconds += seconds
+
+    def as_dict(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+                "avg_hit_seconds": self.hit_seconds / self.hits if self.hits else 0.0,
+                "avg_miss_seconds": (
+                    self.miss_seconds / self.misses if self.misses else 0.0
+                ),
+            }
+
+
+list_cache_stats = ListCacheStats()
+
+
+def get_redis_client():
+    # Returns the redis-py client of the default cache, or None if it is not a Redis cache
+    if isinstance(cache, RedisCache):
+        return cache._cache.get_client(write=True)
+    return None
+
+
+def get_version_key(model, user_id):
+    return f"{model._meta.model_name}:{user_id}:version"
+
+
+def get_list_version(model, user_id):
+    """
+    Returns the current version of the user's cached lists of the given model.
+    A missing (e.g. evicted) version is initialised with the current time, so that
+    stale entries cached under an older version can never be served again.
+    """
+    key = get_version_key(model, user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_list_version(model, user_id):
+    """Invalidates all cached lists of the given model belonging to the user"""
+    key = get_version_key(model, user_id)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Key does not exist yet
+            cache.set(key, time.time_ns(), timeout=None)
+    except Exception as e:
+        logger.warning("List cache invalidation failed: %s", e)
+
+
+def get_params_hash(query_params):
+    params = sorted(
+        (key, value) for key, values in query_params.lists() for value in values
+    )
+    return hashlib.md5(repr(params).encode()).hexdigest()
+
+
+def get_list_cache_key(model, user_id, query_params):
+    version = get_list_version(model, user_id)
+    return f"{model._meta.model_name}:{user_id}:list:{version}:{get_params_hash(query_params)}"
+
+
+def get_etag(model, user_id, query_params, id=None):
+    """
+    Returns a strong ETag for a list (or a detail response if id is provided).
+    It only depends on the user's list version, so no database query is needed.
+    Returns None if the cache is unavailable.
+    """
+    try:
+        version = get_list_version(model, user_id)
+    except Exception as e:
+        logger.warning("ETag calculation failed: %s", e)
+        return None
+    detail = f"-{id}" if id is not None else ""
+    return f'"{version}{detail}-{get_params_hash(query_params)}"'
+
+
+def get_or_set_list(model, user_id, query_params, build_list):
+    """
+    Returns the cached serialized list for the user and query parameters.
+    Calls build_list() and caches its result on a miss.
+    Cache errors are logged and the list is built from the database instead.
+    """
+    start = time.perf_counter()
+    try:
+        key = get_list_cache_key(model, user_id, query_params)
+        data = cache.get(key)
+    except Exception as e:
+        logger.warning("List cache lookup failed: %s", e)
+        return build_list()
+    if data is not None:
+        list_cache_stats.record(True, time.perf_counter() - start)
+        return data
+
+    data = build_list()
+    try:
+        cache.set(key, data, timeout=settings.LIST_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("List cache update failed: %s", e)
+    list_cache_stats.record(False, time.perf_counter() - start)
+    return data
+
+
+async def aget_or_set_list(model, user_id, query_params, abuild_list):
+    """Async version of get_or_set_list, abuild_list is awaited on a miss"""
+    start = time.perf_counter()
+    try:
+        key = await sync_to_async(get_list_cache_key)(model, user_id, query_params)
+        data = await cache.aget(key)
+    except Exception as e:
+        logger.warning("List cache lookup failed: %s", e)
+        return await abuild_list()
+    if data is not None:
+        list_cache_stats.record(True, time.perf_counter() - start)
+        return data
+
+    data = await abuild_list()
+    try:
+        await cache.aset(key, data, timeout=settings.LIST_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("List cache update failed: %s", e)
+    list_cache_stats.record(False, time.perf_counter() - start)
+    return data
+
+
+def get_or_set_feed(model, user_id, build_feed):
+    """
+    Returns the ETag, the last modification time and the content of the user's calendar feed.
+    The feed is only rendered again after the user's entries have changed.
+    It is rendered in full: the events have to be read for it anyway, and formatting an event
+    (about 12 µs) costs about as much as fetching a rendered one from the cache.
+    """
+    try:
+        version = get_list_version(model, user_id)
+        key = f"{model._meta.model_name}:{user_id}:feed:{version}"
+        feed = cache.get(key)
+    except Exception as e:
+        logger.warning("Feed cache lookup failed: %s", e)
+        return None, time.time(), build_feed()
+    if feed is None:
+        feed = (f'"feed-{version}"', time.time(), build_feed())
+        try:
+            cache.set(key, feed, timeout=settings.FEED_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning("Feed cache update failed: %s", e)
+    return feed
+
+
+def get_or_set_stats(model, user_id, query_params, build_stats):
+    """
+    Returns the cached statistics for the user and query parameters.
+    They are cached briefly, as some of them depend on the current time.
+    """
+    try:
+        version = get_list_version(model, user_id)
+        key = f"{model._meta.model_name}:{user_id}:stats:{version}:{get_params_hash(query_params)}"
+        stats = cache.get(key)
+    except Exception as e:
+        logger.warning("Stats cache lookup failed: %s", e)
+        return build_stats()
+    if stats is None:
+        stats = build_stats()
+        try:
+            cache.set(key, stats, timeout=settings.STATS_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning("Stats cache update failed: %s", e)
+    return stats
+
+
+purge_stats_key = "purge:last_run"
+
+
+def set_purge_stats(stats):
+    # Kept until the next run, the purge task runs in a worker process
+    try:
+        cache.set(purge_stats_key, stats, timeout=None)
+    except Exception as e:
+        logger.warning("Purge stats update failed: %s", e)
+
+
+def get_purge_stats():
+    try:
+        return cache.get(purge_stats_key)
+    except Exception as e:
+        logger.warning("Purge stats lookup failed: %s", e)
+        return None
@@ -0,0 +1,252 @@
+"""
+Streaming iCalendar (RFC 5545) parsing into Event field values.
+Only the properties that can be represented by an Event are read.
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TITLE = "Imported event"
+
+rrule_frequency_dict = {
+    "YEARLY": (1, "y"),
+    "MONTHLY": (1, "m"),
+    "WEEKLY": (7, "d"),
+    "DAILY": (1, "d"),
+    "HOURLY": (1, "h"),
+    "MINUTELY": (1, "min"),
+}
+supported_rrule_parts = ("FREQ", "INTERVAL", "COUNT", "WKST")
+
+
+def unfold_lines(lines):
+    """
+    Joins folded content lines (continuation lines start with a space or a tab).
+    Accepts any iterable of str or bytes lines, e.g. an open file.
+    """
+    current_line = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current_line is not None:
+            current_line += line[1:]
+            continue
+        if current_line is not None:
+            yield current_line
+        current_line = line
+    if current_line:
+        yield current_line
+
+
+def parse_content_line(line):
+    """
+    Splits a content line into its name, parameters and value.
+    Example of line: 'DTSTART;TZID=Europe/Vilnius:20240101T100000'.
+    Example of output: ('DTSTART', {'TZID': 'Europe/Vilnius'}, '20240101T100000').
+    """
+    name_and_params, _, value = line.partition(":")
+    name, *params = name_and_params.split(";")
+    params_dict = {}
+    for param in params:
+        key, _, param_value = param.partition("=")
+        params_dict[key.upper()] = param_value.strip('"')
+    return name.upper(), params_dict, value
+
+
+def unescape_text(value):
+    return (
+        value.replace("\\n", " ")
+        .replace("\\N", " ")
+        .replace("\\,", ",")
+        .replace("\\;", ";")
+        .replace("\\\\", "\\")
+    )
+
+
+def format_utc_offset(offset):
+    total_minutes = int(offset.total_seconds() // 60)
+    sign = "+" if total_minutes >= 0 else "-"
+    hours, minutes = divmod(abs(total_minutes), 60)
+    return f"{sign}{hours}:{minutes:02}" if minutes else f"{sign}{hours}"
+
+
+def parse_dtstart(params, value):
+    """Converts DTSTART into the date, time and utc_offset fields of an Event"""
+    # Slicing is used instead of strptime as it is considerably faster for large files,
+    # the datetime constructor still validates the values
+    date_object = datetime(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    fields = {"date": f"{value[:4]}-{value[4:6]}-{value[6:8]}"}
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        # Time and UTC offset are set from the user settings
+        return fields
+
+    if value[8:9] != "T":
+        raise ValueError(f"Invalid date-time: {value}")
+    datetime_object = date_object.replace(
+        hour=int(value[9:11]), minute=int(value[11:13])
+    )
+    fields["time"] = f"{value[9:11]}:{value[11:13]}"
+    if value.endswith("Z"):
+        fields["utc_offset"] = "+0"
+    elif "TZID" in params:
+        try:
+            timezone = ZoneInfo(params["TZID"])
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone: {params['TZID']}")
+        offset = datetime_object.replace(tzinfo=timezone).utcoffset()
+        fields["utc_offset"] = format_utc_offset(offset)
+    return fields
+
+
+def parse_rrule(value):
+    """
+    Converts RRULE into the interval and count fields of an Event.
+    Example of value: 'FREQ=WEEKLY;INTERVAL=2;COUNT=5'.
+    Example of output: {'interval': '14d', 'count': 5}.
+    """
+    parts = dict(part.partition("=")[::2] for part in value.upper().split(";") if part)
+    unsupported_parts = [part for part in parts if part not in supported_rrule_parts]
+    if unsupported_parts:
+        raise ValueError(
+            f"Unsupported recurrence rule parts: {', '.join(unsupported_parts)}"
+        )
+    if parts.get("FREQ") not in rrule_frequency_dict:
+        raise ValueError(f"Unsupported recurrence frequency: {parts.get('FREQ')}")
+    multiplier, units = rrule_frequency_dict[parts["FREQ"]]
+    interval = int(parts.get("INTERVAL", 1))
+    if interval < 1:
+        raise ValueError(f"Invalid recurrence interval: {interval}")
+    fields = {"interval": f"{interval * multiplier}{units}"}
+    if "COUNT" in parts:
+        count = int(parts["COUNT"])
+        if count < 2:
+            # A single occurrence is not recurring
+            return {}
+        fields["count"] = count
+    return fields
+
+
+def build_event_fields(properties):
+    if "DTSTART" not in properties:
+        raise ValueError("Event has no start date")
+    fields = {"title": unescape_text(properties.get("SUMMARY", ("", DEFAULT_TITLE))[1])}
+    fields["title"] = (fields["title"].strip() or DEFAULT_TITLE)[:100]
+    if "CATEGORIES" in properties:
+        category = unescape_text(properties["CATEGORIES"][1].split(",")[0]).strip()
+        if category:
+            fields["category"] = category[:70]
+    fields.update(parse_dtstart(*properties["DTSTART"]))
+    if "RRULE" in properties:
+        fields.update(parse_rrule(properties["RRULE"][1]))
+    return fields
+
+
+def parse_ics_events(lines):
+    """
+    Lazily parses VEVENT components from the lines of an iCalendar file.
+    Yields (fields, error) tuples: a dictionary of Event field values or an error message.
+    Only the properties of the current event are held in memory.
+    """
+    properties = None
+    nested_components = 0
+    for line in unfold_lines(lines):
+        name, params, value = parse_content_line(line)
+        if name == "BEGIN":
+            if value.upper() == "VEVENT":
+                properties = {}
+                nested_components = 0
+            elif properties is not None:
+                # E.g. VALARM inside VEVENT
+                nested_components += 1
+        elif name == "END":
+            if value.upper() == "VEVENT" and properties is not None:
+                try:
+                    yield build_event_fields(properties), None
+                except ValueError as e:
+                    title = properties.get("SUMMARY", ("", DEFAULT_TITLE))[1]
+                    yield None, f"{unescape_text(title)}: {e}"
+                properties = None
+            elif properties is not None:
+                nested_components -= 1
+        elif properties is not None and not nested_components:
+            properties.setdefault(name, (params, value))
+
+
+interval_units_dict = {
+    "y": "YEARLY",
+    "m": "MONTHLY",
+    "d": "DAILY",
+    "h": "HOURLY",
+    "min": "MINUTELY",
+}
+
+
+def escape_text(value):
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line):
+    # Content lines should not be longer than 75 octets, 73 characters keeps most lines within the limit
+    chunks = [line[i : i + 73] for i in range(0, len(line), 73)] or [""]
+    return "\r\n ".join(chunks) + "\r\n"
+
+
+def build_rrule(interval, count):
+    """
+    Converts the interval and count fields of an Event into an RRULE value.
+    Example of output: 'FREQ=DAILY;INTERVAL=14;COUNT=5'.
+    Returns None for zero intervals (saved before they were rejected), INTERVAL has to be positive.
+    """
+    number, units = int(interval.rstrip("ymdhin")), interval.lstrip("0123456789")
+    if number < 1:
+        return None
+    rrule = f"FREQ={interval_units_dict[units]};INTERVAL={number}"
+    if count:
+        rrule += f";COUNT={count}"
+    return rrule
+
+
+def render_vevent(event, dtstamp):
+    """Renders an event given as a dictionary of its id, title, category, interval, count and UTC start datetime"""
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{event['id']}@dont-forgetter.rest",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART:{event['start'].strftime('%Y%m%dT%H%M%SZ')}",
+        f"SUMMARY:{escape_text(event['title'])}",
+        f"CATEGORIES:{escape_text(event['category'])}",
+    ]
+    rrule = (
+        build_rrule(event["interval"], event["count"])
+        if event["interval"] != "-"
+        else None
+    )
+    if rrule:
+        lines.append(f"RRULE:{rrule}")
+    lines.append("END:VEVENT")
+    return "".join(fold_line(line) for line in lines)
+
+
+def render_ics_feed(events, dtstamp):
+    """
+    Renders an iCalendar feed. Recurring events are rendered with an RRULE,
+    so that calendar apps expand their occurrences themselves.
+    """
+    header = (
+        "BEGIN:VCALENDAR\r\n"
+        "VERSION:2.0\r\n"
+        "PRODID:-//dont-forgetter//events//EN\r\n"
+        "CALSCALE:GREGORIAN\r\n"
+        "X-WR-CALNAME:dont-forgetter\r\n"
+    )
+    return (
+        header
+        + "".join(render_vevent(event, dtstamp) for event in events)
+        + "END:VCALENDAR\r\n"
+    )
@@ -0,0 +1,65 @@
+"""
+Logging handlers and formatters used by settings.LOGGING.
+Loggers only put records on a queue (QueueListenerHandler), formatting and writing them
+to the console and the log file is done by a background thread, so that logging in the
+request and task code does not wait for I/O.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    A QueueHandler which starts a QueueListener passing its records to the given handlers,
+    each with its own level and formatter.
+    In LOGGING, handlers are referenced as "cfg://handlers.<name>" and have to be defined
+    before this handler (handlers are configured in the alphabetical order of their names).
+    """
+
+    def __init__(self, handlers):
+        super().__init__(queue.SimpleQueue())
+        # Items of the configuration list are converted to the handlers when accessed
+        handlers = [handlers[i] for i in range(len(handlers))]
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop_listener)
+        # Forked processes (e.g. Celery pool workers) don't inherit the listener thread
+        os.register_at_fork(after_in_child=self.restart_listener)
+
+    def prepare(self, record):
+        # The message is merged here, so its arguments (e.g. model instances) are not used
+        # in the listener thread. Unlike in QueueHandler, the exception is formatted there.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def stop_listener(self):
+        # Writes the queued records
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def restart_listener(self):
+        self.listener._thread = None
+        self.listener.start()
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as JSON objects, one per line, for log collectors"""
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": f"{record.module}.{record.funcName}",
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
@@ -0,0 +1,333 @@
+"""
+Prometheus metrics of the web and Celery worker processes.
+Each process updates its own counters in memory and periodically adds them to a hash in
+the shared cache (one pipelined round trip), from which /metrics renders the totals of all
+processes in the Prometheus text format. Updates only hold a per-metric lock for a dict update.
+"""
+import logging
+import math
+import threading
+import time
+
+from celery.signals import task_postrun, worker_process_shutdown
+from django.conf import settings
+from django.core.cache import cache
+
+# Not "from core.cache import ...", core.cache records metrics as well
+import core.cache
+
+logger = logging.getLogger(__name__)
+
+metrics_key = "metrics"
+
+# Seconds, suitable both for request latencies and for notification delays
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DELAY_BUCKETS = (1, 5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_series(name, labelnames, labelvalues, extra_labels=()):
+    """Example of output: 'http_requests_total{method="GET",status="200"}'"""
+    labels = list(zip(labelnames, labelvalues)) + list(extra_labels)
+    if not labels:
+        return name
+    return (
+        name
+        + "{"
+        + ",".join(f'{key}="{escape_label_value(value)}"' for key, value in labels)
+        + "}"
+    )
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def get_series_sort_key(series):
+    # Histogram buckets of a series are ordered by their upper bound, with +Inf last
+    name, le_label, rest = series.partition('le="')
+    if not le_label:
+        return series, 0
+    bound, _, labels_after = rest.partition('"')
+    return name + labels_after, math.inf if bound == "+Inf" else float(bound)
+
+
+class Metric:
+    """A metric with per-process values that are added to the shared cache by flush"""
+
+    type = None
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def get_labelvalues(self, labels):
+        return tuple(labels[labelname] for labelname in self.labelnames)
+
+    def series_names(self):
+        return (self.name,)
+
+    def take_values(self):
+        # Swaps the values accumulated since the last flush
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def get_updates(self):
+        """Returns (operation, series, value) tuples, operation is 'incr' or 'set'"""
+        return [
+            ("incr", format_series(self.name, self.labelnames, labelvalues), value)
+            for labelvalues, value in self.take_values().items()
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        labelvalues = self.get_labelvalues(labels)
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+
+class Gauge(Metric):
+    """A gauge set to the last value reported by any process"""
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        labelvalues = self.get_labelvalues(labels)
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def get_updates(self):
+        return [
+            ("set", format_series(self.name, self.labelnames, labelvalues), value)
+            for labelvalues, value in self.take_values().items()
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def series_names(self):
+        return (f"{self.name}_bucket", f"{self.name}_sum", f"{self.name}_count")
+
+    def observe(self, value, **labels):
+        labelvalues = self.get_labelvalues(labels)
+        # Index of the first bucket the value fits in, bucket counts are made cumulative by flush
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            counts = self._values.get(labelvalues)
+            if counts is None:
+                counts = self._values[labelvalues] = [0] * len(self.buckets) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def get_updates(self):
+        updates = []
+        for labelvalues, counts in self.take_values().items():
+            cumulative_count = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative_count += count
+                # Empty buckets are written as well, so that all series have every bucket
+                series = format_series(
+                    f"{self.name}_bucket",
+                    self.labelnames,
+                    labelvalues,
+                    [("le", format_value(bound))],
+                )
+                updates.append(("incr", series, cumulative_count))
+            updates.append(
+                (
+                    "incr",
+                    format_series(f"{self.name}_sum", self.labelnames, labelvalues),
+                    counts[-1],
+                )
+            )
+            updates.append(
+                (
+                    "incr",
+                    format_series(f"{self.name}_count", self.labelnames, labelvalues),
+                    cumulative_count,
+                )
+            )
+        return updates
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self._last_flush = time.monotonic()
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def clear(self):
+        # Drops the values that have not been flushed
+        for metric in self.metrics:
+            metric.take_values()
+
+    def flush(self):
+        """Adds the values of this process to the shared cache"""
+        self._last_flush = time.monotonic()
+        updates = [update for metric in self.metrics for update in metric.get_updates()]
+        if not updates:
+            return
+        try:
+            write_updates(updates)
+        except Exception as e:
+            logger.warning("Metrics flush failed: %s", e)
+
+    def flush_if_due(self):
+        if time.monotonic() - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        # Only one thread of the process flushes, the others carry on
+        if self._flush_lock.acquire(blocking=False):
+            try:
+                self.flush()
+            finally:
+                self._flush_lock.release()
+
+    def render(self):
+        """Renders the totals of all processes in the Prometheus text format"""
+        values = read_values()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            series_names = metric.series_names()
+            lines.extend(
+                f"{series} {format_value(values[series])}"
+                for series in sorted(values, key=get_series_sort_key)
+                if series.partition("{")[0] in series_names
+            )
+        return "\n".join(lines) + "\n"
+
+
+def write_updates(updates):
+    client = core.cache.get_redis_client()
+    if client is not None:
+        key = cache.make_and_validate_key(metrics_key)
+        pipeline = client.pipeline(transaction=False)
+        for operation, series, value in updates:
+            if operation == "set":
+                pipeline.hset(key, series, value)
+            else:
+                pipeline.hincrbyfloat(key, series, value)
+        pipeline.execute()
+        return
+    # Other cache backends (e.g. in tests) are not updated atomically
+    values = cache.get(metrics_key, {})
+    for operation, series, value in updates:
+        values[series] = value if operation == "set" else values.get(series, 0) + value
+    cache.set(metrics_key, values, timeout=None)
+
+
+def read_values():
+    client = core.cache.get_redis_client()
+    if client is not None:
+        values = client.hgetall(cache.make_and_validate_key(metrics_key))
+        return {series.decode(): float(value) for series, value in values.items()}
+    return cache.get(metrics_key, {})
+
+
+registry = MetricsRegistry()
+
+# Scheduler
+heartbeat_duration = Histogram(
+    "heartbeat_duration_seconds", "Duration of the heartbeat task"
+)
+heartbeat_due_events = Gauge(
+    "heartbeat_due_events", "Number of due events found by the last heartbeat"
+)
+heartbeat_due_events_total = Counter(
+    "heartbeat_due_events_total", "Number of due events found by heartbeats"
+)
+
+# Delivery
+notification_enqueue_latency = Histogram(
+    "notification_enqueue_latency_seconds",
+    "Time from the heartbeat enqueueing a notification to its task starting",
+    buckets=DELAY_BUCKETS,
+)
+notification_lateness = Histogram(
+    "notification_lateness_seconds",
+    "Time from the scheduled time of an event to its notification being sent",
+    buckets=DELAY_BUCKETS,
+)
+notification_send_duration = Histogram(
+    "notification_send_duration_seconds",
+    "Duration of sending a notification through its provider",
+    ["provider"],
+)
+notifications_sent_total = Counter(
+    "notifications_sent_total", "Number of notifications sent", ["provider"]
+)
+notification_errors_total = Counter(
+    "notification_errors_total", "Number of failed notification sends", ["provider"]
+)
+notification_quota_rejections_total = Counter(
+    "notification_quota_rejections_total",
+    "Number of notifications not sent because the user had none left",
+    ["notification_type"],
+)
+
+# API
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Duration of HTTP requests",
+    ["method", "endpoint"],
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries",
+    "Number of database queries per HTTP request",
+    ["method", "endpoint"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+http_requests_total = Counter(
+    "http_requests_total", "Number of HTTP requests", ["method", "endpoint", "status"]
+)
+list_cache_requests_total = Counter(
+    "list_cache_requests_total",
+    "Number of list cache lookups by result (hit or miss)",
+    ["result"],
+)
+list_cache_duration = Histogram(
+    "list_cache_duration_seconds",
+    "Duration of list cache lookups, including building the list on a miss",
+    ["result"],
+)
+
+
+# Maintenance
+purge_last_run_rows = Gauge(
+    "purge_last_run_rows",
+    "Number of rows deleted from each table by the last purge",
+    ["table"],
+)
+
+
+@task_postrun.connect
+def flush_task_metrics(**kwargs):
+    registry.flush_if_due()
+
+
+@worker_process_shutdown.connect
+def flush_worker_metrics(**kwargs):
+    registry.flush()
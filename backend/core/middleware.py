@@ -0,0 +1,160 @@
+import cProfile
+import hmac
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from core import metrics
+from core.profiling import SQLTimer, save_profile
+from core.queries import log_queries, record_queries
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency and the number of database queries of each request per endpoint
+    (the URL pattern, so that the number of series is bounded).
+    Queries are only counted for synchronous views, async views query in other threads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        query_counter = QueryCounter()
+        start_time = time.perf_counter()
+        with connection.execute_wrapper(query_counter):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start_time, query_counter)
+        return response
+
+    async def __acall__(self, request):
+        start_time = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start_time)
+        return response
+
+    def record(self, request, response, duration, query_counter=None):
+        match = request.resolver_match
+        labels = {
+            "method": request.method,
+            "endpoint": match.route if match is not None else "unmatched",
+        }
+        metrics.http_request_duration.observe(duration, **labels)
+        if query_counter is not None:
+            metrics.http_request_db_queries.observe(query_counter.count, **labels)
+        metrics.http_requests_total.inc(status=response.status_code, **labels)
+        metrics.registry.flush_if_due()
+
+
+class QueryCounter:
+    """A connection.execute_wrapper which counts the executed queries"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ProfilerMiddleware:
+    """
+    Profiles requests with the X-Profile header, and a random sample
+    (settings.PROFILER_SAMPLE_RATE) of all requests, with the duration of each SQL statement.
+    The header is accepted from staff users logged in with a session, or with
+    settings.PROFILER_TOKEN as its value, since API views authenticate after the profiler starts.
+    The profiles are saved by core.profiling and can be downloaded in the admin.
+    Other requests only pay for a header lookup. Async requests are not profiled.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def is_profile_requested(request):
+        value = request.META.get("HTTP_X_PROFILE")
+        if value is None:
+            return False
+        if settings.PROFILER_TOKEN and hmac.compare_digest(
+            value.encode(), settings.PROFILER_TOKEN.encode()
+        ):
+            return True
+        # The user of the session, set by AuthenticationMiddleware
+        return request.user.is_staff
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        requested = self.is_profile_requested(request)
+        sample_rate = settings.PROFILER_SAMPLE_RATE
+        sampled = bool(sample_rate) and random.random() < sample_rate
+        if not requested and not sampled:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        sql_timer = SQLTimer()
+        start_time = time.perf_counter()
+        with connection.execute_wrapper(sql_timer):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start_time
+
+        # API views set the user they authenticated on the request as well
+        user = getattr(request, "user", None)
+        info = {
+            "method": request.method,
+            "path": request.path,
+            "user": user.pk if user and user.is_authenticated else None,
+            "status": response.status_code,
+            "duration": duration,
+            "sql": sql_timer.as_list(),
+        }
+        try:
+            profile_id = save_profile(profiler, info)
+        except OSError as e:
+            logger.warning("Saving a profile failed: %s", e)
+            return response
+        # Sampled requests are not told that they were profiled
+        if requested:
+            response["X-Profile-Id"] = profile_id
+        return response
+
+
+class QueryDebugMiddleware:
+    """
+    Logs the number of database queries of each request, with a warning for statements
+    repeated QUERY_REPEAT_THRESHOLD times (N+1 queries). Only used in QUERY_DEBUG mode.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        log_queries(f"{request.method} {request.path}", recorder)
+        return response
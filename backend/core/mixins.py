@@ -0,0 +1,66 @@
+class DirtyFieldsMixin:
+    """
+    Model mixin which remembers the field values loaded from the database.
+    Saves of loaded instances only write the changed columns (update_fields)
+    and issue no query at all if nothing has changed.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._store_loaded_values(fields)
+
+    def _store_loaded_values(self, fields=None):
+        loaded_values = getattr(self, "_loaded_values", {})
+        for field in self._meta.concrete_fields:
+            if fields is not None and not {field.name, field.attname} & set(fields):
+                continue
+            if field.attname in self.__dict__:
+                loaded_values[field.attname] = self.__dict__[field.attname]
+        self._loaded_values = loaded_values
+
+    def get_dirty_fields(self):
+        """
+        Returns the set of changed field attnames (e.g. 'user_id'),
+        or None if the instance has not been loaded from or saved to the database.
+        """
+        if self._state.adding or not hasattr(self, "_loaded_values"):
+            return None
+        dirty_fields = set()
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                # Deferred and not assigned
+                continue
+            value = self.__dict__[field.attname]
+            if (
+                field.attname not in self._loaded_values
+                or self._loaded_values[field.attname] != value
+            ):
+                dirty_fields.add(field.attname)
+        return dirty_fields
+
+    def save(self, *args, **kwargs):
+        dirty_fields = self.get_dirty_fields()
+        if (
+            dirty_fields is not None
+            and not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            dirty_fields.discard(self._meta.pk.attname)
+            if not dirty_fields:
+                return
+            # Fields such as updated_at are only set on save if they are included
+            dirty_fields.update(
+                field.attname
+                for field in self._meta.concrete_fields
+                if getattr(field, "auto_now", False)
+            )
+            kwargs["update_fields"] = dirty_fields
+        super().save(*args, **kwargs)
+        self._store_loaded_values(kwargs.get("update_fields"))
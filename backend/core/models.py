@@ -1,10 +1,15 @@
+import calendar
+import math
 import re
 from datetime import datetime, timedelta, timezone
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
 from rest_framework import serializers
 
+from core.mixins import DirtyFieldsMixin
 from core.validators import (
     count_validator,
     custom_variables_validator,
@@ -17,7 +22,20 @@ from core.validators import (
     units_translation_dict,
     utc_offset_validator,
 )
-from users.models import UserSettings
+from users.cache import get_user_settings
+
+
+def search_indexes(prefix, *fields):
+    # Full-text GIN indexes are only available on PostgreSQL
+    if settings.DATABASES["default"]["ENGINE"] != "django.db.backends.postgresql":
+        return []
+    return [
+        GinIndex(
+            SearchVector(field, config=settings.SEARCH_CONFIG),
+            name=f"{prefix}_{field}_search_idx",
+        )
+        for field in fields
+    ]
 
 
 def parse_notice_time_or_interval(value):
@@ -26,6 +44,14 @@ def parse_notice_time_or_interval(value):
     return {units: int(number)}
 
 
+def is_recurring(interval):
+    # Zero intervals were accepted before the validator rejected them, such events occur once
+    if interval == "-":
+        return False
+    ((_, number),) = parse_notice_time_or_interval(interval).items()
+    return number > 0
+
+
 def apply_utc_offset(utc_offset, datetime_object, reverse=False):
     plus_or_minus = -1 if utc_offset[0] == "+" else 1
     if reverse:
@@ -41,6 +67,63 @@ def apply_utc_offset(utc_offset, datetime_object, reverse=False):
     return utc_datetime
 
 
+def add_interval(datetime_object, interval, times=1):
+    """Adds the interval (e.g. '1m') the given number of times, months are added in calendar steps"""
+    ((units, number),) = parse_notice_time_or_interval(interval).items()
+    if units in ("years", "months"):
+        month_index = (
+            datetime_object.month - 1 + number * times * (12 if units == "years" else 1)
+        )
+        year = datetime_object.year + month_index // 12
+        month = month_index % 12 + 1
+        # E.g. Jan 31 + 1 month = Feb 28/29
+        day = min(datetime_object.day, calendar.monthrange(year, month)[1])
+        return datetime_object.replace(year=year, month=month, day=day)
+    return datetime_object + timedelta(**{units: number * times})
+
+
+def get_next_occurrence(datetime_object, interval, not_before):
+    """
+    Returns the first occurrence of a recurring datetime that is not before not_before
+    and the number of intervals added to reach it.
+    """
+    if datetime_object >= not_before:
+        return datetime_object, 0
+    ((units, number),) = parse_notice_time_or_interval(interval).items()
+    if number < 1:
+        raise ValueError(f"Invalid interval: {interval}")
+    if units in ("years", "months"):
+        months = number * (12 if units == "years" else 1)
+        month_difference = (not_before.year - datetime_object.year) * 12 + (
+            not_before.month - datetime_object.month
+        )
+        steps = max(month_difference // months, 1)
+    else:
+        steps = math.ceil((not_before - datetime_object) / timedelta(**{units: number}))
+    # Clamped month ends can make the estimate one step short
+    while add_interval(datetime_object, interval, steps) < not_before:
+        steps += 1
+    return add_interval(datetime_object, interval, steps), steps
+
+
+def expand_occurrences(local_datetime, interval, count, window_start, window_end):
+    """
+    Yields the local datetimes of a recurring event's occurrences that are within the window (inclusive).
+    The first occurrence in the window is calculated directly instead of stepping through the earlier ones.
+    """
+    if not is_recurring(interval):
+        if window_start <= local_datetime <= window_end:
+            yield local_datetime
+        return
+    _, steps = get_next_occurrence(local_datetime, interval, window_start)
+    while not count or steps < count:
+        occurrence = add_interval(local_datetime, interval, steps)
+        if occurrence > window_end:
+            return
+        yield occurrence
+        steps += 1
+
+
 def get_utc_timestamp(local_date, local_time, utc_offset, notice_time):
     datetime_str = f"{local_date} {local_time}"
     datetime_object = datetime.strptime(datetime_str, "%Y-%m-%d %H:%M").replace(
@@ -52,7 +135,7 @@ def get_utc_timestamp(local_date, local_time, utc_offset, notice_time):
     return int(utc_datetime.timestamp())
 
 
-class Event(models.Model):
+class Event(DirtyFieldsMixin, models.Model):
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -89,8 +172,29 @@ class Event(models.Model):
         default=settings.MAX_NOTIFICATION_RETRIES
     )
 
+    # Fields that the UTC timestamp is calculated from
+    timestamp_fields = {"date", "time", "utc_offset", "notice_time"}
+    # Fields that are validated or set from the user and their defaults on save
+    prepared_fields = timestamp_fields | {"user_id", "recipient", "notification_type"}
+
+    class Meta:
+        indexes = search_indexes("event", "title")
+
     def save(self, *args, **kwargs):
-        user_settings = UserSettings.objects.get(user=self.user)
+        dirty_fields = self.get_dirty_fields()
+        if dirty_fields is None or dirty_fields & self.prepared_fields:
+            self.prepare(
+                get_user_settings(self.user),
+                update_timestamp=(
+                    dirty_fields is None or bool(dirty_fields & self.timestamp_fields)
+                ),
+            )
+        else:
+            self.validate_count()
+        super(Event, self).save(*args, **kwargs)
+
+    def prepare(self, user_settings, update_timestamp=True):
+        """Applies user defaults, validates the event and calculates its UTC timestamp"""
         if not self.time:
             self.time = user_settings.default_time
         if not self.utc_offset:
@@ -101,10 +205,13 @@ class Event(models.Model):
         self.validate_and_set_recipient()
         self.validate_count()
 
-        self.utc_timestamp = get_utc_timestamp(
-            str(self.date), str(self.time), str(self.utc_offset), str(self.notice_time)
-        )
-        super(Event, self).save(*args, **kwargs)
+        if update_timestamp:
+            self.utc_timestamp = get_utc_timestamp(
+                str(self.date),
+                str(self.time),
+                str(self.utc_offset),
+                str(self.notice_time),
+            )
 
     def validate_and_set_recipient(self):
         if self.notification_type == "sms":
@@ -130,7 +237,7 @@ class Event(models.Model):
             )
 
     def __str__(self):
-        return f"ID{self.pk}({self.user.pk})|{self.category} - {self.title}"
+        return f"ID{self.pk}({self.user_id})|{self.category} - {self.title}"
 
 
 class Note(models.Model):
@@ -145,6 +252,9 @@ class Note(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = search_indexes("note", "title", "info")
+
     def save(self, *args, **kwargs):
         if not self.title:
             self.title = (
@@ -155,4 +265,32 @@ class Note(models.Model):
         super(Note, self).save(*args, **kwargs)
 
     def __str__(self):
-        return f"ID{self.pk}({self.user.pk})|{self.category} - {self.title}"
+        return f"ID{self.pk}({self.user_id})|{self.category} - {self.title}"
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only log of event and note changes used for incremental syncing.
+    The primary key serves as a monotonic change sequence. Ids are allocated when a change
+    is recorded rather than committed, so the changes newer than CHANGES_SETTLE_SECONDS
+    are not returned yet (see APIChangesView). Changes are kept for CHANGE_LOG_RETENTION_DAYS.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    # No database constraint, so that changes logged while a user is being deleted don't break the deletion
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False
+    )
+    model = models.CharField(max_length=10)
+    object_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "model", "id"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk}({self.user_id})|{self.model} ID{self.object_id}"
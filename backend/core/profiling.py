@@ -0,0 +1,90 @@
+"""
+Request profiles, recorded by ProfilerMiddleware for staff requests with the X-Profile header
+and for a sample of all requests (settings.PROFILER_SAMPLE_RATE).
+Each profile is a cProfile stats file with a JSON file of the request and its SQL timings.
+Only the newest PROFILER_MAX_PROFILES profiles are kept in PROFILER_DIR.
+"""
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+profile_id_regex = re.compile(r"^\d{8}T\d{12}-[0-9a-f]{8}$")
+
+
+class SQLTimer:
+    """A connection.execute_wrapper which records the duration of each query"""
+
+    def __init__(self):
+        self.timings = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            count, total = self.timings.get(sql, (0, 0.0))
+            self.timings[sql] = (count + 1, total + time.perf_counter() - start_time)
+
+    def as_list(self):
+        # Slowest statements first
+        return [
+            {"sql": sql, "count": count, "seconds": total}
+            for sql, (count, total) in sorted(
+                self.timings.items(), key=lambda item: item[1][1], reverse=True
+            )
+        ]
+
+
+def new_profile_id():
+    # Profile ids are ordered by time, e.g. 20240101T100000123456-1a2b3c4d
+    now = datetime.now(timezone.utc)
+    return f"{now:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+
+
+def get_profile_path(profile_id, extension):
+    if not profile_id_regex.match(profile_id):
+        raise ValueError("Invalid profile id")
+    return os.path.join(settings.PROFILER_DIR, f"{profile_id}.{extension}")
+
+
+def save_profile(profiler, info):
+    """Saves a profile and removes the oldest ones above PROFILER_MAX_PROFILES. Returns its id"""
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    profile_id = new_profile_id()
+    profiler.dump_stats(get_profile_path(profile_id, "prof"))
+    # The info file is written last, so listed profiles are complete
+    with open(get_profile_path(profile_id, "json"), "w") as file:
+        json.dump(info, file)
+    for old_profile_id in list_profile_ids()[settings.PROFILER_MAX_PROFILES :]:
+        delete_profile(old_profile_id)
+    return profile_id
+
+
+def list_profile_ids():
+    """Returns the ids of the saved profiles, newest first"""
+    try:
+        file_names = os.listdir(settings.PROFILER_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (name[:-5] for name in file_names if name.endswith(".json")), reverse=True
+    )
+
+
+def load_profile_info(profile_id):
+    with open(get_profile_path(profile_id, "json")) as file:
+        return json.load(file)
+
+
+def delete_profile(profile_id):
+    # The info file is removed first, so the profile is no longer listed
+    for extension in ("json", "prof"):
+        try:
+            os.remove(get_profile_path(profile_id, extension))
+        except FileNotFoundError:
+            pass
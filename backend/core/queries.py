@@ -0,0 +1,109 @@
+"""
+Database query recording, for query budgets in tests and the QUERY_DEBUG mode.
+Statements are recorded without their parameters, so a statement that is executed
+repeatedly (e.g. once per row of a previous query) shows up as an N+1 pattern.
+In QUERY_DEBUG mode, the queries of each request (QueryDebugMiddleware) and of each
+Celery task are logged, with a warning for repeated statements.
+"""
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """A connection.execute_wrapper which counts the executions of each statement"""
+
+    def __init__(self):
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements[sql] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return sum(self.statements.values())
+
+    def get_repeated(self, threshold=None):
+        """Returns the statements executed at least threshold times, most repeated first"""
+        if threshold is None:
+            threshold = settings.QUERY_REPEAT_THRESHOLD
+        return [
+            (sql, count)
+            for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+    def format_statements(self):
+        return "\n".join(
+            f"{count}x {sql}" for sql, count in self.statements.most_common()
+        )
+
+
+@contextmanager
+def record_queries():
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        yield recorder
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries, max_repeats=None):
+    """
+    Fails with QueryBudgetExceeded if the block executes more than max_queries queries,
+    or a statement more than max_repeats times (by default, as often as QUERY_REPEAT_THRESHOLD).
+    """
+    if max_repeats is None:
+        max_repeats = settings.QUERY_REPEAT_THRESHOLD - 1
+    with record_queries() as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{recorder.count} queries executed, the budget is {max_queries}:\n"
+            f"{recorder.format_statements()}"
+        )
+    repeated = recorder.get_repeated(threshold=max_repeats + 1)
+    if repeated:
+        raise QueryBudgetExceeded(
+            f"Statements executed more than {max_repeats} times (N+1 queries):\n"
+            + "\n".join(f"{count}x {sql}" for sql, count in repeated)
+        )
+
+
+def log_queries(name, recorder):
+    logger.info("%s: %d queries", name, recorder.count)
+    for sql, count in recorder.get_repeated():
+        logger.warning("%s: statement executed %d times: %s", name, count, sql)
+
+
+# Recorders of the running Celery tasks by task id
+task_recorders = {}
+
+
+@task_prerun.connect
+def start_task_query_recording(task_id=None, **kwargs):
+    if not settings.QUERY_DEBUG:
+        return
+    recorder = QueryRecorder()
+    # Tasks run in the thread of their signals, with its database connection
+    connection.execute_wrappers.append(recorder)
+    task_recorders[task_id] = recorder
+
+
+@task_postrun.connect
+def stop_task_query_recording(task_id=None, task=None, **kwargs):
+    recorder = task_recorders.pop(task_id, None)
+    if recorder is None:
+        return
+    connection.execute_wrappers.remove(recorder)
+    log_queries(task.name, recorder)
@@ -1,10 +1,107 @@
+import functools
+from collections import namedtuple
+
 from django.conf import settings
-from rest_framework import serializers
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
 from core.models import Event, Note
 
+ValuesPlan = namedtuple("ValuesPlan", ("columns", "names", "fields"))
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    A ModelSerializer that takes additional arguments:
+    'fields' - limits the output to the given field names,
+    'preview' - replaces the Meta.preview_fields with their '<field>_preview' annotations.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        preview = kwargs.pop("preview", False)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                if not self.fields[field_name].write_only:
+                    self.fields.pop(field_name)
+        if preview:
+            for field_name in getattr(self.Meta, "preview_fields", ()):
+                if field_name in self.fields:
+                    self.fields[field_name] = serializers.CharField(
+                        source=f"{field_name}_preview", read_only=True
+                    )
+
+    @classmethod
+    def get_readable_fields(cls):
+        return list(cls.get_values_plan().names)
+
+    # Fields whose database values are already in their serialized form
+    plain_field_classes = (
+        serializers.CharField,
+        serializers.IntegerField,
+        serializers.BooleanField,
+    )
+
+    @classmethod
+    @functools.lru_cache(maxsize=128)
+    def get_values_plan(cls, fields=None, preview=False):
+        """
+        Returns the columns to select with values_list(), the output names and the readable fields.
+        Building the fields of a ModelSerializer involves model introspection,
+        so the result is cached per fields tuple and preview flag.
+        """
+        serializer = cls(fields=fields, preview=preview)
+        readable_fields = tuple(serializer._readable_fields)
+        return ValuesPlan(
+            columns=tuple(field.source for field in readable_fields),
+            names=tuple(field.field_name for field in readable_fields),
+            fields=readable_fields,
+        )
+
+    @classmethod
+    def get_converter(cls, field):
+        # Returns None for fields whose values do not need to be converted
+        if isinstance(field, cls.plain_field_classes):
+            return None
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        if isinstance(field, serializers.DateTimeField) and output_format == ISO_8601:
+            # Same output as to_representation(), which looks up the time zone for every value
+            field_timezone = getattr(field, "timezone", field.default_timezone())
+            if field_timezone is not None:
+
+                def to_iso_8601(value):
+                    if timezone.is_naive(value):
+                        return field.to_representation(value)
+                    value = value.astimezone(field_timezone).isoformat()
+                    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+                return to_iso_8601
+        return field.to_representation
+
+    @classmethod
+    def values_list_data(cls, rows, plan):
+        """
+        Read-only fast path for list responses.
+        Builds the same dicts as .data straight from values_list(*plan.columns) rows,
+        without creating model instances or calling to_representation() for plain fields.
+        """
+        names = plan.names
+        converters = [cls.get_converter(field) for field in plan.fields]
+        if not any(converters):
+            return [dict(zip(names, row)) for row in rows]
+        return [
+            {
+                name: value if converter is None or value is None else converter(value)
+                for name, converter, value in zip(names, converters, row)
+            }
+            for row in rows
+        ]
+
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(DynamicFieldsModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
     notification_retries_left = serializers.HiddenField(
         default=settings.MAX_NOTIFICATION_RETRIES
@@ -15,9 +112,10 @@ class EventSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(DynamicFieldsModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = Note
         fields = "__all__"
+        preview_fields = ("info",)
@@ -0,0 +1,62 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import bump_list_version
+from core.models import ChangeLog, Event, Note
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_cached_lists(sender, instance, **kwargs):
+    # After the commit, so that a list read before it cannot be cached under the new version
+    transaction.on_commit(partial(bump_list_version, sender, instance.user_id))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Note)
+def log_saved_change(sender, instance, **kwargs):
+    ChangeLog.objects.create(
+        user_id=instance.user_id,
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+    )
+
+
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Note)
+def log_deleted_change(sender, instance, **kwargs):
+    ChangeLog.objects.create(
+        user_id=instance.user_id,
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        deleted=True,
+    )
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_change_log(sender, instance, **kwargs):
+    ChangeLog.objects.filter(user_id=instance.pk).delete()
+
+
+def record_bulk_changes(model, user_id, object_ids, deleted=False):
+    """Does the work of the receivers above for bulk operations, which don't send model signals"""
+    if not object_ids:
+        return
+    ChangeLog.objects.bulk_create(
+        [
+            ChangeLog(
+                user_id=user_id,
+                model=model._meta.model_name,
+                object_id=object_id,
+                deleted=deleted,
+            )
+            for object_id in object_ids
+        ]
+    )
+    transaction.on_commit(partial(bump_list_version, model, user_id))
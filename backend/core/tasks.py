@@ -1,5 +1,6 @@
 import logging
 import os
+import time
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta, timezone
 
@@ -7,9 +8,29 @@ import requests
 from celery import shared_task
 from django.conf import settings
 from django.core.mail import send_mail
-
-from core.models import Event, apply_utc_offset, parse_notice_time_or_interval
-from users.models import CustomUser
+from django.db import transaction
+from django.db.models import Max
+from rest_framework import serializers
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from core import metrics
+from core.cache import set_purge_stats
+from core.ics import parse_ics_events
+from core.models import (
+    ChangeLog,
+    Event,
+    Note,
+    apply_utc_offset,
+    get_next_occurrence,
+    is_recurring,
+    parse_notice_time_or_interval,
+)
+from core.signals import record_bulk_changes
+from users.cache import get_user_settings, invalidate_users
+from users.models import CustomUser, get_quota_period
 
 logger = logging.getLogger(__name__)
 
@@ -121,14 +142,14 @@ class SMSNotification(NotificationStrategy):
             params = {
                 "api_key": vonage_api_key,
                 "api_secret": vonage_api_secret,
-                "from": self.event.user.usersettings.sms_sender_name,
+                "from": get_user_settings(self.event.user).sms_sender_name,
                 "to": self.event.recipient,
                 "text": self.message,
             }
             response = session.post(url, data=params)
-            logger.info(f"SMS response: {response.json()}")
+            logger.info("SMS response: %s", response.json())
             if response.json()["messages"][0]["status"] == "0":
-                logger.info(f"SMS sent")
+                logger.info("SMS sent")
                 return True
             else:
                 logger.warning("SMS sending failed")
@@ -147,16 +168,17 @@ class NotificationService:
         self.strategy = strategy(self.event)
 
     def send_notification(self):
+        self.event.user.refill_notifications()
         if (
             getattr(
                 self.event.user, f"{self.event.notification_type}_notifications_left"
             )
             > 0
         ):
-            logger.info(f"{self.event} - Sending notification")
-            logger.info(f"{self.event.date} {self.event.time}")
+            logger.info("%s - Sending notification", self.event)
+            logger.info("%s %s", self.event.date, self.event.time)
 
-            notification_sent = self.strategy.send_notification()
+            notification_sent = self.send_with_metrics()
             if notification_sent:
                 if self.event.interval != "-" and self.event.count:
                     self.event.count -= 1
@@ -170,15 +192,39 @@ class NotificationService:
                     self.event.save()
                     return False
                 return True
+        metrics.notification_quota_rejections_total.inc(
+            notification_type=self.event.notification_type
+        )
         return True
 
+    def send_with_metrics(self):
+        provider = self.event.notification_type
+        start_time = time.perf_counter()
+        try:
+            notification_sent = self.strategy.send_notification()
+        except Exception:
+            metrics.notification_errors_total.inc(provider=provider)
+            raise
+        finally:
+            metrics.notification_send_duration.observe(
+                time.perf_counter() - start_time, provider=provider
+            )
+        if notification_sent:
+            metrics.notifications_sent_total.inc(provider=provider)
+            metrics.notification_lateness.observe(
+                max(time.time() - self.event.utc_timestamp, 0)
+            )
+        else:
+            metrics.notification_errors_total.inc(provider=provider)
+        return notification_sent
+
     def decrement_notifications_left(self):
         result = True
         notifications_left = getattr(
             self.event.user, f"{self.event.notification_type}_notifications_left"
         )
         if notifications_left == 1:
-            logger.info(f"Event {self.event} rejected due to notification limit")
+            logger.info("Event %s rejected due to notification limit", self.event)
             self.send_notification_limit_email()
             result = False
         notifications_left -= 1
@@ -217,18 +263,18 @@ class NotificationEvent:
         self.current_utc_timestamp = current_utc_timestamp
 
     def reschedule_or_delete_event(self):
-        if self.event.interval == "-" or self.event.count == 0:
-            logger.info(f"{self.event} - Deleting")
+        if not is_recurring(self.event.interval) or self.event.count == 0:
+            logger.info("%s - Deleting", self.event)
             self.event.delete()
         else:
             self.reschedule_event()
 
     def reschedule_event(self):
-        logger.info(f"{self.event} - Rescheduling")
+        logger.info("%s - Rescheduling", self.event)
         new_date, new_time = self.get_new_date_and_time()
         self.event.date = new_date
         self.event.time = new_time
-        logger.info(f"New: {self.event.date} {self.event.time}")
+        logger.info("New: %s %s", self.event.date, self.event.time)
         self.event.notification_retries_left = settings.MAX_NOTIFICATION_RETRIES
         self.event.save()
 
@@ -256,8 +302,13 @@ class NotificationEvent:
 
 @shared_task()
 def send_notification_and_reschedule_or_delete_event(event_pk, current_utc_timestamp):
+    # The heartbeat enqueues the task with its current time
+    metrics.notification_enqueue_latency.observe(
+        max(time.time() - current_utc_timestamp, 0)
+    )
     try:
-        event = Event.objects.get(pk=event_pk)
+        # The user and their settings are needed for sending and rescheduling
+        event = Event.objects.select_related("user__usersettings").get(pk=event_pk)
         not_to_be_retried = NotificationService(event).send_notification()
         if not_to_be_retried:
             NotificationEvent(event, current_utc_timestamp).reschedule_or_delete_event()
@@ -270,17 +321,21 @@ def send_notification_and_reschedule_or_delete_event(event_pk, current_utc_times
 @shared_task()
 def heartbeat():
     try:
+        start_time = time.perf_counter()
         current_datetime = datetime.now(timezone.utc)
         current_utc_timestamp = int(current_datetime.timestamp())
-        logger.info(f"HEARTBEAT. UTC: {current_utc_timestamp}")
+        logger.info("HEARTBEAT. UTC: %s", current_utc_timestamp)
         expired_events = Event.objects.filter(utc_timestamp__lt=current_utc_timestamp)
         result = []
         for event in expired_events:
-            logger.info(f"{event} - Expired")
+            logger.debug("%s - Expired", event)
             task_id = send_notification_and_reschedule_or_delete_event.delay(
                 event.pk, current_utc_timestamp
             ).id
             result.append(task_id)
+        metrics.heartbeat_due_events.set(len(result))
+        metrics.heartbeat_due_events_total.inc(len(result))
+        metrics.heartbeat_duration.observe(time.perf_counter() - start_time)
         return result
     except Exception as e:
         logger.exception(e)
@@ -289,7 +344,229 @@ def heartbeat():
 
 @shared_task()
 def reset_notifications_left():
-    CustomUser.objects.all().update(
-        email_notifications_left=settings.NO_OF_FREE_EMAIL_NOTIFICATIONS,
-        sms_notifications_left=settings.NO_OF_FREE_SMS_NOTIFICATIONS,
+    """
+    Refills the notification quotas of all users, e.g. after the number of free notifications
+    has changed. Monthly refills are done on first use (CustomUser.refill_notifications).
+    Users are updated in primary key ranges of QUOTA_RESET_BATCH_SIZE with pauses in between,
+    so that quota updates of delivery tasks are not blocked for long.
+    """
+    quota_period = get_quota_period()
+    last_pk = 0
+    while True:
+        pks = list(
+            CustomUser.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[: settings.QUOTA_RESET_BATCH_SIZE]
+        )
+        if not pks:
+            break
+        CustomUser.objects.filter(pk__gte=pks[0], pk__lte=pks[-1]).update(
+            email_notifications_left=settings.NO_OF_FREE_EMAIL_NOTIFICATIONS,
+            sms_notifications_left=settings.NO_OF_FREE_SMS_NOTIFICATIONS,
+            quota_period=quota_period,
+        )
+        invalidate_users(pks)
+        last_pk = pks[-1]
+        if len(pks) < settings.QUOTA_RESET_BATCH_SIZE:
+            break
+        time.sleep(settings.QUOTA_RESET_PAUSE)
+
+
+def advance_recurring_event(event, current_utc_timestamp):
+    """
+    Moves a recurring event that is in the past to its next occurrence, using up its count.
+    Returns False if no occurrences are left.
+    """
+    local_datetime = datetime.strptime(f"{event.date} {event.time}", "%Y-%m-%d %H:%M")
+    not_before = local_datetime + timedelta(
+        seconds=current_utc_timestamp - event.utc_timestamp
+    )
+    local_datetime, skipped_occurrences = get_next_occurrence(
+        local_datetime, event.interval, not_before
     )
+    if event.count:
+        event.count -= skipped_occurrences
+        if event.count < 1:
+            return False
+    event.date = local_datetime.strftime("%Y-%m-%d")
+    event.time = local_datetime.strftime("%H:%M")
+    return True
+
+
+@shared_task(bind=True)
+def import_ics_events(self, user_id, path):
+    """
+    Imports the events of an iCalendar file in batches.
+    Past events are skipped, unless they are recurring, in which case they are moved to their next occurrence.
+    Progress is reported in the task result.
+    """
+    try:
+        user = CustomUser.objects.select_related("usersettings").get(pk=user_id)
+        current_utc_timestamp = int(datetime.now(timezone.utc).timestamp())
+        progress = {
+            "user_id": user_id,
+            "imported": 0,
+            "skipped": 0,
+            "failed": 0,
+            "errors": [],
+        }
+        batch = []
+
+        def write_batch():
+            Event.objects.bulk_create(batch)
+            record_bulk_changes(Event, user_id, [event.pk for event in batch])
+            progress["imported"] += len(batch)
+            batch.clear()
+            self.update_state(state="PROGRESS", meta=progress)
+
+        with open(path, "rb") as file:
+            for fields, error in parse_ics_events(file):
+                if fields is not None:
+                    event = Event(user=user, **fields)
+                    try:
+                        event.prepare(user.usersettings)
+                        if event.utc_timestamp < current_utc_timestamp:
+                            if event.interval == "-" or not advance_recurring_event(
+                                event, current_utc_timestamp
+                            ):
+                                progress["skipped"] += 1
+                                continue
+                            event.prepare(user.usersettings)
+                    except serializers.ValidationError as e:
+                        error = f"{event.title}: {e.detail[0]}"
+                    except (ValueError, ArithmeticError) as e:
+                        # E.g. dates out of range, one event does not stop the import
+                        error = f"{event.title}: {e}"
+                if error is not None:
+                    progress["failed"] += 1
+                    # Only the first errors are kept to limit the result size
+                    if len(progress["errors"]) < settings.ICS_IMPORT_MAX_ERRORS:
+                        progress["errors"].append(error)
+                    continue
+                batch.append(event)
+                if len(batch) >= settings.ICS_IMPORT_BATCH_SIZE:
+                    write_batch()
+        if batch:
+            write_batch()
+        logger.info(
+            "ICS import for user %s: %d imported, %d skipped, %d failed",
+            user_id,
+            progress["imported"],
+            progress["skipped"],
+            progress["failed"],
+        )
+        return progress
+    except Exception as e:
+        logger.exception(e)
+        raise
+    finally:
+        os.remove(path)
+
+
+def purge_in_batches(queryset, batch_size, record_changes=False):
+    """
+    Deletes the rows of the queryset in primary key ranges of at most batch_size rows,
+    each in its own short transaction, so that no lock is held for long.
+    Rows are deleted without model signals or cascades. If record_changes is set,
+    the deletions are recorded with record_bulk_changes (the model needs a user field).
+    Returns the number of deleted rows.
+    """
+    model = queryset.model
+    purged = 0
+    last_pk = None
+    while True:
+        batch = queryset.order_by("pk")
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        with transaction.atomic():
+            fields = ("pk", "user_id") if record_changes else ("pk",)
+            rows = list(batch.values_list(*fields)[:batch_size])
+            if not rows:
+                break
+            first_pk, last_pk = rows[0][0], rows[-1][0]
+            # The conditions of the queryset are applied again, rows changed in the meantime are kept
+            purged += queryset.filter(pk__gte=first_pk, pk__lte=last_pk)._raw_delete(
+                model.objects.db
+            )
+            if record_changes:
+                user_ids = {}
+                for pk, user_id in rows:
+                    user_ids.setdefault(user_id, []).append(pk)
+                for user_id, ids in user_ids.items():
+                    record_bulk_changes(model, user_id, ids, deleted=True)
+        if len(rows) < batch_size:
+            break
+    return purged
+
+
+@shared_task()
+def purge_expired_records():
+    """
+    Deletes expired JWT blacklist and outstanding tokens, one-shot events that fired longer
+    than EXPIRED_EVENT_RETENTION_DAYS ago (e.g. whose notification kept failing),
+    notes not updated for NOTE_RETENTION_DAYS, if set, and change log rows older than
+    CHANGE_LOG_RETENTION_DAYS.
+    The number of rows deleted from each table is logged and kept as the purge stats.
+    """
+    try:
+        start_time = time.monotonic()
+        current_datetime = datetime.now(timezone.utc)
+        batch_size = settings.PURGE_BATCH_SIZE
+        purged = {}
+        # Blacklisted tokens reference outstanding tokens, so they are deleted first
+        purged["blacklisted_tokens"] = purge_in_batches(
+            BlacklistedToken.objects.filter(token__expires_at__lt=current_datetime),
+            batch_size,
+        )
+        purged["outstanding_tokens"] = purge_in_batches(
+            OutstandingToken.objects.filter(expires_at__lt=current_datetime),
+            batch_size,
+        )
+        event_cutoff = current_datetime - timedelta(
+            days=settings.EXPIRED_EVENT_RETENTION_DAYS
+        )
+        purged["events"] = purge_in_batches(
+            Event.objects.filter(
+                interval="-", utc_timestamp__lt=int(event_cutoff.timestamp())
+            ),
+            batch_size,
+            record_changes=True,
+        )
+        purged["notes"] = 0
+        if settings.NOTE_RETENTION_DAYS is not None:
+            note_cutoff = current_datetime - timedelta(
+                days=settings.NOTE_RETENTION_DAYS
+            )
+            purged["notes"] = purge_in_batches(
+                Note.objects.filter(updated_at__lt=note_cutoff),
+                batch_size,
+                record_changes=True,
+            )
+        change_log_cutoff = current_datetime - timedelta(
+            days=settings.CHANGE_LOG_RETENTION_DAYS
+        )
+        # The latest change is kept, the oldest change shows how far changes were purged
+        latest_change_id = ChangeLog.objects.aggregate(Max("id"))["id__max"] or 0
+        purged["change_log"] = purge_in_batches(
+            ChangeLog.objects.filter(
+                created_at__lt=change_log_cutoff, id__lt=latest_change_id
+            ),
+            batch_size,
+        )
+        stats = {
+            "finished_at": int(datetime.now(timezone.utc).timestamp()),
+            "duration_seconds": time.monotonic() - start_time,
+            "purged": purged,
+        }
+        set_purge_stats(stats)
+        for table, count in purged.items():
+            metrics.purge_last_run_rows.set(count, table=table)
+        logger.info(
+            "Purged %s in %.2fs",
+            ", ".join(f"{count} {table}" for table, count in purged.items()),
+            stats["duration_seconds"],
+        )
+        return purged
+    except Exception as e:
+        logger.exception(e)
+        raise
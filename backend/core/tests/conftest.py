@@ -1,4 +1,22 @@
 import pytest
+from django.core.cache import cache
+
+from core.metrics import registry
+from users.cache import clear_process_caches
+
+
+@pytest.fixture(autouse=True)
+def local_memory_cache(settings):
+    # Tests do not depend on a running Redis instance
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "sessions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+    yield
+    cache.clear()
+    # Database ids are reused between tests
+    clear_process_caches()
+    registry.clear()
 
 
 @pytest.fixture(scope="session")
@@ -1,10 +1,20 @@
+import json
+from datetime import date, datetime, timezone
+from unittest import mock
+
 from django.conf import settings
 from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError
+from django.test import override_settings
+from freezegun import freeze_time
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
-from core.models import Event
-from users.models import CustomUser
+from core.models import ChangeLog, Event, Note
+from core.tasks import NotificationEvent
+from core.views import PREVIEW_LENGTH
+from users.models import APIKey, CustomUser
 
 
 class POSTTestSuite(APITestCase):
@@ -47,6 +57,27 @@ class POSTTestSuite(APITestCase):
         response = self.client.post(self.url, data)
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def test_post_query_count(self):
+        # A freshly authenticated user, as loaded by the authentication class on each request
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(4):
+            self.client.post(self.url, self.data)
+        # User settings are cached between requests
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(3):
+            response = self.client.post(self.url, self.data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_post_after_user_settings_change(self):
+        self.client.post(self.url, self.data)
+        self.user.usersettings.default_time = "08:00"
+        self.user.usersettings.save()
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        data = self.data
+        data.pop("time")
+        self.client.post(self.url, data)
+        self.assertEqual(Event.objects.latest("id").time, "08:00")
+
 
 class GETTestSuite(APITestCase):
     """Test suite for Events API GET requests"""
@@ -201,6 +232,59 @@ class GETTestSuite(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, expected_data)
 
+    def test_get_using_search_operator(self):
+        query = 'SEARCH(title,"title 2")'
+        url = self.url + query
+        response = self.client.get(url)
+        for result in response.data:
+            del result["id"]
+        expected_data = [self.id2_dict]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
+    def test_get_using_or_operator_with_search(self):
+        query = 'OR(SEARCH(title,"title 2"),EQUAL(title,"Title-1"))'
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_get_using_and_operator_with_search(self):
+        query = 'AND(SEARCH(title,"title"),LESS_THAN(date,"2024-01-02"))'
+        response = self.client.get(self.url + query)
+        for result in response.data:
+            del result["id"]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [self.id1_dict])
+
+    def test_get_using_not_operator_with_search(self):
+        query = 'NOT(SEARCH(title,"title 2"))'
+        response = self.client.get(self.url + query)
+        for result in response.data:
+            del result["id"]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [self.id1_dict])
+
+    def test_get_using_or_operator_excludes_other_users(self):
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com",
+            username="other",
+            password=make_password("password"),
+        )
+        Event.objects.create(
+            title="Title-1",
+            date="2024-01-01",
+            notification_type="email",
+            user=other_user,
+        )
+        query = 'OR(EQUAL(title,"Title-1"),EQUAL(title,"Title-2"))'
+        url = self.url + query
+        response = self.client.get(url)
+        for result in response.data:
+            del result["id"]
+        expected_data = [self.id1_dict, self.id2_dict]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
     def test_get_without_query(self):
         url = "/event/"
         response = self.client.get(url)
@@ -210,8 +294,812 @@ class GETTestSuite(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, expected_data)
 
+    def test_get_with_fields(self):
+        url = "/event/?fields=title,date"
+        response = self.client.get(url)
+        expected_data = [
+            {"title": "Title-1", "date": "2024-01-01"},
+            {"title": "Title-2", "date": "2024-01-02"},
+        ]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
+    def test_get_with_invalid_fields(self):
+        url = "/event/?fields=title,user"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def test_get_detail_with_fields(self):
+        event = Event.objects.get(title="Title-1")
+        url = f"/event/{event.id}/?fields=id,title"
+        response = self.client.get(url)
+        expected_data = {"id": event.id, "title": "Title-1"}
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
     def test_get_with_invalid_query(self):
         query = 'EQUAL(title,"Title-1"'  # Missing closing bracket
         url = self.url + query
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class NoteGETTestSuite(APITestCase):
+    """Test suite for Notes API GET requests"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        self.info = "a" * (PREVIEW_LENGTH + 50)
+        Note.objects.create(title="Title", info=self.info, user=self.user)
+
+    def test_get_with_preview(self):
+        url = "/note/?preview=true"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["info"], self.info[:PREVIEW_LENGTH])
+        self.assertEqual(response.data[0]["title"], "Title")
+
+    def test_get_with_preview_and_fields(self):
+        url = "/note/?preview=true&fields=title,info"
+        response = self.client.get(url)
+        expected_data = [{"title": "Title", "info": self.info[:PREVIEW_LENGTH]}]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
+    def test_get_without_preview(self):
+        url = "/note/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["info"], self.info)
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0)
+class ChangesTestSuite(APITestCase):
+    """Test suite for the incremental sync endpoints"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        self.event = Event.objects.create(
+            title="Title-1",
+            date="2020-01-01",
+            time="10:00",
+            interval="30min",
+            utc_offset="+0",
+            notification_type="email",
+            user=self.user,
+        )
+        self.url = "/event/changes/"
+
+    def test_get_without_token(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["changes"]), 1)
+        change = response.data["changes"][0]
+        self.assertEqual(change["id"], self.event.id)
+        self.assertEqual(change["deleted"], False)
+        self.assertEqual(change["data"]["title"], "Title-1")
+        self.assertEqual(response.data["has_more"], False)
+
+    def test_get_with_token_without_changes(self):
+        token = self.client.get(self.url).data["token"]
+        response = self.client.get(self.url + f"?since={token}")
+        self.assertEqual(response.data["changes"], [])
+        self.assertEqual(response.data["token"], token)
+
+    def test_get_with_token_after_update(self):
+        token = self.client.get(self.url).data["token"]
+        self.event.title = "Title-2"
+        self.event.save()
+        self.event.save()
+        response = self.client.get(self.url + f"?since={token}")
+        self.assertEqual(len(response.data["changes"]), 1)
+        self.assertEqual(response.data["changes"][0]["data"]["title"], "Title-2")
+        self.assertNotEqual(response.data["token"], token)
+
+    def test_get_with_token_after_reschedule(self):
+        token = self.client.get(self.url).data["token"]
+        NotificationEvent(self.event, 1577873100).reschedule_event()
+        response = self.client.get(self.url + f"?since={token}")
+        self.assertEqual(response.data["changes"][0]["data"]["time"], "10:30")
+
+    def test_get_with_token_after_delete(self):
+        token = self.client.get(self.url).data["token"]
+        event_id = self.event.id
+        self.event.delete()
+        response = self.client.get(self.url + f"?since={token}")
+        expected_changes = [{"id": event_id, "deleted": True, "data": None}]
+        self.assertEqual(response.data["changes"], expected_changes)
+
+    def test_get_excludes_other_users_and_models(self):
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com",
+            username="other",
+            password=make_password("password"),
+        )
+        Event.objects.create(
+            title="Title-1",
+            date="2024-01-01",
+            notification_type="email",
+            user=other_user,
+        )
+        Note.objects.create(info="info", user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data["changes"]), 1)
+
+    def test_get_with_more_changes_than_limit(self):
+        for i in range(2, 4):
+            Event.objects.create(
+                title=f"Title-{i}",
+                date="2024-01-01",
+                notification_type="email",
+                user=self.user,
+            )
+        with mock.patch("core.views.CHANGES_LIMIT", 2):
+            response = self.client.get(self.url)
+            self.assertEqual(len(response.data["changes"]), 2)
+            self.assertEqual(response.data["has_more"], True)
+            token = response.data["token"]
+            response = self.client.get(self.url + f"?since={token}")
+            self.assertEqual(len(response.data["changes"]), 1)
+            self.assertEqual(response.data["has_more"], False)
+
+    def test_note_changes(self):
+        note = Note.objects.create(info="info", user=self.user)
+        response = self.client.get("/note/changes/")
+        self.assertEqual(response.data["changes"][0]["id"], note.id)
+
+    def test_user_deletion(self):
+        self.user.delete()
+        self.assertEqual(ChangeLog.objects.count(), 0)
+
+    def test_get_with_invalid_token(self):
+        for token in ("abc", "snapshot:1", "snapshot:a:1"):
+            response = self.client.get(self.url + f"?since={token}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_snapshot_includes_objects_without_changes(self):
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com", username="other", password="password"
+        )
+        Note.objects.create(info="info", user=other_user)
+        # E.g. an event created before the change log was deployed
+        ChangeLog.objects.filter(object_id=self.event.id, model="event").delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["changes"][0]["id"], self.event.id)
+        token = response.data["token"]
+        self.event.title = "Title-2"
+        self.event.save()
+        response = self.client.get(self.url + f"?since={token}")
+        self.assertEqual(response.data["changes"][0]["data"]["title"], "Title-2")
+
+    def test_get_with_expired_token(self):
+        token = self.client.get(self.url).data["token"]
+        self.event.title = "Title-2"
+        self.event.save()
+        self.event.title = "Title-3"
+        self.event.save()
+        # The oldest changes, including one after the token, were purged
+        ChangeLog.objects.filter(id__lte=int(token) + 1).delete()
+        response = self.client.get(self.url + f"?since={token}")
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    @override_settings(CHANGES_SETTLE_SECONDS=10)
+    def test_recent_changes_are_held_back(self):
+        ChangeLog.objects.update(
+            created_at=datetime(2024, 1, 1, 9, tzinfo=timezone.utc)
+        )
+        with freeze_time("2024-01-01 10:00:00"):
+            token = self.client.get(self.url).data["token"]
+            self.event.title = "Title-2"
+            self.event.save()
+        with freeze_time("2024-01-01 10:00:05"):
+            # A transaction recording a change with a lower id may still be running
+            response = self.client.get(self.url + f"?since={token}")
+            self.assertEqual(response.data["changes"], [])
+            self.assertEqual(response.data["token"], token)
+        with freeze_time("2024-01-01 10:00:11"):
+            response = self.client.get(self.url + f"?since={token}")
+            self.assertEqual(response.data["changes"][0]["data"]["title"], "Title-2")
+
+
+class BulkPOSTTestSuite(APITestCase):
+    """Test suite for the bulk Events API endpoint"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        self.url = "/event/bulk/"
+        self.data = [
+            {"title": f"Title-{i}", "date": f"2024-01-0{i}", "utc_offset": "+0"}
+            for i in range(1, 4)
+        ]
+
+    def test_post(self):
+        response = self.client.post(self.url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["errors"], [])
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertEqual(Event.objects.count(), 3)
+        event = Event.objects.get(title="Title-1")
+        self.assertEqual(event.time, settings.DEFAULT_TIME)
+        self.assertEqual(event.recipient, "email@email.com")
+        self.assertEqual(event.utc_timestamp, 1704103200)
+
+    def test_post_query_count(self):
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        # User settings, savepoint, events insert, change log insert, savepoint release
+        with self.assertNumQueries(5):
+            self.client.post(self.url, self.data * 10, format="json")
+        self.assertEqual(Event.objects.count(), 30)
+
+    def test_post_update(self):
+        event = Event.objects.create(title="Title", date="2024-01-01", user=self.user)
+        data = [{"id": event.id, "title": "New title"}]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Event.objects.get().title, "New title")
+        self.assertEqual(Event.objects.get().date, "2024-01-01")
+
+    def test_post_update_of_other_users_event(self):
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com",
+            username="other",
+            password=make_password("password"),
+        )
+        event = Event.objects.create(title="Title", date="2024-01-01", user=other_user)
+        data = [{"id": event.id, "title": "New title", "date": "2024-01-01"}]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(
+            response.data["errors"],
+            [{"index": 0, "errors": "You are not the owner of this object"}],
+        )
+        self.assertEqual(Event.objects.get(id=event.id).title, "Title")
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 0)
+
+    def test_post_with_invalid_ids(self):
+        data = [
+            {"id": "1", "title": "Title", "date": "2024-01-01"},
+            {"id": True, "title": "Title", "date": "2024-01-01"},
+            {"id": 999, "title": "Title", "date": "2024-01-01"},
+        ]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(
+            [error["errors"] for error in response.data["errors"]],
+            ["Invalid id", "Invalid id", "You are not the owner of this object"],
+        )
+        self.assertEqual(Event.objects.count(), 0)
+
+    def test_post_with_invalid_items(self):
+        self.data[0]["date"] = "2024/01/01"
+        self.data[1]["count"] = 5  # Count without interval
+        response = self.client.post(self.url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [0, 1])
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(Event.objects.get().title, "Title-3")
+
+    def test_post_invalidates_cached_list(self):
+        self.client.get("/event/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, self.data, format="json")
+        response = self.client.get("/event/")
+        self.assertEqual(len(response.data), 3)
+
+    def test_post_over_limit(self):
+        with mock.patch("core.views.BULK_LIMIT", 2):
+            response = self.client.post(self.url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(Event.objects.count(), 0)
+
+    def test_post_not_a_list(self):
+        response = self.client.post(self.url, self.data[0], format="json")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class QueryDELETEAndPATCHTestSuite(APITestCase):
+    """Test suite for Events API DELETE and PATCH requests with a query"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        for i in range(1, 4):
+            Event.objects.create(
+                category="uni" if i < 3 else "work",
+                title=f"Title-{i}",
+                date=f"2024-01-0{i}",
+                user=self.user,
+            )
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com",
+            username="other",
+            password=make_password("password"),
+        )
+        Event.objects.create(
+            category="uni", title="Title-1", date="2024-01-01", user=other_user
+        )
+        self.url = '/event/?query=EQUAL(category,"uni")'
+
+    def test_delete(self):
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Event.objects.count(), 2)
+        self.assertEqual(
+            ChangeLog.objects.filter(user=self.user, deleted=True).count(), 2
+        )
+
+    def test_delete_dry_run(self):
+        response = self.client.delete(self.url + "&dry_run=true")
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(Event.objects.count(), 4)
+
+    def test_delete_without_query(self):
+        response = self.client.delete("/event/")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(Event.objects.count(), 4)
+
+    def test_delete_over_limit(self):
+        with mock.patch("core.views.QUERY_CHANGE_LIMIT", 1):
+            response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(Event.objects.count(), 4)
+
+    def test_delete_invalidates_cached_list(self):
+        self.client.get("/event/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.url)
+        response = self.client.get("/event/")
+        self.assertEqual(len(response.data), 1)
+
+    def test_patch(self):
+        response = self.client.patch(self.url, {"category": "exams"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            Event.objects.filter(user=self.user, category="exams").count(), 2
+        )
+        self.assertEqual(Event.objects.filter(category="uni").count(), 1)
+
+    def test_patch_dry_run(self):
+        response = self.client.patch(
+            self.url + "&dry_run=1", {"category": "exams"}, format="json"
+        )
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(Event.objects.filter(category="exams").count(), 0)
+
+    def test_patch_with_field_not_allowed(self):
+        response = self.client.patch(self.url, {"date": "2024-02-01"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(Event.objects.filter(date="2024-02-01").count(), 0)
+
+    def test_patch_with_invalid_value(self):
+        response = self.client.patch(
+            self.url, {"custom_variables": "name-Tom"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def test_patch_notes(self):
+        note = Note.objects.create(category="uni", info="info", user=self.user)
+        updated_at = note.updated_at
+        response = self.client.patch(
+            '/note/?query=EQUAL(category,"uni")', {"info": "new info"}, format="json"
+        )
+        self.assertEqual(response.data["count"], 1)
+        note.refresh_from_db()
+        self.assertEqual(note.info, "new info")
+        self.assertGreater(note.updated_at, updated_at)
+
+
+class ExportTestSuite(APITestCase):
+    """Test suite for the export endpoints"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        for i in range(1, 4):
+            Event.objects.create(
+                title=f"Title-{i}",
+                date=f"2024-01-0{i}",
+                utc_offset="+0",
+                user=self.user,
+            )
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com",
+            username="other",
+            password=make_password("password"),
+        )
+        Event.objects.create(title="Other", date="2024-01-01", user=other_user)
+        self.url = "/event/export/"
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [row["title"] for row in rows], ["Title-1", "Title-2", "Title-3"]
+        )
+        self.assertEqual(rows[0]["utc_timestamp"], 1704103200)
+        self.assertNotIn("user", rows[0])
+
+    def test_export_csv_with_query_and_fields(self):
+        url = (
+            self.url
+            + '?file_format=csv&fields=title,date&query=GREATER_THAN(date,"2024-01-01")'
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        content = b"".join(response.streaming_content).decode()
+        expected_content = "title,date\r\nTitle-2,2024-01-02\r\nTitle-3,2024-01-03\r\n"
+        self.assertEqual(content, expected_content)
+
+    def test_export_notes_csv(self):
+        note = Note.objects.create(title="Title", info="a, b", user=self.user)
+        response = self.client.get(
+            "/note/export/?file_format=csv&fields=info,created_at"
+        )
+        content = b"".join(response.streaming_content).decode()
+        expected_content = (
+            f'info,created_at\r\n"a, b",{note.created_at.isoformat()}\r\n'
+        )
+        self.assertEqual(content, expected_content)
+
+    def test_export_with_invalid_format(self):
+        response = self.client.get(self.url + "?file_format=xml")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class OccurrencesTestSuite(APITestCase):
+    """Test suite for the occurrence expansion endpoint"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        self.url = "/event/occurrences/"
+
+    def test_get_occurrences(self):
+        weekly = Event.objects.create(
+            title="Weekly",
+            date="2024-01-01",
+            time="10:00",
+            utc_offset="+2",
+            interval="7d",
+            count=3,
+            user=self.user,
+        )
+        once = Event.objects.create(
+            title="Once",
+            date="2024-01-09",
+            time="12:00",
+            utc_offset="+0",
+            notice_time="1h",
+            user=self.user,
+        )
+        Event.objects.create(title="Later", date="2024-02-01", user=self.user)
+        response = self.client.get(self.url + "?from=2024-01-05&to=2024-01-31")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = [
+            (row["id"], row["date"], row["time"], row["utc_timestamp"])
+            for row in response.data
+        ]
+        expected_result = [
+            (weekly.id, "2024-01-08", "10:00", 1704700800),
+            (once.id, "2024-01-09", "12:00", 1704798000),
+            (weekly.id, "2024-01-15", "10:00", 1705305600),
+        ]
+        self.assertEqual(result, expected_result)
+
+    def test_get_occurrences_with_zero_interval(self):
+        event = Event.objects.create(
+            title="Zero", date="2024-01-02", time="10:00", user=self.user
+        )
+        # Zero intervals are rejected by the validator, but older rows may have them
+        Event.objects.filter(id=event.id).update(interval="0d")
+        weekly = Event.objects.create(
+            title="Weekly", date="2024-01-01", interval="7d", user=self.user
+        )
+        response = self.client.get(self.url + "?from=2024-01-01&to=2024-01-10")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = [(row["id"], row["date"]) for row in response.data]
+        expected_result = [
+            (weekly.id, "2024-01-01"),
+            (event.id, "2024-01-02"),
+            (weekly.id, "2024-01-08"),
+        ]
+        self.assertEqual(result, expected_result)
+
+    def test_get_occurrences_of_other_users(self):
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com",
+            username="other",
+            password=make_password("password"),
+        )
+        Event.objects.create(title="Other", date="2024-01-01", user=other_user)
+        response = self.client.get(self.url + "?from=2024-01-01&to=2024-01-01")
+        self.assertEqual(response.data, [])
+
+    def test_get_occurrences_with_too_long_range(self):
+        response = self.client.get(self.url + "?from=2024-01-01&to=2025-06-01")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def test_get_occurrences_without_range(self):
+        response = self.client.get(self.url + "?from=2024-01-01")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class StatsTestSuite(APITestCase):
+    """Test suite for the statistics endpoints"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        Event.objects.create(
+            title="Past", category="uni", date="2024-01-01", user=self.user
+        )
+        Event.objects.create(
+            title="Weekly",
+            category="uni",
+            date="2099-01-01",
+            interval="7d",
+            notification_type="sms",
+            recipient="37069935951",
+            user=self.user,
+        )
+        Event.objects.create(
+            title="Work", category="work", date="2099-01-02", user=self.user
+        )
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com",
+            username="other",
+            password=make_password("password"),
+        )
+        Event.objects.create(title="Other", date="2024-01-01", user=other_user)
+        self.url = "/event/stats/"
+
+    def test_get_event_stats(self):
+        with mock.patch("core.views.datetime") as datetime_mock:
+            datetime_mock.now.return_value = datetime(2098, 12, 20, tzinfo=timezone.utc)
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], 3)
+        self.assertEqual(response.data["recurring"], 1)
+        self.assertEqual(response.data["by_category"], {"uni": 2, "work": 1})
+        self.assertEqual(response.data["by_notification_type"], {"email": 2, "sms": 1})
+        self.assertEqual(
+            response.data["upcoming"],
+            [{"date": "2099-01-01", "count": 1}, {"date": "2099-01-02", "count": 1}],
+        )
+        self.assertEqual(
+            response.data["notifications_left"],
+            {
+                "email": settings.NO_OF_FREE_EMAIL_NOTIFICATIONS,
+                "sms": settings.NO_OF_FREE_SMS_NOTIFICATIONS,
+            },
+        )
+
+    def test_get_event_stats_with_query(self):
+        response = self.client.get(self.url + '?query=equal(category,"uni")')
+        self.assertEqual(response.data["total"], 2)
+        self.assertEqual(response.data["by_category"], {"uni": 2})
+
+    def test_get_event_stats_is_cached_until_change(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["total"], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(title="New", date="2099-01-03", user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["total"], 4)
+
+    def test_get_note_stats(self):
+        Note.objects.create(title="A", category="uni", info="a", user=self.user)
+        Note.objects.create(title="B", category="uni", info="b", user=self.user)
+        response = self.client.get("/note/stats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {"total": 2, "updated_recently": 2, "by_category": {"uni": 2}},
+        )
+
+
+class CachedAuthenticationTestSuite(APITestCase):
+    """Test suite for the cached user lookup of token and session authentication"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password="password"
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.url = "/event/"
+
+    def test_repeated_token_request_without_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_token_request_of_deactivated_user(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_request_of_deleted_user(self):
+        self.client.get(self.url)
+        self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_repeated_session_request_without_queries(self):
+        self.client.credentials()
+        self.client.login(email="email@email.com", password="password")
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class APIKeyTestSuite(APITestCase):
+    """Test suite for API key management and authentication"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password="password"
+        )
+        self.api_key, self.key = APIKey.generate(
+            user=self.user, name="integration", scopes="event:read,note:write"
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.key}")
+
+    def test_generate_with_used_prefix(self):
+        used_prefix = self.api_key.prefix
+        with mock.patch(
+            "users.models.secrets.token_hex", side_effect=[used_prefix, "0a1b2c3d"]
+        ):
+            api_key, key = APIKey.generate(
+                user=self.user, name="other", scopes="event:read"
+            )
+        self.assertEqual(api_key.prefix, "0a1b2c3d")
+        self.assertTrue(key.startswith("df_0a1b2c3d."))
+
+    def test_generate_with_only_used_prefixes(self):
+        used_prefix = self.api_key.prefix
+        with mock.patch("users.models.secrets.token_hex", return_value=used_prefix):
+            with self.assertRaises(IntegrityError):
+                APIKey.generate(user=self.user, name="other", scopes="event:read")
+        self.assertEqual(APIKey.objects.count(), 1)
+
+    def test_create_key(self):
+        self.client.credentials()
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            "/user/api-keys/", {"name": "new", "scopes": "note:read"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        api_key = APIKey.objects.get(id=response.data["id"])
+        self.assertTrue(response.data["key"].startswith(f"df_{api_key.prefix}."))
+        self.assertNotIn(response.data["key"], api_key.hashed_key)
+        self.assertTrue(api_key.check_key(response.data["key"]))
+
+    def test_create_key_with_invalid_scope(self):
+        self.client.credentials()
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            "/user/api-keys/", {"name": "new", "scopes": "user:write"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_keys_without_key(self):
+        self.client.credentials()
+        self.client.force_authenticate(self.user)
+        response = self.client.get("/user/api-keys/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["prefix"], self.api_key.prefix)
+        self.assertNotIn("hashed_key", response.data[0])
+
+    def test_repeated_request_without_queries(self):
+        self.client.get("/event/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/event/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_scopes(self):
+        self.assertEqual(self.client.get("/event/").status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.post("/event/", {}).status_code, status.HTTP_403_FORBIDDEN
+        )
+        self.assertEqual(
+            self.client.get("/note/").status_code, status.HTTP_403_FORBIDDEN
+        )
+        response = self.client.post("/note/", {"title": "title", "info": "info"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_endpoints_denied(self):
+        self.assertEqual(
+            self.client.get("/user/").status_code, status.HTTP_403_FORBIDDEN
+        )
+        response = self.client.post(
+            "/user/api-keys/", {"name": "new", "scopes": "note:read"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_key(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.key[:-1]}x")
+        response = self.client.get("/event/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_key(self):
+        self.client.get("/event/")
+        self.client.credentials()
+        self.client.force_authenticate(self.user)
+        response = self.client.delete(f"/user/api-keys/{self.api_key.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.key}")
+        response = self.client.get("/event/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_key(self):
+        self.api_key.expires_at = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        self.api_key.save()
+        response = self.client.get("/event/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@freeze_time("2024-03-01 10:00")
+class QuotaRefillTestSuite(APITestCase):
+    """Test suite for the monthly refill of notification quotas on first use"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com",
+            username="name",
+            password="password",
+            email_notifications_left=0,
+            sms_notifications_left=0,
+            quota_period=date(2024, 2, 1),
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_user_details(self):
+        response = self.client.get("/user/")
+        self.assertEqual(
+            response.data["email_notifications_left"],
+            settings.NO_OF_FREE_EMAIL_NOTIFICATIONS,
+        )
+        self.assertEqual(
+            response.data["sms_notifications_left"],
+            settings.NO_OF_FREE_SMS_NOTIFICATIONS,
+        )
+
+    def test_stats(self):
+        response = self.client.get("/event/stats/")
+        self.assertEqual(
+            response.data["notifications_left"],
+            {
+                "email": settings.NO_OF_FREE_EMAIL_NOTIFICATIONS,
+                "sms": settings.NO_OF_FREE_SMS_NOTIFICATIONS,
+            },
+        )
@@ -0,0 +1,114 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.test import AsyncRequestFactory, TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.async_views import (
+    EventAsyncAPIDetailView,
+    EventAsyncAPIView,
+    NoteAsyncAPIView,
+)
+from core.models import Event, Note
+from users.models import APIKey, CustomUser
+
+
+class AsyncViewsTestSuite(TestCase):
+    """Test suite for the async versions of the list and detail views"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.event = Event.objects.create(
+            title="Title-1", date="2024-01-01", user=self.user
+        )
+        Event.objects.create(title="Title-2", date="2024-01-02", user=self.user)
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com",
+            username="other",
+            password=make_password("password"),
+        )
+        self.other_event = Event.objects.create(
+            title="Other", date="2024-01-01", user=other_user
+        )
+        self.factory = AsyncRequestFactory()
+        token = RefreshToken.for_user(self.user).access_token
+        self.headers = {"AUTHORIZATION": f"Bearer {token}"}
+
+    async def test_get_list(self):
+        request = self.factory.get("/event/", **self.headers)
+        response = await EventAsyncAPIView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        titles = [event["title"] for event in json.loads(response.content)]
+        self.assertEqual(titles, ["Title-1", "Title-2"])
+        self.assertIn("ETag", response)
+
+    async def test_get_list_with_query_and_fields(self):
+        request = self.factory.get(
+            "/event/",
+            {"query": 'equal(title,"Title-2")', "fields": "title"},
+            **self.headers,
+        )
+        response = await EventAsyncAPIView.as_view()(request)
+        self.assertEqual(json.loads(response.content), [{"title": "Title-2"}])
+
+    async def test_get_list_not_modified(self):
+        request = self.factory.get("/event/", **self.headers)
+        etag = (await EventAsyncAPIView.as_view()(request))["ETag"]
+        request = self.factory.get("/event/", IF_NONE_MATCH=etag, **self.headers)
+        response = await EventAsyncAPIView.as_view()(request)
+        self.assertEqual(response.status_code, 304)
+
+    async def test_get_note_list_with_preview(self):
+        await Note.objects.acreate(title="Note", info="a" * 200, user=self.user)
+        request = self.factory.get("/note/", {"preview": "true"}, **self.headers)
+        response = await NoteAsyncAPIView.as_view()(request)
+        self.assertEqual(len(json.loads(response.content)[0]["info"]), 100)
+
+    async def test_get_list_unauthenticated(self):
+        request = self.factory.get("/event/")
+        response = await EventAsyncAPIView.as_view()(request)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_get_list_with_api_key_scope(self):
+        _, key = await sync_to_async(APIKey.generate)(
+            user=self.user, name="integration", scopes="event:read"
+        )
+        headers = {"AUTHORIZATION": f"Api-Key {key}"}
+        request = self.factory.get("/event/", **headers)
+        response = await EventAsyncAPIView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        request = self.factory.get("/note/", **headers)
+        response = await NoteAsyncAPIView.as_view()(request)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_get_detail(self):
+        request = self.factory.get(f"/event/{self.event.id}/", **self.headers)
+        response = await EventAsyncAPIDetailView.as_view()(request, id=self.event.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["title"], "Title-1")
+
+    async def test_get_detail_of_other_user(self):
+        id = self.other_event.id
+        request = self.factory.get(f"/event/{id}/", **self.headers)
+        response = await EventAsyncAPIDetailView.as_view()(request, id=id)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_post_is_handled_by_sync_view(self):
+        request = self.factory.post(
+            "/event/",
+            {"title": "New", "date": "2024-01-03"},
+            content_type="application/json",
+            **self.headers,
+        )
+        response = await EventAsyncAPIView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await Event.objects.filter(title="New").acount(), 1)
+
+    async def test_delete_detail_is_handled_by_sync_view(self):
+        request = self.factory.delete(f"/event/{self.event.id}/", **self.headers)
+        response = await EventAsyncAPIDetailView.as_view()(request, id=self.event.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await Event.objects.filter(id=self.event.id).aexists())
@@ -0,0 +1,155 @@
+from django.contrib.auth.hashers import make_password
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core import metrics
+from core.cache import bump_list_version, get_list_version, list_cache_stats
+from core.models import Event, Note
+from core.tasks import NotificationEvent
+from users.models import CustomUser
+
+
+class ListCacheTestSuite(APITestCase):
+    """Test suite for the cached event and note lists"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        self.event = Event.objects.create(
+            title="Title-1",
+            date="2020-01-01",
+            time="10:00",
+            interval="30min",
+            utc_offset="+0",
+            notification_type="email",
+            user=self.user,
+        )
+        self.url = "/event/"
+        list_cache_stats.reset()
+
+    def test_get_served_from_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["title"], "Title-1")
+        self.assertEqual(list_cache_stats.as_dict()["hits"], 1)
+        self.assertEqual(list_cache_stats.as_dict()["misses"], 1)
+        self.assertEqual(list_cache_stats.as_dict()["hit_ratio"], 0.5)
+        metrics.registry.flush()
+        content = metrics.registry.render()
+        self.assertIn('list_cache_requests_total{result="hit"} 1\n', content)
+        self.assertIn('list_cache_duration_seconds_count{result="miss"} 1\n', content)
+
+    def test_different_query_not_served_from_cache(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url + '?query=EQUAL(title,"Title-2")')
+        self.assertEqual(response.data, [])
+        self.assertEqual(list_cache_stats.as_dict()["misses"], 2)
+
+    def test_cache_invalidated_on_save(self):
+        self.client.get(self.url)
+        self.event.title = "Title-2"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data[0]["title"], "Title-2")
+
+    def test_cache_invalidated_after_commit(self):
+        version = get_list_version(Event, self.user.id)
+        self.event.title = "Title-2"
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.event.save()
+        # A list read before the commit must not be cached under the new version
+        self.assertEqual(get_list_version(Event, self.user.id), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_list_version(Event, self.user.id), version)
+
+    def test_cache_invalidated_on_delete(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [])
+
+    def test_cache_invalidated_on_reschedule(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationEvent(self.event, 1577873100).reschedule_event()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data[0]["time"], "10:30")
+
+    def test_note_save_does_not_invalidate_events(self):
+        version = get_list_version(Event, self.user.id)
+        Note.objects.create(info="info", user=self.user)
+        self.assertEqual(get_list_version(Event, self.user.id), version)
+
+    def test_bump_list_version(self):
+        version = get_list_version(Note, self.user.id)
+        bump_list_version(Note, self.user.id)
+        self.assertEqual(get_list_version(Note, self.user.id), version + 1)
+
+
+class ETagTestSuite(APITestCase):
+    """Test suite for conditional GET requests"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        self.event = Event.objects.create(
+            title="Title-1",
+            date="2024-01-01",
+            notification_type="email",
+            user=self.user,
+        )
+        self.url = "/event/"
+        self.detail_url = f"/event/{self.event.id}/"
+
+    def test_get_returns_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.has_header("ETag"))
+
+    def test_get_with_matching_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_get_with_matching_weak_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f"W/{etag}")
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_get_with_etag_after_save(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.event.title = "Title-2"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_query(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url + "?fields=title", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_detail_with_matching_etag(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_get_detail_with_etag_after_delete(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.delete()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
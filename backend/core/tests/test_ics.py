@@ -0,0 +1,300 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from freezegun import freeze_time
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.ics import (
+    build_rrule,
+    parse_content_line,
+    parse_dtstart,
+    parse_ics_events,
+    parse_rrule,
+)
+from core.models import ChangeLog, Event
+from core.tasks import NotificationEvent, import_ics_events
+from users.models import CustomUser
+
+ics_content = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    "BEGIN:VEVENT\r\n"
+    "SUMMARY:Exam\\, maths\r\n"
+    "CATEGORIES:uni\r\n"
+    "DTSTART;TZID=Europe/Vilnius:20240115T090000\r\n"
+    "BEGIN:VALARM\r\n"
+    "SUMMARY:Alarm\r\n"
+    "END:VALARM\r\n"
+    "END:VEVENT\r\n"
+    "BEGIN:VEVENT\r\n"
+    "SUMMARY:Weekly meet\r\n"
+    " ing\r\n"
+    "DTSTART:20240101T100000Z\r\n"
+    "RRULE:FREQ=WEEKLY;INTERVAL=2;COUNT=5\r\n"
+    "END:VEVENT\r\n"
+    "BEGIN:VEVENT\r\n"
+    "SUMMARY:Past\r\n"
+    "DTSTART;VALUE=DATE:20190101\r\n"
+    "END:VEVENT\r\n"
+    "BEGIN:VEVENT\r\n"
+    "SUMMARY:Unsupported\r\n"
+    "DTSTART:20240101T100000Z\r\n"
+    "RRULE:FREQ=WEEKLY;BYDAY=MO,WE\r\n"
+    "END:VEVENT\r\n"
+    "END:VCALENDAR\r\n"
+)
+
+
+class TestIcsParsing(TestCase):
+    """Test suite for iCalendar parsing functions"""
+
+    def test_parse_content_line(self):
+        result = parse_content_line("DTSTART;TZID=Europe/Vilnius:20240101T100000")
+        expected_result = ("DTSTART", {"TZID": "Europe/Vilnius"}, "20240101T100000")
+        self.assertEqual(result, expected_result)
+
+    def test_parse_dtstart_utc(self):
+        result = parse_dtstart({}, "20240101T100000Z")
+        expected_result = {"date": "2024-01-01", "time": "10:00", "utc_offset": "+0"}
+        self.assertEqual(result, expected_result)
+
+    def test_parse_dtstart_with_time_zone(self):
+        result = parse_dtstart({"TZID": "Asia/Kolkata"}, "20240101T100000")
+        expected_result = {"date": "2024-01-01", "time": "10:00", "utc_offset": "+5:30"}
+        self.assertEqual(result, expected_result)
+
+    def test_parse_dtstart_date_only(self):
+        result = parse_dtstart({"VALUE": "DATE"}, "20240101")
+        self.assertEqual(result, {"date": "2024-01-01"})
+
+    def test_parse_rrule(self):
+        result = parse_rrule("FREQ=WEEKLY;INTERVAL=2;COUNT=5")
+        self.assertEqual(result, {"interval": "14d", "count": 5})
+
+    def test_parse_rrule_invalid_interval(self):
+        for rrule in ("FREQ=DAILY;INTERVAL=0", "FREQ=DAILY;INTERVAL=-1"):
+            with self.assertRaisesMessage(ValueError, "Invalid recurrence interval"):
+                parse_rrule(rrule)
+
+    def test_build_rrule(self):
+        self.assertEqual(build_rrule("2m", 3), "FREQ=MONTHLY;INTERVAL=2;COUNT=3")
+        self.assertIsNone(build_rrule("0d", None))
+
+    def test_parse_rrule_unsupported(self):
+        with self.assertRaises(ValueError):
+            parse_rrule("FREQ=WEEKLY;BYDAY=MO,WE")
+
+    def test_parse_ics_events(self):
+        result = list(parse_ics_events(ics_content.splitlines(keepends=True)))
+        expected_first_event = {
+            "title": "Exam, maths",
+            "category": "uni",
+            "date": "2024-01-15",
+            "time": "09:00",
+            "utc_offset": "+2",
+        }
+        self.assertEqual(len(result), 4)
+        self.assertEqual(result[0], (expected_first_event, None))
+        self.assertEqual(result[1][0]["title"], "Weekly meeting")
+        self.assertEqual(result[1][0]["interval"], "14d")
+        self.assertIsNone(result[3][0])
+        self.assertIn("BYDAY", result[3][1])
+
+
+@freeze_time("2024-01-10 00:00")
+class TestIcsImportTask(TestCase):
+    """Test suite for the iCalendar import task"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        file_descriptor, self.path = tempfile.mkstemp(suffix=".ics")
+        with os.fdopen(file_descriptor, "w") as file:
+            file.write(ics_content)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_import_ics_events(self):
+        with mock.patch.object(import_ics_events, "update_state") as mock_update_state:
+            result = import_ics_events(self.user.id, self.path)
+        self.assertEqual(result["imported"], 2)
+        self.assertEqual(result["skipped"], 1)
+        self.assertEqual(result["failed"], 1)
+        self.assertEqual(len(result["errors"]), 1)
+        mock_update_state.assert_called_once()
+        self.assertFalse(os.path.exists(self.path))
+
+        exam = Event.objects.get(title="Exam, maths")
+        self.assertEqual(exam.utc_offset, "+2")
+        self.assertEqual(exam.recipient, "email@email.com")
+        # Recurring event moved from 2024-01-01 to its next occurrence
+        meeting = Event.objects.get(title="Weekly meeting")
+        self.assertEqual(meeting.date, "2024-01-15")
+        self.assertEqual(meeting.count, 4)
+        self.assertEqual(ChangeLog.objects.filter(user=self.user).count(), 2)
+
+    def test_import_ics_events_with_failing_event(self):
+        with mock.patch.object(import_ics_events, "update_state"), mock.patch(
+            "core.tasks.advance_recurring_event", side_effect=OverflowError("too large")
+        ):
+            result = import_ics_events(self.user.id, self.path)
+        self.assertEqual(result["imported"], 1)
+        self.assertEqual(result["failed"], 2)
+        self.assertIn("Weekly meeting: too large", result["errors"])
+
+    def test_import_ics_events_in_batches(self):
+        with self.settings(ICS_IMPORT_BATCH_SIZE=1), mock.patch.object(
+            import_ics_events, "update_state"
+        ) as mock_update_state:
+            import_ics_events(self.user.id, self.path)
+        self.assertEqual(mock_update_state.call_count, 2)
+
+
+class IcsImportAPITestSuite(APITestCase):
+    """Test suite for the iCalendar import endpoints"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_post(self):
+        uploaded_file = SimpleUploadedFile("calendar.ics", ics_content.encode())
+        with mock.patch("core.views.import_ics_events.delay") as mock_delay:
+            mock_delay.return_value.id = "task-id"
+            response = self.client.post("/event/import/ics/", {"file": uploaded_file})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["task_id"], "task-id")
+        user_id, path = mock_delay.call_args.args
+        self.assertEqual(user_id, self.user.id)
+        with open(path, "rb") as file:
+            self.assertEqual(file.read(), ics_content.encode())
+        os.remove(path)
+
+    def test_post_without_file(self):
+        response = self.client.post("/event/import/ics/", {})
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def test_get_status_of_other_users_import(self):
+        with mock.patch("core.views.import_ics_events.AsyncResult") as mock_result:
+            mock_result.return_value.state = "PROGRESS"
+            mock_result.return_value.info = {"user_id": self.user.id + 1}
+            response = self.client.get("/event/import/ics/task-id/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_get_status(self):
+        progress = {"user_id": self.user.id, "imported": 1000}
+        with mock.patch("core.views.import_ics_events.AsyncResult") as mock_result:
+            mock_result.return_value.state = "PROGRESS"
+            mock_result.return_value.info = progress
+            response = self.client.get("/event/import/ics/task-id/")
+        self.assertEqual(response.data, {"state": "PROGRESS", "progress": progress})
+
+
+class FeedTestSuite(APITestCase):
+    """Test suite for the iCalendar feed endpoints"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.client.force_authenticate(self.user)
+        self.event = Event.objects.create(
+            title="Meeting, weekly",
+            date="2024-01-01",
+            time="10:00",
+            utc_offset="+2",
+            interval="7d",
+            count=5,
+            user=self.user,
+        )
+        self.url = self.client.get("/event/feed/").data["url"]
+        self.client.force_authenticate(None)
+
+    def test_get_feed(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        content = response.content.decode()
+        self.assertIn(f"UID:event-{self.event.id}@dont-forgetter.rest\r\n", content)
+        self.assertIn("DTSTART:20240101T080000Z\r\n", content)
+        self.assertIn("SUMMARY:Meeting\\, weekly\r\n", content)
+        self.assertIn("RRULE:FREQ=DAILY;INTERVAL=7;COUNT=5\r\n", content)
+
+    def test_get_feed_with_zero_interval(self):
+        # Zero intervals are rejected by the validator, but older rows may have them
+        Event.objects.filter(id=self.event.id).update(interval="0d")
+        content = self.client.get(self.url).content.decode()
+        self.assertIn("DTSTART:20240101T080000Z\r\n", content)
+        self.assertNotIn("RRULE", content)
+
+    def test_get_feed_served_from_cache(self):
+        content = self.client.get(self.url).content
+        # Only the user is loaded to check the token
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.content, content)
+
+    def test_get_feed_with_matching_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_get_feed_with_if_modified_since(self):
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_get_feed_after_reschedule(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationEvent(self.event, 1704096060).reschedule_event()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("DTSTART:20240108T080000Z\r\n", response.content.decode())
+
+    def test_get_feed_with_invalid_token(self):
+        response = self.client.get("/event/feed.ics?token=invalid")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_get_feed_with_token_of_other_user(self):
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com", username="other", password="password"
+        )
+        token = self.url.split("token=")[1]
+        forged_token = token.replace(f"{self.user.id}:", f"{other_user.id}:", 1)
+        response = self.client.get(f"/event/feed.ics?token={forged_token}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_get_feed_of_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_get_feed_of_deleted_user(self):
+        self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_rotate_feed_url(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post("/event/feed/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_url = response.data["url"]
+        self.assertNotEqual(new_url, self.url)
+        self.client.force_authenticate(None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(new_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
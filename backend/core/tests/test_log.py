@@ -0,0 +1,75 @@
+import json
+import logging
+import sys
+
+from django.test import SimpleTestCase
+
+from core.log import JSONFormatter, QueueListenerHandler
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class LoggingTestSuite(SimpleTestCase):
+    """Test suite for the logging handlers and formatters"""
+
+    def setUp(self):
+        self.logger = logging.getLogger("core.tests.log")
+        self.logger.propagate = False
+        self.addCleanup(setattr, self.logger, "propagate", True)
+
+    def add_queue_handler(self, *handlers):
+        queue_handler = QueueListenerHandler(list(handlers))
+        self.logger.addHandler(queue_handler)
+        self.addCleanup(self.logger.removeHandler, queue_handler)
+        return queue_handler
+
+    def test_queue_handler(self):
+        handler = RecordingHandler()
+        warning_handler = RecordingHandler(logging.WARNING)
+        queue_handler = self.add_queue_handler(handler, warning_handler)
+        self.logger.warning("Event %s - %s", 1, "Deleting")
+        self.logger.info("Event %s - %s", 2, "Rescheduling")
+        # Stopping waits for the listener to handle the queued records
+        queue_handler.listener.stop()
+        self.assertEqual(
+            [record.getMessage() for record in handler.records],
+            ["Event 1 - Deleting", "Event 2 - Rescheduling"],
+        )
+        self.assertEqual(len(warning_handler.records), 1)
+
+    def test_message_arguments_are_merged_when_logging(self):
+        handler = RecordingHandler()
+        queue_handler = self.add_queue_handler(handler)
+        values = ["before"]
+        self.logger.warning("Values: %s", values)
+        values[0] = "after"
+        queue_handler.listener.stop()
+        self.assertEqual(handler.records[0].getMessage(), "Values: ['before']")
+
+    def test_json_formatter(self):
+        try:
+            raise ValueError("Invalid notification preference")
+        except ValueError as e:
+            record = self.logger.makeRecord(
+                self.logger.name,
+                logging.ERROR,
+                __file__,
+                1,
+                "Error: %s",
+                (e,),
+                exc_info=sys.exc_info(),
+                func="send",
+            )
+        data = json.loads(JSONFormatter().format(record))
+        self.assertEqual(data["level"], "ERROR")
+        self.assertEqual(data["logger"], "core.tests.log")
+        self.assertEqual(data["function"], "test_log.send")
+        self.assertEqual(data["message"], "Error: Invalid notification preference")
+        self.assertIn("ValueError", data["exception"])
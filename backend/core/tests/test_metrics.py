@@ -0,0 +1,187 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, override_settings
+from freezegun import freeze_time
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core import metrics
+from core.models import Event
+from core.tasks import (
+    NotificationService,
+    heartbeat,
+    send_notification_and_reschedule_or_delete_event,
+)
+from users.models import CustomUser
+
+
+class MetricsRegistryTestSuite(SimpleTestCase):
+    """Test suite for the metric types and the Prometheus text format"""
+
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+        with mock.patch("core.metrics.registry", self.registry):
+            self.counter = metrics.Counter("test_total", "Test counter", ["kind"])
+            self.gauge = metrics.Gauge("test_gauge", "Test gauge")
+            self.histogram = metrics.Histogram(
+                "test_seconds", "Test histogram", buckets=(0.1, 1)
+            )
+
+    def test_render(self):
+        self.counter.inc(kind='a"b')
+        self.counter.inc(2, kind='a"b')
+        self.gauge.set(5)
+        self.histogram.observe(0.5)
+        self.histogram.observe(2)
+        self.registry.flush()
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP test_total Test counter\n"
+            "# TYPE test_total counter\n"
+            'test_total{kind="a\\"b"} 3\n'
+            "# HELP test_gauge Test gauge\n"
+            "# TYPE test_gauge gauge\n"
+            "test_gauge 5\n"
+            "# HELP test_seconds Test histogram\n"
+            "# TYPE test_seconds histogram\n"
+            'test_seconds_bucket{le="0.1"} 0\n'
+            'test_seconds_bucket{le="1"} 1\n'
+            'test_seconds_bucket{le="+Inf"} 2\n'
+            "test_seconds_count 2\n"
+            "test_seconds_sum 2.5\n",
+        )
+
+    def test_flushes_are_added_up(self):
+        self.counter.inc(kind="a")
+        self.registry.flush()
+        self.counter.inc(kind="a")
+        self.registry.flush()
+        self.assertIn('test_total{kind="a"} 2\n', self.registry.render())
+
+    def test_redis_single_round_trip(self):
+        self.counter.inc(kind="a")
+        self.gauge.set(1)
+        client = mock.Mock()
+        with mock.patch("core.cache.get_redis_client", return_value=client):
+            self.registry.flush()
+        pipeline = client.pipeline.return_value
+        pipeline.hincrbyfloat.assert_called_once()
+        pipeline.hset.assert_called_once()
+        pipeline.execute.assert_called_once_with()
+
+    @override_settings(METRICS_FLUSH_INTERVAL=10)
+    def test_flush_if_due(self):
+        self.counter.inc(kind="a")
+        self.registry.flush_if_due()
+        self.assertNotIn("test_total{", self.registry.render())
+        self.registry._last_flush -= 10
+        self.registry.flush_if_due()
+        self.assertIn('test_total{kind="a"} 1\n', self.registry.render())
+
+
+@override_settings(METRICS_TOKEN="token")
+class MetricsEndpointTestSuite(APITestCase):
+    """Test suite for the /metrics endpoint and the request metrics"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+
+    def get_metrics(self, token="token"):
+        return self.client.get("/metrics", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_invalid_token(self):
+        response = self.get_metrics(token="wrong")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_disabled_without_token(self):
+        response = self.get_metrics()
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_request_metrics(self):
+        self.client.force_authenticate(self.user)
+        self.client.get("/event/")
+        self.client.force_authenticate(None)
+        response = self.get_metrics()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4")
+        content = response.content.decode()
+        self.assertIn(
+            'http_requests_total{method="GET",endpoint="event/",status="200"} 1\n',
+            content,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",endpoint="event/"} 1\n',
+            content,
+        )
+        self.assertIn(
+            'http_request_db_queries_count{method="GET",endpoint="event/"} 1\n',
+            content,
+        )
+
+
+@freeze_time("2024-01-01 10:05")
+class DeliveryMetricsTestSuite(APITestCase):
+    """Test suite for the scheduler and delivery metrics"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.event = Event.objects.create(
+            title="Title",
+            date="2024-01-01",
+            time="10:00",
+            utc_offset="+0",
+            notification_type="email",
+            user=self.user,
+        )
+
+    def render(self):
+        metrics.registry.flush()
+        return metrics.registry.render()
+
+    def test_heartbeat(self):
+        with mock.patch(
+            "core.tasks.send_notification_and_reschedule_or_delete_event.delay"
+        ):
+            heartbeat()
+        content = self.render()
+        self.assertIn("heartbeat_due_events 1\n", content)
+        self.assertIn("heartbeat_duration_seconds_count 1\n", content)
+
+    @mock.patch("core.tasks.EmailNotification.send_notification", return_value=True)
+    def test_sent_notification(self, send_notification):
+        # Enqueued by a heartbeat 20 seconds ago
+        send_notification_and_reschedule_or_delete_event(self.event.pk, 1704103480)
+        content = self.render()
+        self.assertIn('notifications_sent_total{provider="email"} 1\n', content)
+        self.assertIn(
+            'notification_enqueue_latency_seconds_bucket{le="20"} 1\n', content
+        )
+        self.assertIn(
+            'notification_enqueue_latency_seconds_bucket{le="10"} 0\n', content
+        )
+        # Scheduled 5 minutes ago
+        self.assertIn("notification_lateness_seconds_sum 300\n", content)
+        self.assertIn(
+            'notification_send_duration_seconds_count{provider="email"} 1\n', content
+        )
+
+    @mock.patch("core.tasks.EmailNotification.send_notification", return_value=False)
+    def test_failed_notification(self, send_notification):
+        NotificationService(self.event).send_notification()
+        self.assertIn('notification_errors_total{provider="email"} 1\n', self.render())
+
+    def test_quota_rejection(self):
+        self.user.email_notifications_left = 0
+        self.user.save()
+        event = Event.objects.select_related("user").get(pk=self.event.pk)
+        NotificationService(event).send_notification()
+        self.assertIn(
+            'notification_quota_rejections_total{notification_type="email"} 1\n',
+            self.render(),
+        )
@@ -1,19 +1,26 @@
 from datetime import datetime, timezone
 
+from django.contrib.auth.hashers import make_password
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.serializers import ValidationError
 
 from core.models import (
     Event,
+    add_interval,
     apply_utc_offset,
     custom_variables_validator,
     date_validator,
+    expand_occurrences,
+    get_next_occurrence,
     get_utc_timestamp,
     interval_and_notice_validator,
     parse_notice_time_or_interval,
     time_validator,
     utc_offset_validator,
 )
+from users.models import CustomUser
 
 
 class TestModelValidators(TestCase):
@@ -51,6 +58,11 @@ class TestModelValidators(TestCase):
         with self.assertRaises(ValidationError):
             interval_and_notice_validator("15 minutes")
 
+    def test_interval_and_notice_validator_zero(self):
+        for value in ("0d", "0m", "00min"):
+            with self.assertRaises(ValidationError):
+                interval_and_notice_validator(value)
+
     def test_utc_offset_validator_valid(self):
         try:
             utc_offset_validator("+2")
@@ -101,3 +113,121 @@ class TestModelHelperFuncs(TestCase):
         result = get_utc_timestamp("2024-01-01", "10:00", "+2", "30min")
         expected_result = 1704094200  # Mon Jan 01 2024 07:30:00 GMT+0
         self.assertEqual(result, expected_result)
+
+    def test_add_interval_months(self):
+        datetime_object = datetime(2024, 1, 31, 10, 0)
+        result = add_interval(datetime_object, "1m")
+        expected_result = datetime(2024, 2, 29, 10, 0)
+        self.assertEqual(result, expected_result)
+
+    def test_add_interval_minutes(self):
+        datetime_object = datetime(2024, 1, 1, 10, 0)
+        result = add_interval(datetime_object, "15min", times=3)
+        expected_result = datetime(2024, 1, 1, 10, 45)
+        self.assertEqual(result, expected_result)
+
+    def test_get_next_occurrence(self):
+        datetime_object = datetime(2024, 1, 1, 10, 0)
+        result = get_next_occurrence(datetime_object, "1d", datetime(2024, 1, 3, 9, 0))
+        expected_result = datetime(2024, 1, 3, 10, 0), 2
+        self.assertEqual(result, expected_result)
+
+    def test_get_next_occurrence_years(self):
+        datetime_object = datetime(2020, 2, 29, 10, 0)
+        result = get_next_occurrence(datetime_object, "1y", datetime(2021, 3, 1))
+        expected_result = datetime(2022, 2, 28, 10, 0), 2
+        self.assertEqual(result, expected_result)
+
+    def test_get_next_occurrence_zero_interval(self):
+        datetime_object = datetime(2024, 1, 1, 10, 0)
+        with self.assertRaisesMessage(ValueError, "Invalid interval: 0d"):
+            get_next_occurrence(datetime_object, "0d", datetime(2024, 1, 3))
+
+    def test_expand_occurrences(self):
+        datetime_object = datetime(2024, 1, 31, 10, 0)
+        result = list(
+            expand_occurrences(
+                datetime_object, "1m", None, datetime(2024, 2, 1), datetime(2024, 5, 1)
+            )
+        )
+        expected_result = [
+            datetime(2024, 2, 29, 10, 0),
+            datetime(2024, 3, 31, 10, 0),
+            datetime(2024, 4, 30, 10, 0),
+        ]
+        self.assertEqual(result, expected_result)
+
+    def test_expand_occurrences_with_count(self):
+        datetime_object = datetime(2024, 1, 1, 10, 0)
+        result = list(
+            expand_occurrences(
+                datetime_object, "1d", 3, datetime(2024, 1, 2), datetime(2024, 2, 1)
+            )
+        )
+        expected_result = [datetime(2024, 1, 2, 10, 0), datetime(2024, 1, 3, 10, 0)]
+        self.assertEqual(result, expected_result)
+
+    def test_expand_occurrences_not_recurring(self):
+        datetime_object = datetime(2024, 1, 1, 10, 0)
+        window = datetime(2024, 1, 2), datetime(2024, 2, 1)
+        result = list(expand_occurrences(datetime_object, "-", None, *window))
+        self.assertEqual(result, [])
+
+    def test_expand_occurrences_zero_interval(self):
+        # Saved before zero intervals were rejected, the event occurs once
+        datetime_object = datetime(2024, 1, 2, 10, 0)
+        window = datetime(2024, 1, 1), datetime(2024, 2, 1)
+        for interval in ("0d", "0m"):
+            result = list(expand_occurrences(datetime_object, interval, None, *window))
+            self.assertEqual(result, [datetime_object])
+
+
+class TestDirtyFields(TestCase):
+    """Test suite for saving only the changed fields"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        event = Event.objects.create(
+            title="Title",
+            date="2024-01-01",
+            interval="1d",
+            count=3,
+            user=self.user,
+        )
+        self.event = Event.objects.get(pk=event.pk)
+
+    def test_save_without_changes(self):
+        with self.assertNumQueries(0):
+            self.event.save()
+
+    def test_save_only_writes_changed_fields(self):
+        self.event.count = 2
+        with CaptureQueriesContext(connection) as context:
+            self.event.save()
+        update = context.captured_queries[0]["sql"]
+        self.assertIn('SET "count" = 2 WHERE', update)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).count, 2)
+
+    def test_save_recalculates_timestamp_when_date_changes(self):
+        utc_timestamp = self.event.utc_timestamp
+        self.event.date = "2024-01-02"
+        self.event.save()
+        result = Event.objects.get(pk=self.event.pk).utc_timestamp
+        expected_result = utc_timestamp + 24 * 60 * 60
+        self.assertEqual(result, expected_result)
+
+    def test_save_after_refresh_from_db(self):
+        Event.objects.filter(pk=self.event.pk).update(title="Changed")
+        self.event.refresh_from_db()
+        self.event.title = "Title"
+        self.event.save()
+        self.assertEqual(Event.objects.get(pk=self.event.pk).title, "Title")
+
+    def test_user_save_without_settings_changes(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.email_notifications_left -= 1
+        # Only the user is updated, user settings are not loaded or saved
+        with self.assertNumQueries(1):
+            user.save()
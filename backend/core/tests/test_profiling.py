@@ -0,0 +1,116 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core import profiling
+from users.models import CustomUser
+
+
+class ProfilerTestSuite(APITestCase):
+    """Test suite for ProfilerMiddleware and the profiles admin pages"""
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        settings_override = override_settings(
+            PROFILER_DIR=self.profile_dir, PROFILER_SAMPLE_RATE=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff_user = CustomUser.objects.create_user(
+            email="staff@email.com",
+            username="staff",
+            password=make_password("password"),
+            is_staff=True,
+        )
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+
+    def test_staff_request(self):
+        self.client.force_login(self.staff_user)
+        response = self.client.get("/event/", HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile_id = response["X-Profile-Id"]
+        self.assertEqual(profiling.list_profile_ids(), [profile_id])
+        info = profiling.load_profile_info(profile_id)
+        self.assertEqual(info["path"], "/event/")
+        self.assertEqual(info["user"], self.staff_user.pk)
+        self.assertEqual(info["status"], 200)
+        self.assertTrue(any("core_event" in item["sql"] for item in info["sql"]))
+
+    @override_settings(PROFILER_TOKEN="secret")
+    def test_token_request(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get("/event/", HTTP_X_PROFILE="secret")
+        profile_id = response["X-Profile-Id"]
+        self.assertEqual(profiling.load_profile_info(profile_id)["user"], self.user.pk)
+        with mock.patch("cProfile.Profile") as profile:
+            response = self.client.get("/event/", HTTP_X_PROFILE="wrong")
+        profile.assert_not_called()
+        self.assertNotIn("X-Profile-Id", response)
+
+    def test_other_users_are_not_profiled(self):
+        with mock.patch("cProfile.Profile") as profile:
+            response = self.client.get("/", HTTP_X_PROFILE="1")
+            self.assertNotIn("X-Profile-Id", response)
+            # Staff users authenticated by the view can't enable the profiler
+            self.client.force_authenticate(self.staff_user)
+            response = self.client.get("/event/", HTTP_X_PROFILE="1")
+            self.assertNotIn("X-Profile-Id", response)
+            self.client.force_authenticate(None)
+            self.client.force_login(self.user)
+            response = self.client.get("/event/", HTTP_X_PROFILE="1")
+            self.assertNotIn("X-Profile-Id", response)
+        profile.assert_not_called()
+        self.assertEqual(profiling.list_profile_ids(), [])
+
+    def test_off_by_default(self):
+        self.client.force_authenticate(self.staff_user)
+        with mock.patch("cProfile.Profile") as profile:
+            self.client.get("/event/")
+        profile.assert_not_called()
+        self.assertEqual(profiling.list_profile_ids(), [])
+
+    @override_settings(PROFILER_SAMPLE_RATE=0.5)
+    def test_sample_rate(self):
+        self.client.force_authenticate(self.user)
+        with mock.patch("core.middleware.random.random", return_value=0.4):
+            response = self.client.get("/event/")
+        # Only requests with the header get the id
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(len(profiling.list_profile_ids()), 1)
+        with mock.patch("core.middleware.random.random", return_value=0.6):
+            self.client.get("/event/")
+        self.assertEqual(len(profiling.list_profile_ids()), 1)
+
+    @override_settings(PROFILER_MAX_PROFILES=2)
+    def test_oldest_profiles_are_deleted(self):
+        self.client.force_login(self.staff_user)
+        profile_ids = [
+            self.client.get("/event/", HTTP_X_PROFILE="1")["X-Profile-Id"]
+            for _ in range(3)
+        ]
+        self.assertEqual(profiling.list_profile_ids(), profile_ids[:0:-1])
+
+    def test_admin_download(self):
+        self.client.force_login(self.staff_user)
+        profile_id = self.client.get("/event/", HTTP_X_PROFILE="1")["X-Profile-Id"]
+        response = self.client.get("/admin/profiles/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, profile_id)
+        response = self.client.get(f"/admin/profiles/{profile_id}.prof")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.has_header("Content-Disposition"))
+        response = self.client.get("/admin/profiles/..%2Fsettings.json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_admin_requires_staff(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/admin/profiles/")
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
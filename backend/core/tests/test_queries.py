@@ -0,0 +1,159 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from freezegun import freeze_time
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Event, Note
+from core.queries import QueryBudgetExceeded, query_budget, record_queries
+from core.tasks import heartbeat, send_notification_and_reschedule_or_delete_event
+from users.models import CustomUser
+
+
+class QueryBudgetTestSuite(TestCase):
+    """Test suite for the query recording helpers"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        for i in range(3):
+            Event.objects.create(title=f"Title-{i}", date="2024-01-01", user=self.user)
+
+    def test_record_queries(self):
+        with record_queries() as recorder:
+            for event in Event.objects.all():
+                event.user.email
+        self.assertEqual(recorder.count, 4)
+        [(sql, count)] = recorder.get_repeated()
+        self.assertEqual(count, 3)
+        self.assertIn("users_customuser", sql)
+
+    def test_budget_exceeded(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "2 queries executed"):
+            with query_budget(1):
+                list(Event.objects.all())
+                list(Note.objects.all())
+
+    def test_repeated_statements(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "N+1"):
+            with query_budget(10):
+                for event in Event.objects.all():
+                    event.user.email
+        with query_budget(10):
+            for event in Event.objects.select_related("user"):
+                event.user.email
+
+    @override_settings(QUERY_DEBUG=True)
+    def test_debug_mode(self):
+        self.client.force_login(self.user)
+        with self.assertLogs("core.queries", level="INFO") as logs:
+            self.client.get("/event/")
+        self.assertIn("GET /event/: ", logs.output[0])
+
+    @override_settings(QUERY_DEBUG=True, QUERY_REPEAT_THRESHOLD=2)
+    @mock.patch("core.tasks.send_notification_and_reschedule_or_delete_event.delay")
+    def test_debug_mode_tasks(self, delay):
+        # Events are due, and an N+1 pattern is logged
+        Event.objects.update(utc_timestamp=0)
+        with mock.patch("core.models.Event.__str__", lambda event: event.user.email):
+            # The events are only formatted for debug logs
+            with self.assertLogs("core.tasks", level="DEBUG"):
+                with self.assertLogs("core.queries", level="INFO") as logs:
+                    heartbeat.apply()
+        self.assertIn("core.tasks.heartbeat: 4 queries", logs.output[0])
+        self.assertIn("statement executed 3 times", logs.output[1])
+
+
+class APIQueryBudgetTestSuite(APITestCase):
+    """Query budgets of the event and note endpoints, which must not grow with the number of objects"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        for i in range(5):
+            Event.objects.create(
+                title=f"Title-{i}", date="2024-01-01", time="10:00", user=self.user
+            )
+            Note.objects.create(title=f"Title-{i}", info="info", user=self.user)
+        # As loaded by the authentication class on each request
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        cache.clear()
+
+    def test_event_list(self):
+        with query_budget(1):
+            response = self.client.get("/event/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_event_create(self):
+        data = {"title": "Title", "date": "2024-01-01", "notification_type": "email"}
+        # Event count, user settings, event insert, change log insert
+        with query_budget(4):
+            response = self.client.post("/event/", data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_note_list(self):
+        with query_budget(1):
+            response = self.client.get("/note/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_note_create(self):
+        with query_budget(3):
+            response = self.client.post("/note/", {"info": "info"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@freeze_time("2024-01-01 10:05")
+class TaskQueryBudgetTestSuite(TestCase):
+    """Query budgets of the scheduler and delivery tasks"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        self.events = [
+            Event.objects.create(
+                title=f"Title-{i}",
+                date="2024-01-01",
+                time="10:00",
+                utc_offset="+0",
+                notification_type="email",
+                interval="1d",
+                user=self.user,
+            )
+            for i in range(5)
+        ]
+
+    def test_heartbeat(self):
+        with mock.patch(
+            "core.tasks.send_notification_and_reschedule_or_delete_event.delay"
+        ):
+            # One query for any number of due events
+            with query_budget(1):
+                heartbeat()
+
+    @mock.patch("core.tasks.EmailNotification.send_notification", return_value=True)
+    def test_send_and_reschedule(self, send_notification):
+        # Event with its user and settings, quota update, event update, change log insert
+        with query_budget(4):
+            send_notification_and_reschedule_or_delete_event(
+                self.events[0].pk, 1704103500
+            )
+
+    @mock.patch("core.tasks.requests.Session")
+    def test_send_sms_and_reschedule(self, session):
+        session.return_value.__enter__.return_value.post.return_value.json.return_value = {
+            "messages": [{"status": "0"}]
+        }
+        Event.objects.filter(pk=self.events[0].pk).update(
+            notification_type="sms", recipient="37060000000"
+        )
+        # The sender name is read from the settings loaded with the event
+        with query_budget(4):
+            send_notification_and_reschedule_or_delete_event(
+                self.events[0].pk, 1704103500
+            )
@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer
+
+
+class TestFastJSONRenderer(SimpleTestCase):
+    """Test suite for the orjson renderer"""
+
+    def test_same_output_as_json_renderer(self):
+        data = [
+            {
+                "id": 1,
+                "title": "Šventė \u2028\u2029",
+                "count": None,
+                "created_at": datetime(
+                    2024, 1, 1, 10, 0, 0, 123456, tzinfo=timezone.utc
+                ),
+                "by_category": {"uni": 2},
+                "done": True,
+            }
+        ]
+        result = FastJSONRenderer().render(data)
+        expected_result = JSONRenderer().render(data)
+        self.assertEqual(result, expected_result)
+
+    def test_indent_falls_back_to_json_renderer(self):
+        data = {"id": 1}
+        result = FastJSONRenderer().render(data, "application/json; indent=4")
+        expected_result = JSONRenderer().render(data, "application/json; indent=4")
+        self.assertEqual(result, expected_result)
+
+    def test_empty_response(self):
+        self.assertEqual(FastJSONRenderer().render(None), b"")
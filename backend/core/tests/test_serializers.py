@@ -0,0 +1,54 @@
+from django.contrib.auth.hashers import make_password
+from django.db.models.functions import Left
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Event, Note
+from core.serializers import EventSerializer, NoteSerializer
+from users.models import CustomUser
+
+
+class TestValuesListData(TestCase):
+    """Test suite for the read-only fast path of list serializers"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        Event.objects.create(
+            title="Title", date="2024-01-01", interval="1d", count=2, user=self.user
+        )
+        Event.objects.create(title="Šventė", date="2024-01-02", user=self.user)
+        Note.objects.create(title="Title", info="a" * 200, user=self.user)
+        Note.objects.create(title=None, info="info", user=self.user)
+
+    def assert_same_as_serializer_data(self, serializer_class, queryset, **kwargs):
+        queryset = queryset.order_by("id")
+        plan = serializer_class.get_values_plan(**kwargs)
+        result = serializer_class.values_list_data(
+            queryset.values_list(*plan.columns), plan
+        )
+        expected_result = serializer_class(queryset, many=True, **kwargs).data
+        self.assertEqual(result, expected_result)
+        self.assertEqual(
+            [list(item) for item in result], [list(item) for item in expected_result]
+        )
+
+    def test_events(self):
+        self.assert_same_as_serializer_data(EventSerializer, Event.objects.all())
+
+    def test_events_with_fields(self):
+        self.assert_same_as_serializer_data(
+            EventSerializer, Event.objects.all(), fields=("title", "id", "count")
+        )
+
+    def test_notes(self):
+        self.assert_same_as_serializer_data(NoteSerializer, Note.objects.all())
+
+    def test_notes_in_other_time_zone(self):
+        with timezone.override("Europe/Vilnius"):
+            self.assert_same_as_serializer_data(NoteSerializer, Note.objects.all())
+
+    def test_notes_with_preview(self):
+        queryset = Note.objects.annotate(info_preview=Left("info", 100))
+        self.assert_same_as_serializer_data(NoteSerializer, queryset, preview=True)
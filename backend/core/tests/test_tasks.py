@@ -1,3 +1,5 @@
+from datetime import date
+
 import pytest
 from celery.contrib.testing.worker import start_worker
 from celery.result import AsyncResult
@@ -5,10 +7,15 @@ from django.conf import settings
 from django.contrib.auth.hashers import make_password
 from django.test import SimpleTestCase
 from freezegun import freeze_time
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
 
 import core.tasks
 from backend.celery import app
-from core.models import Event
+from core.cache import get_purge_stats
+from core.models import ChangeLog, Event, Note
 from core.tasks import (
     EmailNotification,
     NotificationEvent,
@@ -16,8 +23,12 @@ from core.tasks import (
     NotificationStrategy,
     SMSNotification,
     heartbeat,
+    purge_expired_records,
+    purge_in_batches,
     reset_notifications_left,
+    send_notification_and_reschedule_or_delete_event,
 )
+from users.cache import get_cached_user
 from users.models import CustomUser
 
 
@@ -377,6 +388,31 @@ class TestNotificationService:
         mock_send_notification_limit_email.assert_called_with()
 
 
+@pytest.mark.django_db
+class TestNotificationDeliveryQueries:
+    @pytest.fixture()
+    def event(self):
+        mock_user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+        return Event.objects.create(
+            title="Title",
+            date="2024-01-01",
+            interval="1d",
+            notification_type="sms",
+            recipient="37069935951",
+            user=mock_user,
+        )
+
+    def test_sms_delivery_query_count(self, event, mocker, django_assert_num_queries):
+        mocker.patch("core.tasks.SMSNotification.send_notification", return_value=True)
+        # Event with its user and settings, notifications left and event date updates, change log
+        with django_assert_num_queries(4):
+            send_notification_and_reschedule_or_delete_event(event.pk, 1704103200)
+        event.refresh_from_db()
+        assert event.date == "2024-01-02"
+
+
 @pytest.mark.django_db
 class TestNotificationEvent:
     @pytest.fixture()
@@ -399,6 +435,12 @@ class TestNotificationEvent:
         notification_event.reschedule_or_delete_event()
         assert Event.objects.count() == 0
 
+    def test_reschedule_or_delete_event_deleted_zero_interval(self, notification_event):
+        notification_event.event.interval = "0h"
+        assert Event.objects.count() == 1
+        notification_event.reschedule_or_delete_event()
+        assert Event.objects.count() == 0
+
     def test_reschedule_or_delete_event_deleted_count_0(self, notification_event):
         notification_event.event.interval = "30min"
         notification_event.event.count = 0
@@ -428,6 +470,151 @@ class TestNotificationEvent:
         assert result == expected_result
 
 
+@pytest.mark.django_db
+@freeze_time("2024-03-01 10:00")
+class TestNotificationQuotas:
+    @pytest.fixture()
+    def user(self):
+        return CustomUser.objects.create_user(
+            email="email@email.com",
+            username="name",
+            password=make_password("password"),
+            email_notifications_left=0,
+            sms_notifications_left=0,
+            quota_period=date(2024, 2, 1),
+        )
+
+    def test_refill_on_first_use_in_new_month(self, user, mocker):
+        event = Event.objects.create(
+            title="Title", date="2024-03-01", notification_type="email", user=user
+        )
+        mocker.patch(
+            "core.tasks.EmailNotification.send_notification", return_value=True
+        )
+        event = Event.objects.select_related("user").get(pk=event.pk)
+        NotificationService(event).send_notification()
+        user.refresh_from_db()
+        assert (
+            user.email_notifications_left == settings.NO_OF_FREE_EMAIL_NOTIFICATIONS - 1
+        )
+        assert user.sms_notifications_left == settings.NO_OF_FREE_SMS_NOTIFICATIONS
+        assert str(user.quota_period) == "2024-03-01"
+
+    def test_no_refill_within_month(self, user):
+        user.quota_period = date(2024, 3, 1)
+        user.save()
+        user = CustomUser.objects.get(pk=user.pk)
+        user.refill_notifications()
+        assert user.email_notifications_left == 0
+
+    def test_reset_in_batches(self, user, settings, mocker):
+        for i in range(4):
+            CustomUser.objects.create_user(
+                email=f"email{i}@email.com",
+                username=f"name{i}",
+                password="password",
+                email_notifications_left=0,
+            )
+        settings.QUOTA_RESET_BATCH_SIZE = 2
+        mock_sleep = mocker.patch("core.tasks.time.sleep")
+        reset_notifications_left()
+        # Batches of 2, 2 and 1 users with a pause after each full batch
+        assert mock_sleep.call_count == 2
+        assert not CustomUser.objects.filter(email_notifications_left=0).exists()
+        assert not CustomUser.objects.exclude(quota_period="2024-03-01").exists()
+
+    def test_reset_invalidates_cached_users(self, user):
+        assert get_cached_user(user.pk).email_notifications_left == 0
+        reset_notifications_left()
+        assert (
+            get_cached_user(user.pk).email_notifications_left
+            == settings.NO_OF_FREE_EMAIL_NOTIFICATIONS
+        )
+
+
+@pytest.mark.django_db
+@freeze_time("2024-03-01 10:00")
+class TestPurgeExpiredRecords:
+    @pytest.fixture()
+    def user(self):
+        return CustomUser.objects.create_user(
+            email="email@email.com", username="name", password=make_password("password")
+        )
+
+    def create_token(self, user, jti, expires_at, blacklisted=False):
+        token = OutstandingToken.objects.create(
+            user=user, jti=jti, token=jti, expires_at=expires_at
+        )
+        if blacklisted:
+            BlacklistedToken.objects.create(token=token)
+
+    def test_purge_tokens(self, user):
+        self.create_token(user, "expired", "2024-02-01T00:00Z", blacklisted=True)
+        self.create_token(user, "expired-2", "2024-02-01T00:00Z")
+        self.create_token(user, "valid", "2024-03-05T00:00Z", blacklisted=True)
+        result = purge_expired_records()
+        assert result["blacklisted_tokens"] == 1
+        assert result["outstanding_tokens"] == 2
+        assert list(OutstandingToken.objects.values_list("jti", flat=True)) == ["valid"]
+        assert BlacklistedToken.objects.count() == 1
+
+    def test_purge_fired_one_shot_events(self, user):
+        fired = Event.objects.create(title="Fired", date="2024-01-01", user=user)
+        Event.objects.create(title="Recent", date="2024-02-28", user=user)
+        Event.objects.create(
+            title="Recurring", date="2024-01-01", interval="1d", user=user
+        )
+        result = purge_expired_records()
+        assert result["events"] == 1
+        assert not Event.objects.filter(title="Fired").exists()
+        assert Event.objects.count() == 2
+        assert ChangeLog.objects.filter(object_id=fired.id, deleted=True).exists()
+
+    def test_purge_old_notes(self, user, settings):
+        with freeze_time("2023-01-01"):
+            Note.objects.create(title="Old", info="info", user=user)
+        Note.objects.create(title="New", info="info", user=user)
+        assert purge_expired_records()["notes"] == 0
+        settings.NOTE_RETENTION_DAYS = 365
+        assert purge_expired_records()["notes"] == 1
+        assert list(Note.objects.values_list("title", flat=True)) == ["New"]
+
+    def test_purge_change_log(self, user):
+        with freeze_time("2024-01-01"):
+            old_event = Event.objects.create(title="Old", date="2099-01-01", user=user)
+            latest_event = Event.objects.create(
+                title="Latest", date="2099-01-01", user=user
+            )
+        assert purge_expired_records()["change_log"] == 1
+        # The latest change is kept even if it is old
+        assert list(ChangeLog.objects.values_list("object_id", flat=True)) == [
+            latest_event.id
+        ]
+        old_event.title = "New"
+        old_event.save()
+        assert purge_expired_records()["change_log"] == 1
+        assert list(ChangeLog.objects.values_list("object_id", flat=True)) == [
+            old_event.id
+        ]
+
+    def test_purge_stats(self, user):
+        Event.objects.create(title="Fired", date="2024-01-01", user=user)
+        purge_expired_records()
+        stats = get_purge_stats()
+        assert stats["purged"]["events"] == 1
+        assert stats["finished_at"] == 1709287200
+
+    def test_purge_in_batches(self, user, django_assert_num_queries):
+        for i in range(5):
+            Event.objects.create(title=f"Fired-{i}", date="2024-01-01", user=user)
+        # Three batches, each with a select, a delete and a change log insert
+        # in its own transaction (a savepoint and its release within the test transaction)
+        with django_assert_num_queries(15):
+            count = purge_in_batches(Event.objects.all(), 2, record_changes=True)
+        assert count == 5
+        assert Event.objects.count() == 0
+
+
 @freeze_time("2020-01-01 10:05")  # Mocks current datetime
 class TestCeleryIntegration(SimpleTestCase):
     databases = "__all__"
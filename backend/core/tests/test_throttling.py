@@ -0,0 +1,129 @@
+from unittest import mock
+
+from rest_framework import status
+from rest_framework.settings import api_settings
+from rest_framework.test import APITestCase
+
+from core.throttling import SlidingWindowThrottle, increment_window_counters
+from users.models import CustomUser
+
+test_rates = {
+    "anon": "3/min",
+    "user": "5/min",
+    "auth": "2/min",
+    "bulk": "1/min",
+    "feed": "2/min",
+}
+
+
+@mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, test_rates)
+class ThrottlingTestSuite(APITestCase):
+    """Test suite for the sliding window throttles"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="email@email.com", username="name", password="password"
+        )
+        self.login_data = {"email": "email@email.com", "password": "wrong"}
+
+    def test_auth_scope(self):
+        for _ in range(2):
+            response = self.client.post("/user/login/", self.login_data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post("/user/login/", self.login_data)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+
+    def test_auth_scope_by_ip_address(self):
+        for _ in range(2):
+            self.client.post("/user/login/", self.login_data)
+        response = self.client.post(
+            "/user/login/", self.login_data, REMOTE_ADDR="10.0.0.2"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_anon_rate(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get("/").status_code, status.HTTP_200_OK)
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_user_rate(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(5):
+            self.assertEqual(self.client.get("/event/").status_code, status.HTTP_200_OK)
+        response = self.client.get("/event/")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Users are limited separately
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com", username="other", password="password"
+        )
+        self.client.force_authenticate(other_user)
+        self.assertEqual(self.client.get("/event/").status_code, status.HTTP_200_OK)
+
+    def test_scope_has_separate_budget(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post("/event/bulk/", [], format="json")
+        self.assertNotEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.post("/event/bulk/", [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.get("/event/").status_code, status.HTTP_200_OK)
+
+    def test_feed_rate_by_user(self):
+        self.client.force_authenticate(self.user)
+        url = self.client.get("/event/feed/").data["url"]
+        self.client.force_authenticate(None)
+        # Calendar services share IP addresses, the anon rate does not apply to feeds
+        for _ in range(3):
+            self.client.get("/")
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        other_user = CustomUser.objects.create_user(
+            email="other@email.com", username="other", password="password"
+        )
+        self.client.force_authenticate(other_user)
+        other_url = self.client.get("/event/feed/").data["url"]
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(other_url).status_code, status.HTTP_200_OK)
+
+    def at(self, seconds):
+        # The time of the throttles, windows of 1 minute start at multiples of 60
+        return mock.patch.object(
+            SlidingWindowThrottle, "timer", return_value=1704103200 + seconds
+        )
+
+    def test_sliding_window(self):
+        with self.at(30):
+            for _ in range(3):
+                self.client.get("/")
+        # Half of the previous window is within the sliding window: 1.5 + 1 requests
+        with self.at(90):
+            self.assertEqual(self.client.get("/").status_code, status.HTTP_200_OK)
+            response = self.client.get("/")
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # 0.75 + 3 requests (the rejected one is counted)
+        with self.at(105):
+            response = self.client.get("/")
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # The previous window has left the sliding window, 3 requests in the current one
+        with self.at(150):
+            self.assertEqual(self.client.get("/").status_code, status.HTTP_200_OK)
+
+
+class WindowCountersTestSuite(APITestCase):
+    """Test suite for the cache counters of the throttles"""
+
+    def test_redis_single_round_trip(self):
+        client = mock.Mock()
+        client.pipeline.return_value.execute.return_value = [3, True, b"5"]
+        with mock.patch("core.throttling.get_redis_client", return_value=client):
+            result = increment_window_counters("key:2", "key:1", timeout=120)
+        self.assertEqual(result, (3, 5))
+        client.pipeline.return_value.execute.assert_called_once_with()
+
+    def test_other_cache_backends(self):
+        self.assertEqual(increment_window_counters("key:2", "key:1", 120), (1, 0))
+        self.assertEqual(increment_window_counters("key:2", "key:1", 120), (2, 0))
+        self.assertEqual(increment_window_counters("key:3", "key:2", 120), (1, 2))
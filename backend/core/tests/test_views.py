@@ -55,6 +55,12 @@ class TestAPIQueryFuncs(TestCase):
         expected_result = Event.objects.filter(title="Title-2")
         self.assertQuerysetEqual(result, expected_result, ordered=False)
 
+    def test_not_operator_with_or(self):
+        result = APIQueryFuncs.not_operator(
+            'OR(EQUAL(title,"Title-1"),GREATER_THAN(date,"2024-01-01"))'
+        )
+        self.assertQuerysetEqual(result, Event.objects.none())
+
     def test_parse_query_using_equal_operator(self):
         result = APIQueryFuncs.parse_query('EQUAL(title,"Title-1")')
         expected_result = "equal", ("title", "Title-1")
@@ -105,3 +111,15 @@ class TestAPIQueryFuncs(TestCase):
         )
         expected_result = Event.objects.filter(title__in=("Title-1", "Title-2"))
         self.assertQuerysetEqual(result, expected_result, ordered=False)
+
+    def test_search_operator(self):
+        result = APIQueryFuncs.search_operator("title", "title 1")
+        expected_result = Event.objects.filter(title="Title-1")
+        self.assertQuerysetEqual(result, expected_result, ordered=False)
+
+    def test_get_queryset_using_search_operator(self):
+        result = APIQueryFuncs.get_queryset(
+            "search", ("title", "title"), queryset=Event.objects.filter(id=1)
+        )
+        expected_result = Event.objects.filter(id=1)
+        self.assertQuerysetEqual(result, expected_result, ordered=False)
@@ -0,0 +1,156 @@
+"""
+Sliding window rate limits, counted in the shared cache.
+Each client has a counter per fixed window. The number of requests in the last
+window length is estimated from the current and the previous counter, weighting the
+previous one by the part of it that is still within the sliding window.
+With the Redis cache, a check is a single pipelined round trip.
+"""
+import logging
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from core.cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def increment_window_counters(key, previous_key, timeout):
+    """
+    Increments the counter of the current window.
+    Returns the counts of the current and of the previous window.
+    """
+    client = get_redis_client()
+    if client is not None:
+        pipeline = client.pipeline(transaction=False)
+        pipeline.incr(cache.make_and_validate_key(key))
+        pipeline.expire(cache.make_and_validate_key(key), timeout)
+        pipeline.get(cache.make_and_validate_key(previous_key))
+        current, _, previous = pipeline.execute()
+        return current, int(previous or 0)
+    # Other cache backends (e.g. in tests) use two round trips
+    cache.add(key, 0, timeout=timeout)
+    current = cache.incr(key)
+    return current, cache.get(previous_key, 0)
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    An abstract throttle, subclasses define the scope and get_cache_key like those of SimpleRateThrottle.
+    Rejected requests are counted as well, so clients that keep retrying stay throttled.
+    If the cache is unavailable, requests are allowed.
+    """
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def get_rate(self):
+        # Read on each request (not at import like SimpleRateThrottle.THROTTLE_RATES),
+        # so that changed settings apply
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = self.now - window * self.duration
+        try:
+            self.current, self.previous = increment_window_counters(
+                f"{self.key}:{window}",
+                f"{self.key}:{window - 1}",
+                # The counter is needed during the next window as well
+                timeout=self.duration * 2,
+            )
+        except Exception as e:
+            logger.warning("Throttle counter update failed: %s", e)
+            return True
+        previous_weight = 1 - self.elapsed / self.duration
+        if self.previous * previous_weight + self.current > self.num_requests:
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        if self.current <= self.num_requests:
+            # Until enough of the previous window has left the sliding window
+            previous_weight = (self.num_requests - self.current) / self.previous
+            return max(self.duration * (1 - previous_weight) - self.elapsed, 0)
+        # Until the next window, and then until enough of this one has left the sliding window
+        return (
+            self.duration
+            - self.elapsed
+            + self.duration * (1 - self.num_requests / self.current)
+        )
+
+
+class AnonSlidingWindowThrottle(SlidingWindowThrottle):
+    """Limits the requests of unauthenticated clients by their IP address"""
+
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class UserSlidingWindowThrottle(SlidingWindowThrottle):
+    """Limits the requests of authenticated users by their id"""
+
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": request.user.pk}
+
+
+class ScopedSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Limits the requests to views with a throttle_scope (e.g. expensive endpoints) separately,
+    by user id or by IP address for unauthenticated clients.
+    """
+
+    def __init__(self):
+        # The scope and rate depend on the view, see allow_request
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, "throttle_scope", None)
+        if self.scope is None:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class FeedSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Limits the requests for calendar feeds by the user id in the feed token instead of the IP
+    address, since calendar services fetch the feeds of many users from a few addresses.
+    Requests without a user id in the token are limited by IP address.
+    """
+
+    scope = "feed"
+
+    def get_cache_key(self, request, view):
+        user_id = request.query_params.get("token", "").split(":", 1)[0]
+        ident = user_id if user_id.isdigit() else self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
@@ -5,7 +5,7 @@ from rest_framework import serializers
 regex_dict = {
     "date": "^\d{4}\-(0[1-9]|1[012])\-(0[1-9]|[12][0-9]|3[01])$",  # yyyy-mm-dd
     "time": "^(0[0-9]|1[0-9]|2[0-3]):[0-5][0-9]$",  # hh:mm
-    "interval_and_notice": "^\d+(y|m|d|h|min)$",
+    "interval_and_notice": "^\d*[1-9]\d*(y|m|d|h|min)$",  # At least 1
     "utc_offset": "^[+-]\d{1,2}:?\d{0,2}$",  # +/-h(:mm)
     "phone_number": "^370\d{8}$",
     "email": "^[a-z0-9]+(?:[._][a-z0-9]+)*@(?:\w+\.)+\w{2,3}$",
@@ -40,7 +40,7 @@ def interval_and_notice_validator(value):
     if not re.fullmatch(regex, value) and value != "-":
         raise serializers.ValidationError(
             "Invalid interval/notice format. Valid units: y, m, d, h, min. "
-            "Valid examples: 15min, 1y"
+            "The number must be at least 1. Valid examples: 15min, 1y"
         )
 
 
@@ -87,3 +87,16 @@ def custom_variables_validator(value):
         raise serializers.ValidationError(
             "Invalid custom variables format. Valid example: 'name=Tom; surname=Smith'"
         )
+
+
+api_key_scopes = ("event:read", "event:write", "note:read", "note:write")
+
+
+def api_key_scopes_validator(value):
+    scopes = [scope.strip() for scope in value.split(",")]
+    invalid_scopes = [scope for scope in scopes if scope not in api_key_scopes]
+    if invalid_scopes:
+        raise serializers.ValidationError(
+            f"Invalid scopes: {', '.join(invalid_scopes)}. "
+            f"Available scopes: {', '.join(api_key_scopes)}"
+        )
@@ -1,20 +1,65 @@
+import csv
+import hmac
+import json
 import re
+import uuid
 from abc import ABCMeta, abstractmethod
+from datetime import datetime, timedelta, timezone
 
-from django.http import Http404
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Q
+from django.db.models.functions import Left
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.generics import GenericAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from core.models import Event, Note
+from core import metrics
+from core.cache import get_etag, get_or_set_feed, get_or_set_list, get_or_set_stats
+from core.ics import render_ics_feed
+from core.models import (
+    ChangeLog,
+    Event,
+    Note,
+    apply_utc_offset,
+    expand_occurrences,
+    parse_notice_time_or_interval,
+)
 from core.serializers import EventSerializer, NoteSerializer
+from core.signals import record_bulk_changes
+from core.tasks import import_ics_events
+from core.throttling import FeedSlidingWindowThrottle
 from core.validators import regex_dict
+from users.cache import get_user_settings
+from users.permissions import APIKeyScopePermission
 
 QUERY_LIMIT = 5
+PREVIEW_LENGTH = 100
+CHANGES_LIMIT = 100
+BULK_LIMIT = 2000
+BULK_BATCH_SIZE = 500
+QUERY_CHANGE_LIMIT = 1000
+EXPORT_CHUNK_SIZE = 2000
+FEED_TOKEN_SALT = "core.views.feed"
+OCCURRENCES_LIMIT = 10000
+OCCURRENCES_MAX_DAYS = 366
+STATS_UPCOMING_DAYS = 30
 
 
 class APIQueryFuncs:
@@ -40,16 +85,63 @@ class APIQueryFuncs:
             kwargs.update(cls.get_filter_kwargs(*cls.parse_query(query)))
         return kwargs
 
+    @classmethod
+    def apply_nested_query(cls, query, queryset):
+        # Nested queries of AND, OR and NOT may use any operator, including SEARCH,
+        # so they are applied as querysets rather than converted into filter kwargs
+        return cls.get_queryset(*cls.parse_query(query), queryset=queryset)
+
+    @classmethod
+    def and_operator(cls, *queries, queryset=Event.objects):
+        for query in queries:
+            queryset = cls.apply_nested_query(query, queryset)
+        return queryset
+
     @classmethod
     def or_operator(cls, a, b, queryset=Event.objects):
-        kwargs_a = cls.get_filter_kwargs(*cls.parse_query(a))
-        kwargs_b = cls.get_filter_kwargs(*cls.parse_query(b))
-        return queryset.filter(**kwargs_a) | queryset.filter(**kwargs_b)
+        return cls.apply_nested_query(a, queryset) | cls.apply_nested_query(b, queryset)
 
     @classmethod
     def not_operator(cls, query, queryset=Event.objects):
-        kwargs = cls.get_filter_kwargs(*cls.parse_query(query))
-        return queryset.exclude(**kwargs)
+        matching = cls.apply_nested_query(query, queryset)
+        return queryset.exclude(pk__in=matching.values("pk"))
+
+    @staticmethod
+    def search_operator(prop, terms, queryset=Event.objects):
+        if connection.vendor == "postgresql":
+            # Matches the GIN index expression defined on the model
+            vector = SearchVector(prop, config=settings.SEARCH_CONFIG)
+            search_query = SearchQuery(
+                terms, config=settings.SEARCH_CONFIG, search_type="websearch"
+            )
+            return (
+                queryset.annotate(search_vector=vector)
+                .filter(search_vector=search_query)
+                .annotate(search_rank=SearchRank(vector, search_query))
+            )
+        # Fallback for other databases: every term has to be present in the field
+        for term in terms.split():
+            queryset = queryset.filter(**{f"{prop}__icontains": term})
+        return queryset
+
+    @staticmethod
+    def parse_fields(fields, serializer_class):
+        # Converts the comma separated 'fields' parameter into a list of field names
+        if not fields:
+            return None
+        fields = [field.strip() for field in fields.split(",")]
+        available_fields = serializer_class.get_readable_fields()
+        invalid_fields = [field for field in fields if field not in available_fields]
+        if invalid_fields:
+            raise ValueError(
+                f"Invalid fields: {', '.join(invalid_fields)}. "
+                f"Available fields: {', '.join(available_fields)}"
+            )
+        return fields
+
+    @staticmethod
+    def parse_boolean(value):
+        return value.lower() in ("1", "true")
 
     @staticmethod
     def query_regex_check(query):
@@ -59,11 +151,19 @@ class APIQueryFuncs:
 
     @staticmethod
     def parse_query_operator(query_split):
-        valid_operators = ("equal", "and", "or", "not", "greater_than", "less_than")
+        valid_operators = (
+            "equal",
+            "and",
+            "or",
+            "not",
+            "greater_than",
+            "less_than",
+            "search",
+        )
         operator = query_split[0].lower()
         if operator not in valid_operators:
             raise ValueError(
-                "Invalid operator. Available operators: EQUAL, AND, OR, NOT, GREATER_THAN, LESS_THAN"
+                "Invalid operator. Available operators: EQUAL, AND, OR, NOT, GREATER_THAN, LESS_THAN, SEARCH"
             )
         return operator
 
@@ -96,19 +196,45 @@ class APIQueryFuncs:
         operator_kwargs_func = getattr(cls, f"_{operator}_kwargs")
         return operator_kwargs_func(*args)
 
+    @classmethod
+    def get_user_queryset(cls, model, user, query):
+        # Returns the user's entries matching the query
+        queryset = model.objects.all().filter(user=user)
+        if not query:
+            # Get all entries if no query provided
+            return queryset
+        return cls.get_queryset(*cls.parse_query(query), queryset=queryset)
+
     @classmethod
     def get_queryset(cls, operator, args, queryset=Event.objects):
         # Executes the required data filtering/selection operations based on operator
-        if operator in ("equal", "and", "less_than", "greater_than"):
+        if operator in ("equal", "less_than", "greater_than"):
             return queryset.filter(**cls.get_filter_kwargs(operator, args))
-        elif operator in ("not", "or"):
+        elif operator in ("and", "not", "or", "search"):
             operator_func = getattr(cls, f"{operator}_operator")
-            return operator_func(*args)
+            return operator_func(*args, queryset=queryset)
 
 
 ownership_error_message = "You are not the owner of this object"
 
 
+def etag_matches(request, etag):
+    """Checks whether the If-None-Match header of the request contains the ETag"""
+    if_none_match = request.headers.get("If-None-Match")
+    if not etag or not if_none_match:
+        return False
+    # Weak validators are accepted as proxies (e.g. gzip) may weaken the ETag
+    return etag in [tag.removeprefix("W/") for tag in parse_etags(if_none_match)]
+
+
+def not_modified_response(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def etag_headers(etag):
+    return {"ETag": etag} if etag else None
+
+
 def apply_swagger_schema(swagger_kwargs):
     """Decorator for overriding the automatically generated swagger schema for children of the APIView abstract class
     in order to include extra details"""
@@ -142,7 +268,36 @@ class APIView(GenericAPIView, metaclass=ABCMeta):
     def order_by(self):
         pass
 
-    permission_classes = (IsAuthenticated,)
+    @property
+    @abstractmethod
+    def query_update_fields(self):
+        # Fields that can be changed by PATCH requests with a query
+        pass
+
+    def get_ordering(self, queryset):
+        # Full-text search results are ranked by relevance first
+        if "search_rank" in queryset.query.annotations:
+            return "-search_rank", self.order_by
+        return (self.order_by,)
+
+    def annotate_previews(self, queryset, preview):
+        # Truncates preview fields in SQL
+        if preview:
+            preview_fields = getattr(self.serializer_class.Meta, "preview_fields", ())
+            queryset = queryset.annotate(
+                **{
+                    f"{field}_preview": Left(field, PREVIEW_LENGTH)
+                    for field in preview_fields
+                }
+            )
+        return queryset
+
+    def get_values_plan(self, fields, preview):
+        return self.serializer_class.get_values_plan(
+            tuple(fields) if fields is not None else None, preview
+        )
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
 
     def post(self, request):
         try:
@@ -176,9 +331,17 @@ class APIView(GenericAPIView, metaclass=ABCMeta):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    fields_description = (
+        "Comma separated list of fields to be returned, e.g. 'id,title,date'. "
+        "All fields are returned if not provided."
+    )
+    preview_description = (
+        f"If 'true', long text fields are truncated to {PREVIEW_LENGTH} characters."
+    )
+
     query_description = (
         "Defines the filter to be applied to the data set. Available operators: equal, and, or, not,"
-        " greater_than, less_than. Some operators can be combined. See readme at "
+        " greater_than, less_than, search. Some operators can be combined. See readme at "
         "https://github.com/zmilv/dont-forgetter for usage examples."
     )
 
@@ -189,27 +352,164 @@ class APIView(GenericAPIView, metaclass=ABCMeta):
                 openapi.IN_QUERY,
                 description=query_description,
                 type=openapi.TYPE_STRING,
-            )
+            ),
+            openapi.Parameter(
+                "fields",
+                openapi.IN_QUERY,
+                description=fields_description,
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "preview",
+                openapi.IN_QUERY,
+                description=preview_description,
+                type=openapi.TYPE_BOOLEAN,
+            ),
         ]
     )
     def get(self, request):
         try:
             user = request.user
+            etag = get_etag(self.model, user.id, self.request.query_params)
+            if etag_matches(request, etag):
+                return not_modified_response(etag)
             query = self.request.query_params.get("query", "")
-            if not query:
-                # Get all entries if no query provided
-                self.queryset = (
-                    self.model.objects.all()
-                    .filter(user=user)
-                    .order_by(self.order_by)[:QUERY_LIMIT]
+            fields = APIQueryFuncs.parse_fields(
+                self.request.query_params.get("fields", ""), self.serializer_class
+            )
+            preview = APIQueryFuncs.parse_boolean(
+                self.request.query_params.get("preview", "")
+            )
+
+            def build_list():
+                queryset = APIQueryFuncs.get_user_queryset(self.model, user, query)
+                queryset = self.annotate_previews(queryset, preview).order_by(
+                    *self.get_ordering(queryset)
+                )[:QUERY_LIMIT]
+                # Only the returned columns are loaded, as plain rows instead of model instances
+                plan = self.get_values_plan(fields, preview)
+                rows = queryset.values_list(*plan.columns)
+                return self.serializer_class.values_list_data(rows, plan)
+
+            data = get_or_set_list(
+                self.model, user.id, self.request.query_params, build_list
+            )
+            return Response(data, status=status.HTTP_200_OK, headers=etag_headers(etag))
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    dry_run_description = "If 'true', only the number of matching entries is returned."
+
+    def get_ids_to_change(self, request):
+        # Resolves the query to the ids of the matching entries, refusing too large changes
+        query = self.request.query_params.get("query", "")
+        if not query:
+            raise ValueError("A query is required")
+        ids = list(
+            APIQueryFuncs.get_user_queryset(
+                self.model, request.user, query
+            ).values_list("id", flat=True)[: QUERY_CHANGE_LIMIT + 1]
+        )
+        if len(ids) > QUERY_CHANGE_LIMIT:
+            raise ValueError(
+                f"The query matches more than {QUERY_CHANGE_LIMIT} entries. "
+                f"Please use a narrower query."
+            )
+        return ids
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "query",
+                openapi.IN_QUERY,
+                description=query_description,
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter(
+                "dry_run",
+                openapi.IN_QUERY,
+                description=dry_run_description,
+                type=openapi.TYPE_BOOLEAN,
+            ),
+        ]
+    )
+    def delete(self, request):
+        try:
+            ids = self.get_ids_to_change(request)
+            if APIQueryFuncs.parse_boolean(
+                self.request.query_params.get("dry_run", "")
+            ):
+                return Response(
+                    {"result": "success", "count": len(ids)}, status=status.HTTP_200_OK
                 )
-            else:
-                self.queryset = APIQueryFuncs.get_queryset(
-                    *APIQueryFuncs.parse_query(query),
-                    queryset=self.model.objects.all().filter(user=user),
-                ).order_by(self.order_by)[:QUERY_LIMIT]
-            serializer = self.serializer_class(self.queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            with transaction.atomic():
+                # A single DELETE statement, model signals are replaced by record_bulk_changes
+                count = self.model.objects.filter(id__in=ids)._raw_delete(
+                    self.model.objects.db
+                )
+                record_bulk_changes(self.model, request.user.id, ids, deleted=True)
+            return Response(
+                {"result": "success", "message": f"{count} deleted", "count": count},
+                status=status.HTTP_200_OK,
+            )
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "query",
+                openapi.IN_QUERY,
+                description=query_description,
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter(
+                "dry_run",
+                openapi.IN_QUERY,
+                description=dry_run_description,
+                type=openapi.TYPE_BOOLEAN,
+            ),
+        ]
+    )
+    def patch(self, request):
+        try:
+            invalid_fields = [
+                field for field in request.data if field not in self.query_update_fields
+            ]
+            if invalid_fields:
+                raise ValueError(
+                    f"Invalid fields: {', '.join(invalid_fields)}. "
+                    f"Fields that can be updated: {', '.join(self.query_update_fields)}"
+                )
+            serializer = self.serializer_class(
+                data=request.data, context={"request": request}, partial=True
+            )
+            serializer.is_valid(raise_exception=True)
+            ids = self.get_ids_to_change(request)
+            if APIQueryFuncs.parse_boolean(
+                self.request.query_params.get("dry_run", "")
+            ):
+                return Response(
+                    {"result": "success", "count": len(ids)}, status=status.HTTP_200_OK
+                )
+            values = serializer.validated_data
+            if "updated_at" in [field.name for field in self.model._meta.fields]:
+                values["updated_at"] = datetime.now(timezone.utc)
+            with transaction.atomic():
+                count = self.model.objects.filter(id__in=ids).update(**values)
+                record_bulk_changes(self.model, request.user.id, ids)
+            return Response(
+                {"result": "success", "message": f"{count} updated", "count": count},
+                status=status.HTTP_200_OK,
+            )
         except Exception as e:
             return Response(
                 {"result": "error", "message": str(e)},
@@ -230,14 +530,39 @@ class APIDetailView(GenericAPIView, metaclass=ABCMeta):
     def serializer_class(self):
         pass
 
-    permission_classes = (IsAuthenticated,)
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "fields",
+                openapi.IN_QUERY,
+                description=APIView.fields_description,
+                type=openapi.TYPE_STRING,
+            )
+        ]
+    )
     def get(self, request, id):
         try:
-            event = self.model.objects.get(pk=id)
-            if event.user == request.user:
-                serializer = self.serializer_class(event)
-                return Response(serializer.data, status=status.HTTP_200_OK)
+            etag = get_etag(
+                self.model, request.user.id, self.request.query_params, id=id
+            )
+            if etag_matches(request, etag):
+                return not_modified_response(etag)
+            fields = APIQueryFuncs.parse_fields(
+                self.request.query_params.get("fields", ""), self.serializer_class
+            )
+            queryset = self.model.objects.all()
+            if fields:
+                queryset = queryset.only("user", *fields)
+            event = queryset.get(pk=id)
+            if event.user_id == request.user.id:
+                serializer = self.serializer_class(event, fields=fields)
+                return Response(
+                    serializer.data,
+                    status=status.HTTP_200_OK,
+                    headers=etag_headers(etag),
+                )
             return Response(
                 {"result": "error", "message": ownership_error_message},
                 status=status.HTTP_403_FORBIDDEN,
@@ -268,6 +593,333 @@ class APIDetailView(GenericAPIView, metaclass=ABCMeta):
             )
 
 
+class APIChangesView(GenericAPIView, metaclass=ABCMeta):
+    """An abstract class for building incremental sync API views for different models"""
+
+    @property
+    @abstractmethod
+    def model(self):
+        pass
+
+    @property
+    @abstractmethod
+    def serializer_class(self):
+        pass
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+
+    since_description = (
+        "Change token returned by the previous request. If not provided, a snapshot of all "
+        "objects is returned, followed by a token for the changes made after it."
+    )
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "since",
+                openapi.IN_QUERY,
+                description=since_description,
+                type=openapi.TYPE_STRING,
+            )
+        ]
+    )
+    def get(self, request):
+        try:
+            since, snapshot_after = parse_change_token(
+                self.request.query_params.get("since")
+            )
+        except ValueError:
+            return Response(
+                {"result": "error", "message": "Invalid change token"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            if since is not None and is_change_token_expired(since):
+                return Response(
+                    {
+                        "result": "error",
+                        "message": "The change token has expired, sync again without 'since'",
+                    },
+                    status=status.HTTP_410_GONE,
+                )
+            if since is None or snapshot_after is not None:
+                return self.get_snapshot(request.user, since, snapshot_after or 0)
+            return self.get_changes(request.user, since)
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    def get_snapshot(self, user, since, after):
+        """
+        Returns a page of all objects of the user as changes. The token of the last page
+        is the change id up to which the snapshot includes all changes.
+        """
+        if since is None:
+            # Before the objects are read, all changes up to it are committed
+            since = get_settled_change_id()
+        objects = list(
+            self.model.objects.filter(user=user, pk__gt=after).order_by("pk")[
+                : CHANGES_LIMIT + 1
+            ]
+        )
+        has_more = len(objects) > CHANGES_LIMIT
+        objects = objects[:CHANGES_LIMIT]
+        changes = [
+            {"id": obj.pk, "deleted": False, "data": self.serializer_class(obj).data}
+            for obj in objects
+        ]
+        token = f"snapshot:{since}:{objects[-1].pk}" if has_more else str(since)
+        return Response(
+            {"token": token, "has_more": has_more, "changes": changes},
+            status=status.HTTP_200_OK,
+        )
+
+    def get_changes(self, user, since):
+        change_log = list(
+            ChangeLog.objects.filter(
+                user=user, model=self.model._meta.model_name, id__gt=since
+            )
+            .order_by("id")
+            .values_list("id", "object_id", "deleted", "created_at")[
+                : CHANGES_LIMIT + 1
+            ]
+        )
+        has_more = len(change_log) > CHANGES_LIMIT
+        change_log = change_log[:CHANGES_LIMIT]
+        # Changes are returned up to the first one that is not settled, a transaction
+        # recording a change with a lower id may still be running
+        settle_time = get_change_settle_time()
+        for index, (_, _, _, created_at) in enumerate(change_log):
+            if created_at > settle_time:
+                change_log = change_log[:index]
+                has_more = False
+                break
+
+        # Only the latest change of every object matters
+        latest_changes = dict()
+        for _, object_id, deleted, _ in change_log:
+            latest_changes.pop(object_id, None)
+            latest_changes[object_id] = deleted
+        objects = self.model.objects.filter(user=user).in_bulk(
+            [object_id for object_id, deleted in latest_changes.items() if not deleted]
+        )
+
+        changes = []
+        for object_id in latest_changes:
+            if object_id in objects:
+                data = self.serializer_class(objects[object_id]).data
+                changes.append({"id": object_id, "deleted": False, "data": data})
+            else:
+                # Deleted after this batch of changes was recorded
+                changes.append({"id": object_id, "deleted": True, "data": None})
+        token = change_log[-1][0] if change_log else since
+        return Response(
+            {"token": str(token), "has_more": has_more, "changes": changes},
+            status=status.HTTP_200_OK,
+        )
+
+
+def parse_change_token(value):
+    """
+    Returns the change id and, for tokens of the next page of a snapshot, the last returned
+    object id. Tokens are '<change id>' or 'snapshot:<change id>:<object id>'.
+    Raises ValueError for invalid tokens.
+    """
+    if not value:
+        return None, None
+    if value.startswith("snapshot:"):
+        since, after = value[len("snapshot:") :].split(":")
+        return int(since), int(after)
+    return int(value), None
+
+
+def get_change_settle_time():
+    return datetime.now(timezone.utc) - timedelta(
+        seconds=settings.CHANGES_SETTLE_SECONDS
+    )
+
+
+def get_settled_change_id():
+    """
+    Returns the id of the latest settled change. The transactions of all changes with
+    lower ids have finished, as they were recorded before it.
+    """
+    change_ids = ChangeLog.objects.aggregate(
+        settled_id=Max("id", filter=Q(created_at__lte=get_change_settle_time())),
+        oldest_id=Min("id"),
+    )
+    if change_ids["settled_id"] is not None:
+        return change_ids["settled_id"]
+    # Only recent changes, which are all after the returned id
+    return (change_ids["oldest_id"] or 1) - 1
+
+
+def is_change_token_expired(since):
+    """
+    Returns True if changes after the token may have been purged.
+    The purge keeps the latest change, so the oldest change shows how far it went.
+    """
+    oldest_id = ChangeLog.objects.aggregate(Min("id"))["id__min"]
+    if oldest_id is None:
+        return since > 0
+    return since < oldest_id - 1
+
+
+class EchoBuffer:
+    """A file-like object that returns the written value instead of storing it, used for streaming CSV"""
+
+    def write(self, value):
+        return value
+
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class APIExportView(GenericAPIView, metaclass=ABCMeta):
+    """An abstract class for building streaming export API views for different models"""
+
+    @property
+    @abstractmethod
+    def model(self):
+        pass
+
+    @property
+    @abstractmethod
+    def serializer_class(self):
+        pass
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+    throttle_scope = "export"
+
+    file_format_description = "Export file format: ndjson (default) or csv."
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "query",
+                openapi.IN_QUERY,
+                description=APIView.query_description,
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "fields",
+                openapi.IN_QUERY,
+                description=APIView.fields_description,
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "file_format",
+                openapi.IN_QUERY,
+                description=file_format_description,
+                type=openapi.TYPE_STRING,
+                enum=["ndjson", "csv"],
+            ),
+        ]
+    )
+    def get(self, request):
+        try:
+            file_format = self.request.query_params.get("file_format", "ndjson")
+            if file_format not in ("ndjson", "csv"):
+                raise ValueError("Invalid file format. Available formats: ndjson, csv")
+            fields = (
+                APIQueryFuncs.parse_fields(
+                    self.request.query_params.get("fields", ""), self.serializer_class
+                )
+                or self.serializer_class.get_readable_fields()
+            )
+            # Rows are read in chunks as plain tuples, so memory use does not grow with the export size
+            rows = (
+                APIQueryFuncs.get_user_queryset(
+                    self.model, request.user, self.request.query_params.get("query", "")
+                )
+                .order_by("id")
+                .values_list(*fields)
+                .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            )
+            if file_format == "csv":
+                lines = self.csv_lines(fields, rows)
+                content_type = "text/csv"
+            else:
+                lines = self.ndjson_lines(fields, rows)
+                content_type = "application/x-ndjson"
+            response = StreamingHttpResponse(lines, content_type=content_type)
+            response[
+                "Content-Disposition"
+            ] = f'attachment; filename="{self.model._meta.model_name}s.{file_format}"'
+            return response
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @staticmethod
+    def ndjson_lines(fields, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + "\n"
+
+    @staticmethod
+    def csv_lines(fields, rows):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([export_value(value) for value in row])
+
+
+class APIStatsView(GenericAPIView, metaclass=ABCMeta):
+    """An abstract class for building statistics API views for different models"""
+
+    @property
+    @abstractmethod
+    def model(self):
+        pass
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+
+    @abstractmethod
+    def get_stats(self, queryset, user):
+        pass
+
+    @staticmethod
+    def count_by(queryset, field):
+        # Grouped and counted in SQL, e.g. {'uni': 3, 'work': 1}
+        rows = queryset.values(field).annotate(count=Count("id")).order_by(field)
+        return {row[field]: row["count"] for row in rows}
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "query",
+                openapi.IN_QUERY,
+                description=APIView.query_description,
+                type=openapi.TYPE_STRING,
+            ),
+        ]
+    )
+    def get(self, request):
+        try:
+            user = request.user
+
+            def build_stats():
+                queryset = APIQueryFuncs.get_user_queryset(
+                    self.model, user, self.request.query_params.get("query", "")
+                )
+                return self.get_stats(queryset, user)
+
+            data = get_or_set_stats(
+                self.model, user.id, self.request.query_params, build_stats
+            )
+            return Response(data, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
 @apply_swagger_schema(
     {
         "request_body": openapi.Schema(
@@ -323,6 +975,422 @@ class EventAPIView(APIView):
     model = Event
     serializer_class = EventSerializer
     order_by = "utc_timestamp"
+    # Other fields affect the UTC timestamp or recipient, which are calculated per event
+    query_update_fields = (
+        "category",
+        "title",
+        "custom_email_subject",
+        "custom_message",
+        "custom_variables",
+    )
+
+
+class EventAPIBulkView(GenericAPIView):
+    """An APIView for storing many events at once"""
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+    throttle_scope = "bulk"
+    api_key_resource = "event"
+    serializer_class = EventSerializer
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                description="Same fields as for POST event/ ('id' to edit an event)",
+            ),
+        )
+    )
+    def post(self, request):
+        try:
+            items = request.data
+            if not isinstance(items, list):
+                raise ValueError("A list of events is expected")
+            if len(items) > BULK_LIMIT:
+                raise ValueError(f"At most {BULK_LIMIT} events can be stored at once")
+
+            user = request.user
+            # User defaults are resolved once for the whole batch
+            user_settings = get_user_settings(user)
+            ids = [item.get("id") for item in items if isinstance(item, dict)]
+            existing_events = Event.objects.filter(user=user).in_bulk(
+                [id for id in ids if isinstance(id, int)]
+            )
+
+            new_events, updated_events, results, errors = [], [], [], []
+            for index, item in enumerate(items):
+                if not isinstance(item, dict):
+                    errors.append({"index": index, "errors": "An object is expected"})
+                    continue
+                id = item.get("id")
+                if id is not None and (not isinstance(id, int) or isinstance(id, bool)):
+                    errors.append({"index": index, "errors": "Invalid id"})
+                    continue
+                event = existing_events.get(id)
+                if id is not None and event is None:
+                    # Another user's event or a deleted one, items with an id are never created
+                    errors.append({"index": index, "errors": ownership_error_message})
+                    continue
+                serializer = self.serializer_class(
+                    event,
+                    data=item,
+                    context={"request": request},
+                    partial=event is not None,
+                )
+                if not serializer.is_valid():
+                    errors.append({"index": index, "errors": serializer.errors})
+                    continue
+                if event is None:
+                    event = Event(**serializer.validated_data)
+                else:
+                    for attr, value in serializer.validated_data.items():
+                        setattr(event, attr, value)
+                try:
+                    event.prepare(user_settings)
+                except serializers.ValidationError as e:
+                    errors.append({"index": index, "errors": e.detail})
+                    continue
+                (new_events if event.pk is None else updated_events).append(event)
+                results.append(event)
+
+            with transaction.atomic():
+                Event.objects.bulk_create(new_events, batch_size=BULK_BATCH_SIZE)
+                Event.objects.bulk_update(
+                    updated_events,
+                    [
+                        field.name
+                        for field in Event._meta.concrete_fields
+                        if not field.primary_key
+                    ],
+                    batch_size=BULK_BATCH_SIZE,
+                )
+                record_bulk_changes(Event, user.id, [event.pk for event in results])
+            return Response(
+                {
+                    "results": self.serializer_class(results, many=True).data,
+                    "errors": errors,
+                },
+                status=status.HTTP_200_OK,
+            )
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class EventAPIIcsImportView(GenericAPIView):
+    """An APIView for importing events from an iCalendar file"""
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+    throttle_scope = "bulk"
+    api_key_resource = "event"
+    parser_classes = (MultiPartParser,)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "file",
+                openapi.IN_FORM,
+                description="iCalendar (.ics) file",
+                type=openapi.TYPE_FILE,
+                required=True,
+            )
+        ]
+    )
+    def post(self, request):
+        try:
+            uploaded_file = request.FILES.get("file")
+            if uploaded_file is None:
+                raise ValueError("An iCalendar file has to be uploaded as 'file'")
+            # The file is handed over to the Celery worker through the shared import directory
+            settings.ICS_IMPORT_DIR.mkdir(exist_ok=True)
+            path = settings.ICS_IMPORT_DIR / f"{uuid.uuid4()}.ics"
+            with open(path, "wb") as file:
+                for chunk in uploaded_file.chunks():
+                    file.write(chunk)
+            task_id = import_ics_events.delay(request.user.id, str(path)).id
+            return Response(
+                {"result": "success", "task_id": task_id},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class EventAPIIcsImportStatusView(GenericAPIView):
+    """An APIView for getting the progress of an iCalendar import"""
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+    api_key_resource = "event"
+
+    def get(self, request, task_id):
+        try:
+            task = import_ics_events.AsyncResult(task_id)
+            progress = task.info if isinstance(task.info, dict) else None
+            if progress is not None and progress.get("user_id") != request.user.id:
+                return Response(
+                    {"result": "error", "message": ownership_error_message},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+            data = {"state": task.state, "progress": progress}
+            if task.state == "FAILURE":
+                data["message"] = "Import failed"
+            return Response(data, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class EventFeedURLView(GenericAPIView):
+    """An APIView for getting and rotating the URL of the user's calendar feed"""
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+
+    @staticmethod
+    def get_feed_url(request):
+        token = signing.Signer(salt=f"{FEED_TOKEN_SALT}:{request.user.feed_key}").sign(
+            str(request.user.id)
+        )
+        return request.build_absolute_uri(f"/event/feed.ics?token={token}")
+
+    def get(self, request):
+        try:
+            return Response(
+                {"url": self.get_feed_url(request)}, status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    def post(self, request):
+        # Revokes the previous URL, e.g. after it was shared by mistake
+        try:
+            request.user.rotate_feed_key()
+            return Response(
+                {"url": self.get_feed_url(request)}, status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class EventFeedView(GenericAPIView):
+    """An APIView serving the iCalendar feed of a user, authenticated by the token in the URL"""
+
+    # Calendar apps can't log in, the token is the user id signed with the user's feed key
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    throttle_classes = (FeedSlidingWindowThrottle,)
+
+    @staticmethod
+    def get_feed_user_id(token):
+        user_id = token.split(":", 1)[0]
+        if not user_id.isdigit():
+            return None
+        user = (
+            get_user_model()
+            .objects.filter(id=int(user_id), is_active=True)
+            .only("id", "feed_key")
+            .first()
+        )
+        if user is None:
+            return None
+        try:
+            signing.Signer(salt=f"{FEED_TOKEN_SALT}:{user.feed_key}").unsign(token)
+        except signing.BadSignature:
+            return None
+        return user.id
+
+    def get(self, request):
+        try:
+            user_id = self.get_feed_user_id(request.query_params.get("token", ""))
+            if user_id is None:
+                return Response(
+                    {"result": "error", "message": "Invalid feed token"},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+            etag, last_modified, content = get_or_set_feed(
+                Event, user_id, lambda: self.render_feed(user_id)
+            )
+            if_modified_since = parse_http_date_safe(
+                request.headers.get("If-Modified-Since", "")
+            )
+            if etag_matches(request, etag) or (
+                "If-None-Match" not in request.headers
+                and if_modified_since
+                and if_modified_since >= int(last_modified)
+            ):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(
+                    content, content_type="text/calendar; charset=utf-8"
+                )
+            if etag:
+                response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            return response
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @staticmethod
+    def render_feed(user_id):
+        events = (
+            Event.objects.filter(user_id=user_id)
+            .order_by("utc_timestamp")
+            .values(
+                "id",
+                "title",
+                "category",
+                "interval",
+                "count",
+                "date",
+                "time",
+                "utc_offset",
+            )
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+
+        def with_start(event):
+            local_datetime = datetime.strptime(
+                f"{event['date']} {event['time']}", "%Y-%m-%d %H:%M"
+            ).replace(tzinfo=timezone.utc)
+            event["start"] = apply_utc_offset(event["utc_offset"], local_datetime)
+            return event
+
+        dtstamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        return render_ics_feed(map(with_start, events), dtstamp)
+
+
+class EventAPIOccurrencesView(GenericAPIView):
+    """An APIView for getting all occurrences of the user's events within a time range"""
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+    api_key_resource = "event"
+
+    range_description = (
+        "UTC date (yyyy-mm-dd) or date and time (yyyy-mm-dd hh:mm), inclusive."
+    )
+
+    @staticmethod
+    def parse_range_limit(value, end_of_day=False):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d %H:%M").replace(
+                tzinfo=timezone.utc
+            )
+        except ValueError:
+            date = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            return date + timedelta(days=1, minutes=-1) if end_of_day else date
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "from",
+                openapi.IN_QUERY,
+                description=range_description,
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter(
+                "to",
+                openapi.IN_QUERY,
+                description=range_description,
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+        ]
+    )
+    def get(self, request):
+        try:
+            range_start = self.parse_range_limit(self.request.query_params["from"])
+            range_end = self.parse_range_limit(
+                self.request.query_params["to"], end_of_day=True
+            )
+            if range_end - range_start > timedelta(days=OCCURRENCES_MAX_DAYS):
+                raise ValueError(
+                    f"The range can be at most {OCCURRENCES_MAX_DAYS} days long"
+                )
+
+            # Events are never before their next notification, so later ones are filtered out in SQL
+            events = Event.objects.filter(
+                user=request.user, utc_timestamp__lte=int(range_end.timestamp())
+            ).values_list(
+                "id",
+                "title",
+                "category",
+                "date",
+                "time",
+                "utc_offset",
+                "notice_time",
+                "interval",
+                "count",
+            )
+            occurrences = []
+            for (
+                id,
+                title,
+                category,
+                date,
+                time,
+                utc_offset,
+                notice_time,
+                interval,
+                count,
+            ) in events.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                # Occurrences are expanded in local time, so that e.g. monthly events keep their local time
+                local_datetime = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+                local_range_start = apply_utc_offset(
+                    utc_offset, range_start, reverse=True
+                ).replace(tzinfo=None)
+                local_range_end = apply_utc_offset(
+                    utc_offset, range_end, reverse=True
+                ).replace(tzinfo=None)
+                notice = (
+                    timedelta(**parse_notice_time_or_interval(notice_time))
+                    if notice_time != "-"
+                    else timedelta()
+                )
+                for occurrence in expand_occurrences(
+                    local_datetime, interval, count, local_range_start, local_range_end
+                ):
+                    utc_datetime = apply_utc_offset(
+                        utc_offset, occurrence.replace(tzinfo=timezone.utc)
+                    )
+                    occurrences.append(
+                        {
+                            "id": id,
+                            "title": title,
+                            "category": category,
+                            "date": occurrence.strftime("%Y-%m-%d"),
+                            "time": occurrence.strftime("%H:%M"),
+                            "utc_offset": utc_offset,
+                            "utc_timestamp": int((utc_datetime - notice).timestamp()),
+                        }
+                    )
+                    if len(occurrences) > OCCURRENCES_LIMIT:
+                        raise ValueError(
+                            f"More than {OCCURRENCES_LIMIT} occurrences. Please use a shorter range."
+                        )
+            occurrences.sort(key=lambda occurrence: occurrence["utc_timestamp"])
+            return Response(occurrences, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
 
 class EventAPIDetailView(APIDetailView):
@@ -351,6 +1419,7 @@ class NoteAPIView(APIView):
     model = Note
     serializer_class = NoteSerializer
     order_by = "-updated_at"
+    query_update_fields = ("category", "title", "info")
 
 
 class NoteAPIDetailView(APIDetailView):
@@ -360,6 +1429,105 @@ class NoteAPIDetailView(APIDetailView):
     serializer_class = NoteSerializer
 
 
+class EventAPIChangesView(APIChangesView):
+    """An APIView for getting events changed since a given change token"""
+
+    model = Event
+    serializer_class = EventSerializer
+
+
+class NoteAPIChangesView(APIChangesView):
+    """An APIView for getting notes changed since a given change token"""
+
+    model = Note
+    serializer_class = NoteSerializer
+
+
+class EventAPIExportView(APIExportView):
+    """An APIView for exporting all events"""
+
+    model = Event
+    serializer_class = EventSerializer
+
+
+class NoteAPIExportView(APIExportView):
+    """An APIView for exporting all notes"""
+
+    model = Note
+    serializer_class = NoteSerializer
+
+
+class EventAPIStatsView(APIStatsView):
+    """An APIView for getting statistics of the user's events"""
+
+    model = Event
+
+    def get_stats(self, queryset, user):
+        stats = queryset.aggregate(
+            total=Count("id"), recurring=Count("id", filter=~Q(interval="-"))
+        )
+        stats["by_category"] = self.count_by(queryset, "category")
+        stats["by_notification_type"] = self.count_by(queryset, "notification_type")
+
+        # Upcoming notifications per (local) event date
+        now = int(datetime.now(timezone.utc).timestamp())
+        upcoming = queryset.filter(
+            utc_timestamp__gte=now,
+            utc_timestamp__lt=now + STATS_UPCOMING_DAYS * 24 * 60 * 60,
+        )
+        stats["upcoming"] = [
+            {"date": date, "count": count}
+            for date, count in self.count_by(upcoming, "date").items()
+        ]
+
+        user.refill_notifications()
+        stats["notifications_left"] = {
+            notification_type: None
+            if user.premium_member
+            else getattr(user, f"{notification_type}_notifications_left")
+            for notification_type in ("email", "sms")
+        }
+        return stats
+
+
+class NoteAPIStatsView(APIStatsView):
+    """An APIView for getting statistics of the user's notes"""
+
+    model = Note
+
+    def get_stats(self, queryset, user):
+        recently = datetime.now(timezone.utc) - timedelta(days=STATS_UPCOMING_DAYS)
+        stats = queryset.aggregate(
+            total=Count("id"),
+            updated_recently=Count("id", filter=Q(updated_at__gte=recently)),
+        )
+        stats["by_category"] = self.count_by(queryset, "category")
+        return stats
+
+
+class MetricsView(GenericAPIView):
+    """An APIView serving the metrics of all processes in the Prometheus text format"""
+
+    # Scrapers authenticate with 'Authorization: Bearer <METRICS_TOKEN>', not a JWT
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    throttle_classes = ()
+
+    def get(self, request):
+        if not settings.METRICS_TOKEN:
+            raise Http404
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(
+            token.encode(), settings.METRICS_TOKEN.encode()
+        ):
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+        # The values of this process are included as well
+        metrics.registry.flush()
+        return HttpResponse(
+            metrics.registry.render(), content_type="text/plain; version=0.0.4"
+        )
+
+
 class APIWelcomeView(GenericAPIView):
     """A class for the welcome endpoint"""
 
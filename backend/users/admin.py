@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
 from users.forms import CustomUserChangeForm, CustomUserCreationForm
-from users.models import CustomUser, UserSettings
+from users.models import APIKey, CustomUser, UserSettings
 
 
 class UserSettingsInline(admin.StackedInline):
@@ -78,3 +78,10 @@ class CustomUserAdmin(UserAdmin):
 
 
 admin.site.register(UserSettings)
+
+
+@admin.register(APIKey)
+class APIKeyAdmin(admin.ModelAdmin):
+    list_display = ("name", "user", "prefix", "scopes", "created_at", "expires_at")
+    search_fields = ("user__email", "name", "prefix")
+    readonly_fields = ("prefix", "hashed_key", "created_at")
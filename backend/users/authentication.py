@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+
+from django.contrib.auth.backends import ModelBackend
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from users.cache import get_cached_api_key, get_cached_user
+from users.models import APIKey
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication which looks up the user in the user cache"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend which looks up the user of a session in the user cache"""
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+class APIKeyAuthentication(BaseAuthentication):
+    """
+    Authenticates server-to-server requests with a header 'Authorization: Api-Key <key>'.
+    The key and its user are looked up in the cache, the key is verified with an HMAC.
+    request.auth is set to the APIKey, whose scopes are checked by APIKeyScopePermission.
+    """
+
+    keyword = "Api-Key"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed(_("Invalid API key header"), code="bad_header")
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(_("Invalid API key header"), code="bad_header")
+
+        prefix = APIKey.parse_prefix(key)
+        api_key = get_cached_api_key(prefix) if prefix else None
+        if api_key is None or not api_key.check_key(key):
+            raise AuthenticationFailed(_("Invalid API key"), code="invalid_api_key")
+        if api_key.expires_at and api_key.expires_at <= datetime.now(timezone.utc):
+            raise AuthenticationFailed(_("API key has expired"), code="expired_api_key")
+
+        user = get_cached_user(api_key.user_id)
+        if user is None or not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user, api_key
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import APIKey, CustomUser, UserSettings
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessCache:
+    """
+    A per-process cache with expiry, for records that are read on every request.
+    Deletions only affect the current process, so the timeout should be short.
+    """
+
+    def __init__(self, timeout_setting):
+        self.timeout_setting = timeout_setting
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key, value):
+        expiry_time = time.monotonic() + getattr(settings, self.timeout_setting)
+        with self._lock:
+            self._entries[key] = (expiry_time, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_field_values(instance):
+    # Model instances are cached as their field values, so every lookup returns a new instance
+    field_names = [field.attname for field in instance._meta.concrete_fields]
+    return field_names, [getattr(instance, name) for name in field_names]
+
+
+def from_field_values(model, field_values):
+    return model.from_db(None, *field_values)
+
+
+user_settings_cache = ProcessCache("USER_SETTINGS_CACHE_TIMEOUT")
+user_cache = ProcessCache("AUTH_USER_LOCAL_CACHE_TIMEOUT")
+
+
+def get_user_settings(user):
+    """
+    Returns the settings of the user, querying the database at most once per
+    USER_SETTINGS_CACHE_TIMEOUT seconds in each process.
+    The settings are attached to the user object, so repeated calls within a
+    request or task (or a user loaded with select_related) use no queries at all.
+    """
+    if "usersettings" in user._state.fields_cache:
+        return user.usersettings
+
+    field_values = user_settings_cache.get(user.pk)
+    if field_values is not None:
+        user_settings = from_field_values(UserSettings, field_values)
+    else:
+        user_settings = UserSettings.objects.get(user=user)
+        user_settings_cache.set(user.pk, get_field_values(user_settings))
+    # Also sets user_settings.user, so the user is not queried again
+    user.usersettings = user_settings
+    return user_settings
+
+
+def invalidate_user_settings(user_id):
+    user_settings_cache.delete(user_id)
+
+
+def get_user_cache_key(user_id):
+    return f"user:{user_id}:record"
+
+
+def get_cached_user(user_id):
+    """
+    Returns the user with the given id, or None if it does not exist.
+    Users are cached in the process for AUTH_USER_LOCAL_CACHE_TIMEOUT seconds
+    and in the shared cache for AUTH_USER_CACHE_TIMEOUT seconds,
+    so most authenticated requests do not query the database for the user.
+    """
+    user_id = CustomUser._meta.pk.to_python(user_id)
+    field_values = user_cache.get(user_id)
+    if field_values is None:
+        key = get_user_cache_key(user_id)
+        try:
+            field_values = cache.get(key)
+        except Exception as e:
+            logger.warning("User cache lookup failed: %s", e)
+        if field_values is None:
+            try:
+                user = CustomUser.objects.get(pk=user_id)
+            except CustomUser.DoesNotExist:
+                return None
+            field_values = get_field_values(user)
+            try:
+                cache.set(key, field_values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.warning("User cache update failed: %s", e)
+        user_cache.set(user_id, field_values)
+    return from_field_values(CustomUser, field_values)
+
+
+def invalidate_user(user_id):
+    user_cache.delete(user_id)
+    try:
+        cache.delete(get_user_cache_key(user_id))
+    except Exception as e:
+        logger.warning("User cache invalidation failed: %s", e)
+
+
+def invalidate_users(user_ids):
+    # For bulk updates, which don't send model signals
+    for user_id in user_ids:
+        user_cache.delete(user_id)
+    try:
+        cache.delete_many([get_user_cache_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning("User cache invalidation failed: %s", e)
+
+
+def get_api_key_cache_key(prefix):
+    return f"api_key:{prefix}:record"
+
+
+def get_cached_api_key(prefix):
+    """
+    Returns the API key with the given prefix, or None if it does not exist.
+    Keys (and missing keys) are cached for API_KEY_CACHE_TIMEOUT seconds,
+    so repeated requests with the same key do not query the database.
+    """
+    key = get_api_key_cache_key(prefix)
+    field_values = None
+    try:
+        field_values = cache.get(key)
+    except Exception as e:
+        logger.warning("API key cache lookup failed: %s", e)
+    if field_values is None:
+        try:
+            field_values = get_field_values(APIKey.objects.get(prefix=prefix))
+        except APIKey.DoesNotExist:
+            # Cached as well, so guessed keys do not reach the database
+            field_values = ()
+        try:
+            cache.set(key, field_values, timeout=settings.API_KEY_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning("API key cache update failed: %s", e)
+    return from_field_values(APIKey, field_values) if field_values else None
+
+
+def invalidate_api_key(prefix):
+    try:
+        cache.delete(get_api_key_cache_key(prefix))
+    except Exception as e:
+        logger.warning("API key cache invalidation failed: %s", e)
+
+
+def clear_process_caches():
+    user_settings_cache.clear()
+    user_cache.clear()
@@ -1,9 +1,16 @@
+import hmac
+import secrets
+from datetime import datetime, timezone
+
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.utils.crypto import salted_hmac
 from django.utils.translation import gettext_lazy as _
 
+from core.mixins import DirtyFieldsMixin
 from core.validators import (
+    api_key_scopes_validator,
     notification_type_validator,
     phone_number_validator,
     time_validator,
@@ -12,7 +19,16 @@ from core.validators import (
 from users.managers import CustomUserManager
 
 
-class CustomUser(AbstractUser):
+def get_quota_period():
+    # The first day of the current month (UTC), notification quotas are per month
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
+def generate_feed_key():
+    return secrets.token_hex(16)
+
+
+class CustomUser(DirtyFieldsMixin, AbstractUser):
     email = models.EmailField(_("email address"), unique=True)
     phone_number = models.CharField(
         max_length=15, null=True, blank=True, validators=[phone_number_validator]
@@ -24,6 +40,10 @@ class CustomUser(AbstractUser):
     sms_notifications_left = models.IntegerField(
         default=settings.NO_OF_FREE_SMS_NOTIFICATIONS
     )
+    # The month of the notification quotas, they are refilled on first use in a new month
+    quota_period = models.DateField(default=get_quota_period)
+    # Signs the calendar feed token, a new key revokes the previously shared feed URLs
+    feed_key = models.CharField(max_length=32, default=generate_feed_key)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
@@ -33,13 +53,28 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.email
 
+    def refill_notifications(self):
+        """
+        Refills the notification quotas if they are from a previous month.
+        Only the instance is changed, the quotas are written by the next save of the user.
+        """
+        quota_period = get_quota_period()
+        if self.quota_period < quota_period:
+            self.email_notifications_left = settings.NO_OF_FREE_EMAIL_NOTIFICATIONS
+            self.sms_notifications_left = settings.NO_OF_FREE_SMS_NOTIFICATIONS
+            self.quota_period = quota_period
+
+    def rotate_feed_key(self):
+        self.feed_key = generate_feed_key()
+        self.save(update_fields=["feed_key"])
+
     def save(self, *args, **kwargs):
         if self.is_staff:
             self.premium_member = True
         super(CustomUser, self).save(*args, **kwargs)
 
 
-class UserSettings(models.Model):
+class UserSettings(DirtyFieldsMixin, models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     default_notification_type = models.CharField(
         max_length=10,
@@ -58,3 +93,64 @@ class UserSettings(models.Model):
 
     def __str__(self):
         return self.user.email
+
+
+class APIKey(models.Model):
+    """
+    A long-lived key for server-to-server integrations, e.g. 'df_1a2b3c4d.<secret>'.
+    Only an HMAC of the key is stored, the prefix is used to look it up.
+    The key is random, so it does not need a slow password hash.
+    """
+
+    key_tag = "df"
+    prefix_attempts = 3
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    name = models.CharField(max_length=50)
+    prefix = models.CharField(max_length=8, unique=True)
+    hashed_key = models.CharField(max_length=64)
+    scopes = models.CharField(max_length=100, validators=[api_key_scopes_validator])
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user.email} - {self.name} ({self.prefix})"
+
+    @staticmethod
+    def hash_key(key):
+        return salted_hmac("users.APIKey", key, algorithm="sha256").hexdigest()
+
+    @staticmethod
+    def parse_prefix(key):
+        # Returns None if the key is not in the API key format
+        tag, _, rest = key.partition("_")
+        prefix, _, secret = rest.partition(".")
+        if tag != APIKey.key_tag or len(prefix) != 8 or not secret:
+            return None
+        return prefix
+
+    @classmethod
+    def generate(cls, **fields):
+        """
+        Creates a new key. Returns the APIKey and the key, which is not stored anywhere.
+        Prefixes are random, a prefix that is already used is replaced by a new one.
+        """
+        for attempt in range(cls.prefix_attempts):
+            prefix = secrets.token_hex(4)
+            key = f"{cls.key_tag}_{prefix}.{secrets.token_urlsafe(32)}"
+            try:
+                # A savepoint, so that the transaction of the caller can continue
+                with transaction.atomic():
+                    api_key = cls.objects.create(
+                        prefix=prefix, hashed_key=cls.hash_key(key), **fields
+                    )
+                return api_key, key
+            except IntegrityError:
+                if attempt == cls.prefix_attempts - 1:
+                    raise
+
+    def check_key(self, key):
+        return hmac.compare_digest(self.hashed_key, self.hash_key(key))
+
+    def get_scopes(self):
+        return {scope.strip() for scope in self.scopes.split(",")}
@@ -0,0 +1,25 @@
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from users.models import APIKey
+
+
+class APIKeyScopePermission(BasePermission):
+    """
+    Limits requests authenticated with an API key to the scopes of the key.
+    The scope of a view is '<resource>:read' or '<resource>:write', where the resource is
+    the view's api_key_resource or the name of its model. Views without one deny API keys.
+    Requests authenticated in other ways are not affected.
+    """
+
+    message = "This API key does not have the required scope"
+
+    def has_permission(self, request, view):
+        if not isinstance(request.auth, APIKey):
+            return True
+        resource = getattr(view, "api_key_resource", None)
+        if resource is None and getattr(view, "model", None) is not None:
+            resource = view.model._meta.model_name
+        if resource is None:
+            return False
+        access = "read" if request.method in SAFE_METHODS else "write"
+        return f"{resource}:{access}" in request.auth.get_scopes()
@@ -1,7 +1,7 @@
 from django.contrib.auth import authenticate
 from rest_framework import serializers
 
-from users.models import CustomUser, UserSettings
+from users.models import APIKey, CustomUser, UserSettings
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -73,3 +73,14 @@ class UserSettingsSerializer(CustomUserSerializer):
             "default_utc_offset",
             "sms_sender_name",
         )
+
+
+class APIKeySerializer(serializers.ModelSerializer):
+    """
+    Serializer class to serialize the APIKey model. The key itself is only returned on creation.
+    """
+
+    class Meta:
+        model = APIKey
+        fields = ("id", "name", "prefix", "scopes", "created_at", "expires_at")
+        read_only_fields = ("prefix", "created_at")
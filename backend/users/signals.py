@@ -1,8 +1,9 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from users.models import UserSettings
+from users.cache import invalidate_api_key, invalidate_user, invalidate_user_settings
+from users.models import APIKey, UserSettings
 
 User = get_user_model()
 
@@ -15,4 +16,24 @@ def create_usersettings(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_usersettings(sender, instance, **kwargs):
-    instance.usersettings.save()
+    # Settings that have not been loaded cannot have been changed
+    if "usersettings" in instance._state.fields_cache:
+        instance.usersettings.save()
+
+
+@receiver(post_save, sender=UserSettings)
+@receiver(post_delete, sender=UserSettings)
+def invalidate_cached_user_settings(sender, instance, **kwargs):
+    invalidate_user_settings(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=APIKey)
+@receiver(post_delete, sender=APIKey)
+def invalidate_cached_api_key(sender, instance, **kwargs):
+    invalidate_api_key(instance.prefix)
@@ -12,4 +12,8 @@ urlpatterns = [
     path("logout/", views.UserLogoutAPIView.as_view(), name="logout-user"),
     path("", views.UserAPIView.as_view(), name="user-info"),
     path("settings/", views.UserSettingsAPIView.as_view(), name="settings"),
+    path("api-keys/", views.APIKeyAPIView.as_view(), name="api-keys"),
+    path(
+        "api-keys/<int:id>/", views.APIKeyAPIDetailView.as_view(), name="api-key-detail"
+    ),
 ]
@@ -1,4 +1,6 @@
 from django.contrib.auth import get_user_model
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.generics import GenericAPIView, RetrieveUpdateAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -6,6 +8,8 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from users import serializers
+from users.models import APIKey
+from users.permissions import APIKeyScopePermission
 
 User = get_user_model()
 
@@ -14,6 +18,7 @@ class UserRegistrationAPIView(GenericAPIView):
     """An endpoint for the client to create a new User."""
 
     permission_classes = (AllowAny,)
+    throttle_scope = "auth"
     serializer_class = serializers.UserRegistrationSerializer
 
     def post(self, request, *args, **kwargs):
@@ -30,6 +35,7 @@ class UserLoginAPIView(GenericAPIView):
     """An endpoint to authenticate existing users using their email and password."""
 
     permission_classes = (AllowAny,)
+    throttle_scope = "auth"
     serializer_class = serializers.UserLoginSerializer
 
     def post(self, request, *args, **kwargs):
@@ -46,7 +52,7 @@ class UserLoginAPIView(GenericAPIView):
 class UserLogoutAPIView(GenericAPIView):
     """An endpoint to logout users."""
 
-    permission_classes = (IsAuthenticated,)
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
 
     def post(self, request, *args, **kwargs):
         try:
@@ -61,10 +67,11 @@ class UserLogoutAPIView(GenericAPIView):
 class UserAPIView(RetrieveUpdateAPIView):
     """Get, Update user information"""
 
-    permission_classes = (IsAuthenticated,)
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
     serializer_class = serializers.CustomUserSerializer
 
     def get_object(self):
+        self.request.user.refill_notifications()
         return self.request.user
 
     def update(self, request, *args, **kwargs):
@@ -76,7 +83,7 @@ class UserAPIView(RetrieveUpdateAPIView):
 class UserSettingsAPIView(GenericAPIView):
     """Get, Update user settings"""
 
-    permission_classes = (IsAuthenticated,)
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
     serializer_class = serializers.UserSettingsSerializer
 
     def post(self, request):
@@ -109,3 +116,57 @@ class UserSettingsAPIView(GenericAPIView):
                 {"result": "error", "message": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+
+class APIKeyAPIView(GenericAPIView):
+    """List, create API keys for server-to-server integrations"""
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+    serializer_class = serializers.APIKeySerializer
+
+    def get(self, request):
+        try:
+            api_keys = APIKey.objects.filter(user=request.user).order_by("-created_at")
+            serializer = self.serializer_class(api_keys, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            api_key, key = APIKey.generate(
+                user=request.user, **serializer.validated_data
+            )
+            data = self.serializer_class(api_key).data
+            # The key cannot be recovered from its hash, so it is only shown once
+            data["key"] = key
+            return Response(data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class APIKeyAPIDetailView(GenericAPIView):
+    """Revoke an API key"""
+
+    permission_classes = (IsAuthenticated, APIKeyScopePermission)
+
+    def delete(self, request, id):
+        try:
+            api_key = get_object_or_404(APIKey, id=id, user=request.user)
+            api_key.delete()
+            return Response({"result": "success"}, status=status.HTTP_200_OK)
+        except Http404:
+            raise
+        except Exception as e:
+            return Response(
+                {"result": "error", "message": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )